@@ -1,13 +1,35 @@
+import datetime
 from ninja import Router, Schema
-from django.shortcuts import get_object_or_404
-from typing import List
+from ninja.errors import HttpError
+from django.http import StreamingHttpResponse
+from django.shortcuts import aget_object_or_404
+from typing import List, Optional
+from analysis.services.export_service import DATASETS, FORMATS, ExportService
 from analysis.services.inference_engine import InferenceEngine
 from analysis.models import GapAnalysisReport, SkillAnalysis
 from assignments.models import AssignmentAttempt
-from aptify.auth import django_auth
+from assignments.services.skill_score_service import SkillScoreService
+from aptify.auth import django_auth, is_recruiter
+from aptify.http_cache import acached_json_response, cache_key
+from aptify.pagination import DEFAULT_LIMIT, keyset_page, select_fields
 
 router = Router()
 
+# Listing fields: public name -> ORM path.
+REPORT_FIELDS = {
+    "id": "id",
+    "attempt_id": "attempt_id",
+    "student_id": "student_id",
+    "assignment_id": "attempt__assignment_id",
+    "generated_at": "generated_at",
+    "primary_gap": "primary_gap",
+    "secondary_gap": "secondary_gap",
+    "confidence_level": "confidence_level",
+    "recommendation": "recommendation",
+    "skill_traversal_path": "skill_traversal_path",
+}
+REPORT_DEFAULT_FIELDS = [name for name in REPORT_FIELDS if name not in ("recommendation", "skill_traversal_path")]
+
 class ReportSchema(Schema):
     student_name: str
     primary_gap: str
@@ -28,6 +50,9 @@ def generate_analysis(request, attempt_id: int):
     
     report = InferenceEngine.analyze_attempt(attempt_id)
     
+    return report_payload(report)
+
+def report_payload(report):
     return {
         "student_name": report.student.username,
         "primary_gap": report.primary_gap,
@@ -39,14 +64,74 @@ def generate_analysis(request, attempt_id: int):
     }
 
 @router.get("/report/{attempt_id}", auth=django_auth, response=ReportSchema)
-def get_report(request, attempt_id: int):
-    report = get_object_or_404(GapAnalysisReport, attempt_id=attempt_id)
-    return {
-        "student_name": report.student.username,
-        "primary_gap": report.primary_gap,
-        "secondary_gap": report.secondary_gap,
-        "confidence_level": report.confidence_level,
-        "recommendation": report.recommendation,
-        "skill_traversal_path": report.skill_traversal_path,
-        "generated_at": report.generated_at.strftime("%Y-%m-%d %H:%M:%S")
-    }
+async def get_report(request, attempt_id: int):
+    """
+    Served from the response cache with a strong ETag; repeated refreshes
+    get a 304 without touching the database. Async, like the status and
+    summary endpoints.
+    """
+    async def build():
+        report = await aget_object_or_404(GapAnalysisReport.objects.select_related('student'), attempt_id=attempt_id)
+        return report_payload(report)
+    return await acached_json_response(request, cache_key('report', attempt_id), build)
+
+@router.get("/skills/attempt/{attempt_id}", auth=django_auth)
+def attempt_skill_profile(request, attempt_id: int):
+    """Per-skill scores of one attempt, from the materialized rollups. Recruiters or the attempt's owner only."""
+    if not is_recruiter(request.user) and not AssignmentAttempt.objects.filter(id=attempt_id, user_id=request.user.id).exists():
+        raise HttpError(404, "Attempt not found")
+    return {"attempt_id": attempt_id, "skills": SkillScoreService.profile(attempt_id)}
+
+@router.get("/skills/user/{user_id}", auth=django_auth)
+def user_skill_profile(request, user_id: int):
+    """A candidate's skill profile across all attempts (for recruiter dashboards); candidates only see their own."""
+    if not is_recruiter(request.user) and user_id != request.user.id:
+        raise HttpError(403, "Skill profiles of other candidates are available to recruiters only")
+    return {"user_id": user_id, "skills": SkillScoreService.user_profile(user_id)}
+
+@router.get("/export/{dataset}", auth=django_auth)
+def export_results(
+    request, dataset: str, format: str = "csv", assignment: Optional[int] = None,
+    user: Optional[int] = None, since: Optional[datetime.date] = None, until: Optional[datetime.date] = None,
+):
+    """
+    Streams attempts, coding submissions or gap reports as CSV / NDJSON for
+    recruiters. Rows are read through a server-side cursor and written as
+    they arrive, so exports of any size run in constant memory.
+    """
+    if not is_recruiter(request.user):
+        raise HttpError(403, "Exports are available to recruiters only")
+    if dataset not in DATASETS:
+        raise HttpError(404, f"Unknown export '{dataset}'")
+    if format not in FORMATS:
+        raise HttpError(400, f"Unsupported format '{format}' (csv or ndjson)")
+
+    response = StreamingHttpResponse(
+        ExportService.stream(dataset, format, assignment_id=assignment, user_id=user, since=since, until=until),
+        content_type=FORMATS[format],
+    )
+    response["Content-Disposition"] = f'attachment; filename="aptify-{dataset}.{format}"'
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+@router.get("/reports", auth=django_auth)
+def list_reports(
+    request, assignment: Optional[int] = None, user: Optional[int] = None, primary_gap: Optional[str] = None,
+    fields: Optional[str] = None, cursor: Optional[str] = None, limit: int = DEFAULT_LIMIT,
+):
+    """
+    Gap reports, newest first, keyset-paginated on (generated_at, id). Pass
+    `next_cursor` back as `cursor` for the next page; `fields` picks columns.
+    Reports are read from a replica (see aptify.db_router).
+    """
+    reports = GapAnalysisReport.objects.all()
+    if not is_recruiter(request.user):
+        reports = reports.filter(student_id=request.user.id)
+    if assignment is not None:
+        reports = reports.filter(attempt__assignment_id=assignment)
+    if user is not None:
+        reports = reports.filter(student_id=user)
+    if primary_gap:
+        reports = reports.filter(primary_gap=primary_gap)
+    names = select_fields(fields, REPORT_FIELDS, REPORT_DEFAULT_FIELDS)
+    return keyset_page(reports, "generated_at", REPORT_FIELDS, names, cursor, limit)
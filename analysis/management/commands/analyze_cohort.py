@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from analysis.services.inference_engine import InferenceEngine
+from assignments.models import AssignmentAttempt
+
+
+class Command(BaseCommand):
+    help = "Regenerates gap analysis reports for a cohort of attempts in bulk."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--assignment", type=int, action="append", dest="assignments",
+            help="Only analyze attempts at these assignment ids (repeatable). Defaults to all attempts.",
+        )
+        parser.add_argument(
+            "--attempt", type=int, action="append", dest="attempts",
+            help="Only analyze these attempt ids (repeatable).",
+        )
+        parser.add_argument(
+            "--completed-only", action="store_true",
+            help="Skip attempts that were never finished.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Attempts per batch.")
+        parser.add_argument(
+            "--workers", type=int, default=1,
+            help="Worker processes for very large cohorts (needs a server database, not sqlite).",
+        )
+
+    def handle(self, *args, **options):
+        attempts = AssignmentAttempt.objects.all()
+        if options["assignments"]:
+            attempts = attempts.filter(assignment_id__in=options["assignments"])
+        if options["attempts"]:
+            attempts = attempts.filter(id__in=options["attempts"])
+        if options["completed_only"]:
+            attempts = attempts.filter(completed_at__isnull=False)
+
+        count = InferenceEngine.analyze_attempts(
+            attempts, chunk_size=options["chunk_size"], workers=options["workers"]
+        )
+        self.stdout.write(self.style.SUCCESS(f"Regenerated {count} reports (unchanged ones skipped)."))
@@ -0,0 +1,33 @@
+import datetime
+import sys
+
+from django.core.management.base import BaseCommand
+
+from analysis.services.export_service import DATASETS, FORMATS, ExportService
+
+
+class Command(BaseCommand):
+    help = "Streams attempts, coding submissions or gap reports to CSV / NDJSON in constant memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument("dataset", choices=sorted(DATASETS))
+        parser.add_argument("--format", choices=sorted(FORMATS), default="csv")
+        parser.add_argument("--assignment", type=int, help="Only rows of this assignment id.")
+        parser.add_argument("--user", type=int, help="Only rows of this candidate (user id).")
+        parser.add_argument("--since", type=datetime.date.fromisoformat, help="First day to include (YYYY-MM-DD).")
+        parser.add_argument("--until", type=datetime.date.fromisoformat, help="Last day to include (YYYY-MM-DD).")
+        parser.add_argument("--output", "-o", help="File to write to. Defaults to stdout.")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Rows fetched per cursor round trip.")
+
+    def handle(self, *args, **options):
+        chunks = ExportService.stream(
+            options["dataset"], options["format"], chunk_size=options["chunk_size"],
+            assignment_id=options["assignment"], user_id=options["user"],
+            since=options["since"], until=options["until"],
+        )
+        if options["output"]:
+            with open(options["output"], "w", newline="", encoding="utf-8") as output:
+                output.writelines(chunks)
+            self.stderr.write(self.style.SUCCESS(f"Wrote {options['dataset']} export to {options['output']}"))
+        else:
+            sys.stdout.writelines(chunks)
@@ -0,0 +1,32 @@
+# Generated by Django 6.1.2 on 2026-10-17 07:25
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def drop_duplicate_skill_rows(apps, schema_editor):
+    # Every analysis run used to insert fresh rows; the newest one is current.
+    SkillAnalysis = apps.get_model('analysis', 'SkillAnalysis')
+    duplicates = (
+        SkillAnalysis.objects.values('report_id', 'skill_name').order_by()
+        .annotate(latest_id=Max('id'), copies=Count('id')).filter(copies__gt=1)
+    )
+    for row in duplicates.iterator():
+        SkillAnalysis.objects.filter(
+            report_id=row['report_id'], skill_name=row['skill_name']
+        ).exclude(id=row['latest_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analysis', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_skill_rows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='skillanalysis',
+            constraint=models.UniqueConstraint(fields=('report', 'skill_name'), name='skillanalysis_unique_report_skill'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-17 07:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analysis', '0002_skill_analysis_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gapanalysisreport',
+            name='input_fingerprint',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -21,6 +21,10 @@ class GapAnalysisReport(models.Model):
     # Visual/Graph Data (Stored as JSON for flexibility in frontend rendering)
     skill_traversal_path = models.JSONField(default=list, help_text="Path traversed in dependency graph.")
     
+    # Hash of the attempt scores and the rule version the report was built from;
+    # regeneration is skipped while it still matches.
+    input_fingerprint = models.CharField(max_length=64, blank=True, default='')
+    
     def __str__(self):
         return f"Report for {self.student} - {self.primary_gap}"
 
@@ -38,5 +42,11 @@ class SkillAnalysis(models.Model):
     status = models.CharField(max_length=10, choices=Status.choices)
     score_impact = models.FloatField(default=0.0, help_text="How much this skill impacted the score.")
 
+    class Meta:
+        constraints = [
+            # One row per skill and report; re-analysis upserts on this key.
+            models.UniqueConstraint(fields=['report', 'skill_name'], name='skillanalysis_unique_report_skill'),
+        ]
+
     def __str__(self):
         return f"{self.skill_name}: {self.status}"
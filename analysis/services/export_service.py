@@ -0,0 +1,117 @@
+"""
+Streaming exports of attempts, coding submissions and gap reports.
+
+Rows come from ``aptify.db.stream_rows()`` (a server-side cursor on
+PostgreSQL, keyset batches behind a transaction pooler, chunked fetches
+elsewhere) and are encoded as they arrive, so memory stays flat no matter
+how many rows an export covers. Heavy columns
+(submitted code, test cases) are never selected.
+"""
+import csv
+import datetime
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from analysis.models import GapAnalysisReport
+from aptify.db import stream_rows
+from aptify.db_router import read_replica
+from assignments.models import AssignmentAttempt, CodingSubmission
+
+# dataset -> (model, path to the attempt, timestamp filtered by the date range, columns);
+# "id" comes first, stream_rows() pages on it.
+DATASETS = {
+    "attempts": (AssignmentAttempt, "", "started_at", [
+        "id", "user_id", "user__user_code", "user__username", "assignment_id", "assignment__title",
+        "started_at", "completed_at", "concept_score", "logic_score", "execution_score",
+        "quiz_correct", "quiz_total", "output_correct", "output_total", "coding_total",
+    ]),
+    "submissions": (CodingSubmission, "attempt__", "created_at", [
+        "id", "attempt_id", "attempt__user_id", "attempt__assignment_id", "question_id", "created_at",
+        "time_taken_seconds", "grading_status", "code_runs", "is_correct", "passed_test_cases",
+        "total_test_cases", "execution_time_ms", "cpu_time_ms", "op_count", "memory_usage_kb", "complexity_analysis",
+        "correctness_score", "time_perf_score", "optimality_score", "total_score", "feedback_tag",
+    ]),
+    "reports": (GapAnalysisReport, "attempt__", "generated_at", [
+        "id", "attempt_id", "student_id", "attempt__assignment_id", "generated_at", "primary_gap",
+        "secondary_gap", "confidence_level", "recommendation", "skill_traversal_path",
+    ]),
+}
+
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+# Rows encoded per yielded chunk; one write per row would be mostly overhead.
+ROWS_PER_CHUNK = 500
+
+
+class _Echo:
+    """File-like object for csv.writer that hands back each encoded row."""
+
+    def write(self, value):
+        return value
+
+
+class ExportService:
+    @staticmethod
+    def queryset(dataset, assignment_id=None, user_id=None, since=None, until=None):
+        """
+        values_list() queryset of an export. `since` / `until` are inclusive
+        dates applied to the dataset's timestamp. Reads from a replica.
+        """
+        model, attempt, timestamp, columns = DATASETS[dataset]
+        rows = model.objects.using(read_replica())
+        if assignment_id is not None:
+            rows = rows.filter(**{f"{attempt}assignment_id": assignment_id})
+        if user_id is not None:
+            rows = rows.filter(**{f"{attempt}user_id": user_id})
+        # Plain range filters (not __date) so the timestamp indexes stay usable.
+        if since is not None:
+            rows = rows.filter(**{f"{timestamp}__gte": _start_of_day(since)})
+        if until is not None:
+            rows = rows.filter(**{f"{timestamp}__lt": _start_of_day(until + datetime.timedelta(days=1))})
+        return rows.order_by("id").values_list(*columns)
+
+    @staticmethod
+    def header(dataset):
+        return [column.replace("__", "_") for column in DATASETS[dataset][3]]
+
+    @staticmethod
+    def stream(dataset, format="csv", chunk_size=2000, **filters):
+        """Yields the encoded export in chunks of text."""
+        header = ExportService.header(dataset)
+        rows = stream_rows(ExportService.queryset(dataset, **filters), chunk_size)
+        encode = _csv_encoder(header) if format == "csv" else _ndjson_encoder(header)
+
+        if format == "csv":
+            yield encode(header)
+        buffer = []
+        for row in rows:
+            buffer.append(encode(row))
+            if len(buffer) >= ROWS_PER_CHUNK:
+                yield "".join(buffer)
+                buffer = []
+        if buffer:
+            yield "".join(buffer)
+
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def _csv_encoder(header):
+    writer = csv.writer(_Echo())
+
+    def encode(row):
+        return writer.writerow([
+            json.dumps(value) if isinstance(value, (list, dict)) else
+            value.isoformat() if isinstance(value, datetime.datetime) else value
+            for value in row
+        ])
+    return encode
+
+
+def _ndjson_encoder(header):
+    def encode(row):
+        return json.dumps(dict(zip(header, row)), cls=DjangoJSONEncoder) + "\n"
+    return encode
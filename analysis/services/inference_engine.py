@@ -1,90 +1,261 @@
-from assignments.models import AssignmentAttempt
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from django.db import connections, transaction
+from django.db.models import QuerySet, Sum
+
+from aptify.db import stream_rows
+from aptify.http_cache import cache_key, invalidate
+from assignments.models import AssignmentAttempt, SkillScore
 from analysis.models import GapAnalysisReport, SkillAnalysis
+from analysis.services.skill_graph import SkillGraph
+
+# Thresholds (High >= 60, Low < 60) - Heuristic for analysis
+HIGH = 60.0
+
+# Bump whenever RULES, the thresholds or the skill rows change, so existing
+# reports get regenerated.
+RULE_VERSION = 2
+
+# The 5 Rules, checked in order against (quiz high, logic high, code high).
+# Each finding is (primary_gap, secondary_gap, recommendation, confidence).
+RULES = [
+    # Rule 1: High Quiz + Low Coding
+    (lambda quiz, logic, code: quiz and not code, (
+        "Execution Gap", "Application of Theory",
+        "You understand the concepts but struggle to apply them. Focus on writing more code from scratch rather than just reading.",
+        85.0,
+    )),
+    # Rule 2: High Logic + Low Coding
+    (lambda quiz, logic, code: logic and not code, (
+        "Syntax/Implementation Gap", "Language Constructs",
+        "Your logic is sound, but you struggle with the language syntax. Practice coding simple problems to build muscle memory.",
+        80.0,
+    )),
+    # Rule 3: Low Quiz + High Coding
+    (lambda quiz, logic, code: not quiz and code, (
+        "Conceptual Gap", "Theoretical Foundation",
+        "You are a practical learner but lack theoretical depth. Review the core concepts to ensure you aren't just memorizing patterns.",
+        85.0,
+    )),
+    # Rule 4: Low Logic + Low Coding (Foundational)
+    (lambda quiz, logic, code: not logic and not code, (
+        "Foundational Logic Gap", "Algorithmic Thinking",
+        "You are struggling with both dry-runs and coding. Start with flowcharting and dry-running code on paper before typing.",
+        90.0,
+    )),
+    # Rule 5: High All
+    (lambda quiz, logic, code: quiz and logic and code, (
+        "None", "Optimization",
+        "You are industry-ready! Focus on advanced optimization and system design.",
+        95.0,
+    )),
+]
+
+# Mixed/Edge cases
+FALLBACK_FINDING = (
+    "Mixed Gap", "General Practice",
+    "Your performance is varied. identifying specific weak spots in sub-skills is recommended.",
+    60.0,
+)
+
+
+def _finding_table():
+    # The rules only see three booleans, so they are evaluated once for each of
+    # the 8 combinations instead of once per attempt.
+    table = []
+    for combination in range(8):
+        quiz, logic, code = bool(combination & 4), bool(combination & 2), bool(combination & 1)
+        table.append(next(
+            (finding for matches, finding in RULES if matches(quiz, logic, code)), FALLBACK_FINDING
+        ))
+    return table
+
+
+FINDINGS = _finding_table()
+
+REPORT_UPDATE_FIELDS = [
+    'student', 'generated_at', 'primary_gap', 'secondary_gap', 'confidence_level', 'recommendation',
+    'skill_traversal_path', 'input_fingerprint',
+]
+
+# The current report's fingerprint comes along in the same query (reverse one-to-one join).
+ATTEMPT_COLUMNS = (
+    'id', 'user_id', 'concept_score', 'logic_score', 'execution_score', 'analysis_report__input_fingerprint',
+)
+
 
 class InferenceEngine:
+    @staticmethod
+    def fingerprint(quiz_score, logic_score, code_score, skill_scores=None, graph_version=''):
+        skills = sorted((skill_scores or {}).items())
+        payload = f"{RULE_VERSION}|{quiz_score!r}|{logic_score!r}|{code_score!r}|{skills!r}|{graph_version}"
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    @staticmethod
+    def skill_scores(attempt_ids):
+        """
+        Per-skill 0-100 scores for a chunk of attempts, {attempt_id: {skill_id:
+        score}}, read from the materialized SkillScore rollups (sub-skills
+        folded together) in one query.
+        """
+        rows = (
+            SkillScore.objects.filter(attempt_id__in=attempt_ids)
+            .values_list('attempt_id', 'skill_id').order_by()
+            .annotate(points=Sum('points'), answered=Sum('answered'))
+        )
+        scores = {}
+        for attempt_id, skill_id, points, answered in rows:
+            if answered:
+                scores.setdefault(attempt_id, {})[skill_id] = round(points / answered, 2)
+        return scores
+
+    @staticmethod
+    def evaluate(quiz_scores, logic_scores, code_scores):
+        """
+        Applies the rules column-wise to parallel lists of 0-100 scores and
+        returns (findings, logic_high, code_high), one entry per attempt.
+        """
+        quiz_high = [score >= HIGH for score in quiz_scores]
+        logic_high = [score >= HIGH for score in logic_scores]
+        code_high = [score >= HIGH for score in code_scores]
+        findings = [
+            FINDINGS[quiz * 4 + logic * 2 + code]
+            for quiz, logic, code in zip(quiz_high, logic_high, code_high)
+        ]
+        return findings, logic_high, code_high
+
+    @staticmethod
+    def _analyze_rows(rows):
+        """
+        Analyzes one chunk of attempt rows (tuples of ATTEMPT_COLUMNS) and
+        upserts the reports whose inputs changed, plus their skill rows.
+        Returns the number of reports written.
+        """
+        if not rows:
+            return 0
+        graph = SkillGraph.get()
+        skill_scores = InferenceEngine.skill_scores([row[0] for row in rows])
+
+        changed = []
+        fingerprints = []
+        for row in rows:
+            fingerprint = InferenceEngine.fingerprint(*row[2:5], skill_scores.get(row[0]), graph.version)
+            if fingerprint != row[5]:
+                changed.append(row)
+                fingerprints.append(fingerprint)
+        if not changed:
+            return 0
+        attempt_ids, user_ids, quiz_scores, logic_scores, code_scores, _ = zip(*changed)
+        findings, logic_high, code_high = InferenceEngine.evaluate(quiz_scores, logic_scores, code_scores)
+
+        reports = []
+        chains = []
+        for attempt_id, user_id, finding, fingerprint in zip(attempt_ids, user_ids, findings, fingerprints):
+            primary_gap, secondary_gap, recommendation, confidence = finding
+            # Failing skill the student showed, down to its deepest failing prerequisite.
+            chain = graph.root_cause(skill_scores.get(attempt_id, {}), HIGH)
+            if chain:
+                recommendation = f"{recommendation} Start with {chain[-1]}: it is the deepest prerequisite you are missing."
+            chains.append(chain)
+            reports.append(GapAnalysisReport(
+                attempt_id=attempt_id,
+                student_id=user_id,
+                primary_gap=primary_gap,
+                secondary_gap=secondary_gap,
+                confidence_level=confidence,
+                recommendation=recommendation,
+                skill_traversal_path=["Root Analysis", primary_gap, *chain],
+                input_fingerprint=fingerprint,
+            ))
+        with transaction.atomic():
+            GapAnalysisReport.objects.bulk_create(
+                reports, update_conflicts=True, unique_fields=['attempt'], update_fields=REPORT_UPDATE_FIELDS,
+            )
+            if any(report.pk is None for report in reports):
+                # Backends that don't return ids from an upsert.
+                ids = dict(GapAnalysisReport.objects.filter(attempt_id__in=attempt_ids).values_list('attempt_id', 'id'))
+                for report in reports:
+                    report.pk = ids[report.attempt_id]
+
+            skills = []
+            for report, chain, is_logic_high, is_code_high in zip(reports, chains, logic_high, code_high):
+                scores = skill_scores.get(report.attempt_id)
+                if not scores:
+                    # No tagged questions answered: fall back to the section scores.
+                    skills.append(SkillAnalysis(report=report, skill_name="Python Syntax", status='STRONG' if is_code_high else 'WEAK'))
+                    skills.append(SkillAnalysis(report=report, skill_name="Logic Building", status='STRONG' if is_logic_high else 'WEAK'))
+                    continue
+                for skill_id, score in scores.items():
+                    name = graph.names[graph.index[skill_id]] if skill_id in graph.index else str(skill_id)
+                    if name in chain:
+                        status = SkillAnalysis.Status.GAP
+                    else:
+                        status = SkillAnalysis.Status.STRONG if score >= HIGH else SkillAnalysis.Status.WEAK
+                    skills.append(SkillAnalysis(report=report, skill_name=name, status=status, score_impact=round(score - HIGH, 2)))
+            SkillAnalysis.objects.bulk_create(
+                skills, update_conflicts=True, unique_fields=['report', 'skill_name'], update_fields=['status', 'score_impact'],
+            )
+            # Skill rows a report no longer produces (scores or rules changed).
+            current = {(skill.report.pk, skill.skill_name) for skill in skills}
+            stale = [
+                skill_id for skill_id, report_id, skill_name
+                in SkillAnalysis.objects.filter(report__in=reports).values_list('id', 'report_id', 'skill_name')
+                if (report_id, skill_name) not in current
+            ]
+            if stale:
+                SkillAnalysis.objects.filter(id__in=stale).delete()
+            # Upserts bypass model signals; drop the cached responses here.
+            invalidate(*(cache_key('report', attempt_id) for attempt_id in attempt_ids))
+        return len(reports)
+
+    @staticmethod
+    def _analyze_chunk(attempt_ids):
+        # Runs in a pool worker; rows are re-read there so only ids are pickled.
+        rows = AssignmentAttempt.objects.filter(id__in=attempt_ids).values_list(*ATTEMPT_COLUMNS)
+        return InferenceEngine._analyze_rows(list(rows))
+
+    @staticmethod
+    def analyze_attempts(attempts, chunk_size=1000, workers=1):
+        """
+        Re-analyzes a whole cohort. `attempts` is an AssignmentAttempt queryset
+        or an iterable of attempt ids. Attempts are streamed in chunks and each
+        chunk is written with bulk upserts; with workers > 1 the chunks are
+        spread over a process pool. Attempts whose report is already current
+        are skipped. Returns the number of reports written.
+        """
+        if not isinstance(attempts, QuerySet):
+            attempts = AssignmentAttempt.objects.filter(id__in=list(attempts))
+        attempts = attempts.order_by('id')
+
+        if workers <= 1:
+            analyzed = 0
+            chunk = []
+            for row in stream_rows(attempts.values_list(*ATTEMPT_COLUMNS), chunk_size):
+                chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    analyzed += InferenceEngine._analyze_rows(chunk)
+                    chunk = []
+            return analyzed + InferenceEngine._analyze_rows(chunk)
+
+        ids = list(attempts.values_list('id', flat=True).iterator(chunk_size=chunk_size))
+        chunks = [ids[start:start + chunk_size] for start in range(0, len(ids), chunk_size)]
+        # Forked workers must not share the parent's database connections.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            return sum(pool.map(InferenceEngine._analyze_chunk, chunks))
+
     @staticmethod
     def analyze_attempt(attempt_id):
         """
         Main entry point for AI Analysis.
         Consumes scores, identifies gaps, traverses skill graph, and generates report.
         """
-        attempt = AssignmentAttempt.objects.get(id=attempt_id)
-        
-        # 1. Normalize Scores (0-100)
-        # Assuming scores are already 0-100 in database.
-        quiz_score = attempt.concept_score
-        logic_score = attempt.logic_score
-        code_score = attempt.execution_score
-        
-        # 2. Rule-Based Inference (The 5 Rules)
-        primary_gap = "Unknown"
-        secondary_gap = ""
-        recommendation = "Practice more."
-        confidence = 0.0
-        
-        # Thresholds (High >= 60, Low < 60) - Heuristic for analysis
-        HIGH = 60.0
-        
-        is_quiz_high = quiz_score >= HIGH
-        is_logic_high = logic_score >= HIGH
-        is_code_high = code_score >= HIGH
-        
-        if is_quiz_high and not is_code_high:
-            # Rule 1: High Quiz + Low Coding
-            primary_gap = "Execution Gap"
-            secondary_gap = "Application of Theory"
-            recommendation = "You understand the concepts but struggle to apply them. Focus on writing more code from scratch rather than just reading."
-            confidence = 85.0
-            
-        elif is_logic_high and not is_code_high:
-            # Rule 2: High Logic + Low Coding
-            primary_gap = "Syntax/Implementation Gap"
-            secondary_gap = "Language Constructs"
-            recommendation = "Your logic is sound, but you struggle with the language syntax. Practice coding simple problems to build muscle memory."
-            confidence = 80.0
-            
-        elif not is_quiz_high and is_code_high:
-            # Rule 3: Low Quiz + High Coding
-            primary_gap = "Conceptual Gap"
-            secondary_gap = "Theoretical Foundation"
-            recommendation = "You are a practical learner but lack theoretical depth. Review the core concepts to ensure you aren't just memorizing patterns."
-            confidence = 85.0
-            
-        elif not is_logic_high and not is_code_high:
-            # Rule 4: Low Logic + Low Coding (Foundational)
-            primary_gap = "Foundational Logic Gap"
-            secondary_gap = "Algorithmic Thinking"
-            recommendation = "You are struggling with both dry-runs and coding. Start with flowcharting and dry-running code on paper before typing."
-            confidence = 90.0
-            
-        elif is_quiz_high and is_logic_high and is_code_high:
-            # Rule 5: High All
-            primary_gap = "None"
-            secondary_gap = "Optimization"
-            recommendation = "You are industry-ready! Focus on advanced optimization and system design."
-            confidence = 95.0
-        else:
-            # Mixed/Edge cases
-            primary_gap = "Mixed Gap"
-            secondary_gap = "General Practice"
-            recommendation = "Your performance is varied. identifying specific weak spots in sub-skills is recommended."
-            confidence = 60.0
-
-        # 3. Create Report
-        report, created = GapAnalysisReport.objects.update_or_create(
-            attempt=attempt,
-            defaults={
-                'student': attempt.user,
-                'primary_gap': primary_gap,
-                'secondary_gap': secondary_gap,
-                'confidence_level': confidence,
-                'recommendation': recommendation,
-                'skill_traversal_path': ["Root Analysis", primary_gap] # Placeholder for full graph
-            }
-        )
-        
-        # 4. Save Skill Analysis (Mock for now)
-        SkillAnalysis.objects.create(report=report, skill_name="Python Syntax", status='STRONG' if is_code_high else 'WEAK')
-        SkillAnalysis.objects.create(report=report, skill_name="Logic Building", status='STRONG' if is_logic_high else 'WEAK')
-        
-        return report
+        rows = list(AssignmentAttempt.objects.filter(id=attempt_id).values_list(*ATTEMPT_COLUMNS))
+        if not rows:
+            raise AssignmentAttempt.DoesNotExist(f"AssignmentAttempt {attempt_id} does not exist")
+        # Repeated generate calls for unchanged scores write nothing.
+        InferenceEngine._analyze_rows(rows)
+        return GapAnalysisReport.objects.select_related('student').get(attempt_id=attempt_id)
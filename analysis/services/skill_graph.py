@@ -0,0 +1,220 @@
+"""
+Skill prerequisite graph used for gap root-cause analysis.
+
+The Skill.prerequisites DAG is loaded once per process (two queries) into
+compact arrays:
+
+* ``offsets`` / ``targets`` - CSR adjacency: the prerequisites of node ``i``
+  are ``targets[offsets[i]:offsets[i + 1]]``.
+* ``order``                 - topological order, prerequisites first.
+* ``closure``               - per node, an int bitset of every transitive
+  prerequisite, so "is A (indirectly) required by B" is one AND.
+
+Traversals run over these arrays in O(V + E) with no queries. Signals
+(analysis/signals.py) apply skill / edge changes to the loaded graph in place
+and bump a version in the shared cache so other processes reload.
+"""
+import hashlib
+import threading
+from collections import deque
+
+from django.core.cache import cache
+
+from assignments.models import Skill
+
+VERSION_CACHE_KEY = "skill_graph:version"
+
+
+class SkillGraphCycle(ValueError):
+    """Adding the edge would make a skill (indirectly) its own prerequisite."""
+
+
+class SkillGraph:
+    _current = None
+    _loaded_version = None
+    _lock = threading.Lock()
+
+    def __init__(self, skills, edges):
+        # skills: {skill_id: name}; edges: {(skill_id, prerequisite_id), ...}
+        self._skills = dict(skills)
+        self._edges = set(edges)
+        self._build()
+
+    # -- loading ----------------------------------------------------------
+
+    @classmethod
+    def load(cls):
+        skills = dict(Skill.objects.values_list('id', 'name'))
+        edges = set(Skill.prerequisites.through.objects.values_list('from_skill_id', 'to_skill_id'))
+        return cls(skills, edges)
+
+    @classmethod
+    def get(cls):
+        """The process-wide graph, reloaded when another process changed it."""
+        version = cache.get(VERSION_CACHE_KEY, 0)
+        with cls._lock:
+            if cls._current is None or cls._loaded_version != version:
+                cls._current = cls.load()
+                cls._loaded_version = version
+            return cls._current
+
+    @classmethod
+    def changed(cls, apply=None):
+        """
+        Called after skills / prerequisites change. `apply(graph)` updates the
+        loaded graph in place; other processes see the new version and reload.
+        The delta is only applied when the loaded graph is exactly one version
+        behind: otherwise it missed other processes' changes, and patching it
+        would stamp a stale graph as current.
+        """
+        try:
+            version = cache.incr(VERSION_CACHE_KEY)
+        except ValueError:
+            cache.add(VERSION_CACHE_KEY, 0, timeout=None)
+            version = cache.incr(VERSION_CACHE_KEY)
+        with cls._lock:
+            if cls._current is not None and apply is not None and cls._loaded_version == version - 1:
+                apply(cls._current)
+                cls._loaded_version = version
+            else:
+                cls._current = None
+
+    # -- building ---------------------------------------------------------
+
+    def _build(self):
+        ids = sorted(self._skills)
+        self.index = {skill_id: position for position, skill_id in enumerate(ids)}
+        self.ids = ids
+        self.names = [self._skills[skill_id] for skill_id in ids]
+
+        prerequisites = [[] for _ in ids]
+        for skill_id, prerequisite_id in self._edges:
+            if skill_id in self.index and prerequisite_id in self.index:
+                prerequisites[self.index[skill_id]].append(self.index[prerequisite_id])
+        self.offsets = [0]
+        self.targets = []
+        for row in prerequisites:
+            self.targets.extend(sorted(row))
+            self.offsets.append(len(self.targets))
+
+        # Kahn's algorithm over prerequisite -> dependent edges.
+        size = len(ids)
+        dependents = [[] for _ in ids]
+        pending = [0] * size
+        for node in range(size):
+            for prerequisite in self.prerequisites_of(node):
+                dependents[prerequisite].append(node)
+                pending[node] += 1
+        ready = deque(node for node in range(size) if not pending[node])
+        order = []
+        while ready:
+            node = ready.popleft()
+            order.append(node)
+            for dependent in dependents[node]:
+                pending[dependent] -= 1
+                if not pending[dependent]:
+                    ready.append(dependent)
+        if len(order) != size:
+            raise SkillGraphCycle("Skill prerequisites contain a cycle")
+        self.order = order
+
+        closure = [0] * size
+        for node in order:
+            bits = 0
+            for prerequisite in self.prerequisites_of(node):
+                bits |= closure[prerequisite] | (1 << prerequisite)
+            closure[node] = bits
+        self.closure = closure
+
+        digest = hashlib.sha256(repr((sorted(self._skills.items()), sorted(self._edges))).encode())
+        self.version = digest.hexdigest()[:16]
+
+    def prerequisites_of(self, node):
+        return self.targets[self.offsets[node]:self.offsets[node + 1]]
+
+    # -- incremental updates ----------------------------------------------
+
+    def add_skill(self, skill_id, name):
+        self._skills[skill_id] = name
+        self._build()
+
+    def remove_skill(self, skill_id):
+        self._skills.pop(skill_id, None)
+        self._edges = {edge for edge in self._edges if skill_id not in edge}
+        self._build()
+
+    def add_edges(self, edges):
+        edges = set(edges)
+        for skill_id, prerequisite_id in edges:
+            if self.would_create_cycle(skill_id, prerequisite_id):
+                raise SkillGraphCycle(f"Skill {prerequisite_id} already depends on skill {skill_id}")
+        self._edges |= edges
+        self._build()
+
+    def remove_edges(self, edges):
+        self._edges -= set(edges)
+        self._build()
+
+    # -- queries ----------------------------------------------------------
+
+    def requires(self, skill_id, prerequisite_id):
+        """True if `prerequisite_id` is a direct or transitive prerequisite."""
+        if skill_id not in self.index or prerequisite_id not in self.index:
+            return False
+        return bool(self.closure[self.index[skill_id]] >> self.index[prerequisite_id] & 1)
+
+    def would_create_cycle(self, skill_id, prerequisite_id):
+        return skill_id == prerequisite_id or self.requires(prerequisite_id, skill_id)
+
+    def root_cause(self, scores, threshold):
+        """
+        Finds the deepest failing prerequisite chain for one attempt.
+
+        `scores` maps skill ids to 0-100 scores; a skill is failing below
+        `threshold`, passing at or above it, and skills without a score are
+        looked through. Returns the chain as skill names, from the failing
+        skill that was observed down to its deepest failing prerequisite (the
+        likely root cause), or [] when nothing fails. One pass in
+        topological order: O(V + E).
+        """
+        size = len(self.ids)
+        failing = [None] * size
+        for skill_id, score in scores.items():
+            node = self.index.get(skill_id)
+            if node is not None:
+                failing[node] = score < threshold
+
+        # depth[n]: failing skills on the longest failing chain ending at n's
+        # deepest prerequisite; below[n]: next node on that chain.
+        depth = [0] * size
+        below = [None] * size
+        for node in self.order:
+            if failing[node] is False:
+                continue
+            best, best_next = 0, None
+            for prerequisite in self.prerequisites_of(node):
+                if failing[prerequisite] is False:
+                    continue
+                if depth[prerequisite] > best or (
+                    depth[prerequisite] == best and best_next is not None
+                    and self._weaker(prerequisite, best_next, scores)
+                ):
+                    best, best_next = depth[prerequisite], prerequisite
+            depth[node] = best + (1 if failing[node] else 0)
+            below[node] = best_next
+
+        candidates = [node for node in range(size) if failing[node]]
+        if not candidates:
+            return []
+        start = max(candidates, key=lambda node: (depth[node], -scores[self.ids[node]]))
+        path = []
+        node = start
+        while node is not None:
+            if failing[node]:
+                path.append(self.names[node])
+            node = below[node]
+        return path
+
+    def _weaker(self, node, other, scores):
+        missing = float('inf')
+        return scores.get(self.ids[node], missing) < scores.get(self.ids[other], missing)
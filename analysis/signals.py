@@ -0,0 +1,43 @@
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from aptify.http_cache import cache_key, invalidate
+from assignments.models import Skill
+from .models import GapAnalysisReport
+from .services.skill_graph import SkillGraph
+
+@receiver(post_save, sender=Skill)
+def skill_saved(sender, instance, **kwargs):
+    transaction.on_commit(lambda: SkillGraph.changed(lambda graph: graph.add_skill(instance.pk, instance.name)))
+
+@receiver(post_delete, sender=Skill)
+def skill_deleted(sender, instance, **kwargs):
+    transaction.on_commit(lambda: SkillGraph.changed(lambda graph: graph.remove_skill(instance.pk)))
+
+@receiver(m2m_changed, sender=Skill.prerequisites.through)
+def prerequisites_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # Forward: instance gains prerequisites pk_set. Reverse: instance becomes a
+    # prerequisite of pk_set. Edges are (skill_id, prerequisite_id).
+    if pk_set:
+        edges = {(pk, instance.pk) if reverse else (instance.pk, pk) for pk in pk_set}
+    else:
+        edges = set()
+
+    if action == 'pre_add':
+        graph = SkillGraph.get()
+        for skill_id, prerequisite_id in edges:
+            if graph.would_create_cycle(skill_id, prerequisite_id):
+                raise ValidationError(f"Skill {prerequisite_id} already depends on skill {skill_id}; that would be a cycle.")
+    elif action == 'post_add':
+        transaction.on_commit(lambda: SkillGraph.changed(lambda graph: graph.add_edges(edges)))
+    elif action == 'post_remove':
+        transaction.on_commit(lambda: SkillGraph.changed(lambda graph: graph.remove_edges(edges)))
+    elif action == 'post_clear':
+        # The cleared edges aren't known here; reload on next use.
+        transaction.on_commit(SkillGraph.changed)
+
+@receiver(post_save, sender=GapAnalysisReport)
+@receiver(post_delete, sender=GapAnalysisReport)
+def report_changed(sender, instance, **kwargs):
+    invalidate(cache_key('report', instance.attempt_id))
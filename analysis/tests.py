@@ -0,0 +1,32 @@
+from django.test import TestCase
+
+from assignments.models import Assignment, AssignmentAttempt
+from users.models import User
+
+
+class SkillProfileAccessTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner", email="owner@example.com", password="pw-owner-1")
+        cls.other = User.objects.create_user(username="other", email="other@example.com", password="pw-other-1")
+        cls.recruiter = User.objects.create_user(
+            username="recruiter", email="recruiter@example.com", password="pw-recruiter-1", role="recruiter"
+        )
+        assignment = Assignment.objects.create(title="Profile access")
+        cls.attempt = AssignmentAttempt.objects.create(user=cls.owner, assignment=assignment)
+
+    def get(self, user, path):
+        self.client.force_login(user)
+        return self.client.get(f"/api/analysis/skills/{path}")
+
+    def test_owner_reads_own_profiles(self):
+        self.assertEqual(self.get(self.owner, f"attempt/{self.attempt.id}").status_code, 200)
+        self.assertEqual(self.get(self.owner, f"user/{self.owner.id}").status_code, 200)
+
+    def test_other_candidate_is_refused(self):
+        self.assertEqual(self.get(self.other, f"attempt/{self.attempt.id}").status_code, 404)
+        self.assertEqual(self.get(self.other, f"user/{self.owner.id}").status_code, 403)
+
+    def test_recruiter_reads_any_profile(self):
+        self.assertEqual(self.get(self.recruiter, f"attempt/{self.attempt.id}").status_code, 200)
+        self.assertEqual(self.get(self.recruiter, f"user/{self.owner.id}").status_code, 200)
@@ -1,11 +1,25 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from aptify.http_cache import cache_key, get_entry, make_etag
+from .api import report_payload
 from .models import GapAnalysisReport
 from assignments.models import AssignmentAttempt
 from .services.inference_engine import InferenceEngine
 
+def report_etag(request, attempt_id):
+    # Shares the API's cached report entry; None (no report yet) skips the check.
+    def build():
+        report = GapAnalysisReport.objects.select_related('student').filter(attempt_id=attempt_id).first()
+        return report_payload(report) if report else None
+    entry = get_entry(cache_key('report', attempt_id), build)
+    return make_etag("html" + entry["etag"]) if entry else None
+
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=report_etag)
 def report_view(request, attempt_id):
     # Try to get existing report
-    report = GapAnalysisReport.objects.filter(attempt_id=attempt_id).first()
+    report = GapAnalysisReport.objects.select_related('student').filter(attempt_id=attempt_id).first()
     
     if not report:
         # If not exists, should we generate it on the fly?
@@ -1,4 +1,8 @@
+from django.conf import settings
+from django.http import HttpResponse
 from ninja import NinjaAPI, Router
+from aptify.auth import metrics_auth
+from aptify.db import check_database, pool_stats
 from assignments.api import router as assignments_router
 from analysis.api import router as analysis_router
 
@@ -14,3 +18,44 @@ api.add_router("/assignments", assignments_router)
 api.add_router("/analysis", analysis_router)
 
 
+@api.get("/health", tags=["ops"])
+def health(request):
+    """
+    Readiness probe for load balancers: 200 when every database answers,
+    503 otherwise. Unauthenticated; reports nothing but status and latency.
+    """
+    databases = {alias: check_database(alias) for alias in settings.DATABASES}
+    ok = all(result["ok"] for result in databases.values())
+    payload = {
+        "status": "ok" if ok else "unavailable",
+        "databases": {alias: {"ok": r["ok"], "latency_ms": r["latency_ms"]} for alias, r in databases.items()},
+    }
+    return api.create_response(request, payload, status=200 if ok else 503)
+
+
+@api.get("/metrics", auth=metrics_auth, tags=["ops"])
+def metrics(request, format: str = "json"):
+    """
+    Connection pool counters and database round-trip latency of this
+    process. `format=prometheus` returns the text exposition format.
+    """
+    databases = {}
+    for alias in settings.DATABASES:
+        check = check_database(alias)
+        databases[alias] = {
+            "ok": check["ok"],
+            "latency_ms": check["latency_ms"],
+            "pool": pool_stats(alias),
+        }
+    if format != "prometheus":
+        return {"databases": databases}
+
+    lines = []
+    for alias, values in databases.items():
+        lines.append(f'aptify_db_up{{alias="{alias}"}} {int(values["ok"])}')
+        lines.append(f'aptify_db_latency_ms{{alias="{alias}"}} {values["latency_ms"]}')
+        for name, value in (values["pool"] or {}).items():
+            lines.append(f'aptify_db_{name}{{alias="{alias}"}} {value}')
+    return HttpResponse("\n".join(lines) + "\n", content_type="text/plain; version=0.0.4")
+
+
@@ -1,4 +1,20 @@
+from django.conf import settings
+
+
 def django_auth(request):
     if request.user.is_authenticated:
         return request.user
     return None
+
+def is_recruiter(user):
+    """Recruiters, admins and staff may read every candidate's results."""
+    return user.is_staff or user.role in ('recruiter', 'admin')
+
+def metrics_auth(request):
+    """Staff sessions, or `Authorization: Bearer <METRICS_TOKEN>` for scrapers."""
+    token = settings.METRICS_TOKEN
+    if token and request.headers.get("Authorization") == f"Bearer {token}":
+        return "metrics"
+    if request.user.is_authenticated and request.user.is_staff:
+        return request.user
+    return None
@@ -0,0 +1,76 @@
+"""
+Database connection helpers: health checks, connection pool metrics and
+row streaming that also works behind a transaction-mode pooler.
+
+With ``DB_POOLER=pgbouncer`` (Supabase's port 6543 pooler, PgBouncer in
+transaction mode) consecutive statements may run on different server
+connections, so settings turn off server-side cursors. ``iterator()`` then
+fetches the whole result at once; ``stream_rows()`` walks the id index in
+keyset batches instead. With ``DB_POOL=true`` each process keeps a psycopg
+pool, whose counters ``pool_stats()`` reports.
+"""
+import time
+
+from django.db import connections
+
+# psycopg_pool.ConnectionPool.get_stats() counters exported as metrics.
+POOL_STATS = (
+    "pool_min", "pool_max", "pool_size", "pool_available", "requests_waiting",
+    "requests_num", "requests_queued", "requests_wait_ms", "requests_errors",
+    "connections_num", "connections_ms", "connections_errors", "connections_lost",
+)
+
+
+def server_side_cursors(alias="default"):
+    return not connections[alias].settings_dict.get("DISABLE_SERVER_SIDE_CURSORS")
+
+
+def stream_rows(queryset, chunk_size=2000):
+    """
+    Yields the rows of a values_list() queryset ordered by id with "id" as
+    its first column, in constant memory. Uses a server-side cursor when the
+    connection allows it, keyset batches on id otherwise.
+    """
+    if server_side_cursors(queryset.db):
+        yield from queryset.iterator(chunk_size=chunk_size)
+        return
+    last_id = None
+    while True:
+        batch = queryset if last_id is None else queryset.filter(id__gt=last_id)
+        rows = list(batch[:chunk_size])
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last_id = rows[-1][0]
+
+
+def pool_stats(alias="default"):
+    """
+    Counters of the connection's psycopg pool (see POOL_STATS) plus the mean
+    checkout wait, or None when the alias has no pool. Counters are per
+    process and cumulative since the pool started.
+    """
+    pool = getattr(connections[alias], "pool", None)
+    if pool is None:
+        return None
+    raw = pool.get_stats()
+    stats = {name: raw.get(name, 0) for name in POOL_STATS}
+    stats["checkout_wait_ms_avg"] = (
+        round(stats["requests_wait_ms"] / stats["requests_num"], 3) if stats["requests_num"] else 0.0
+    )
+    return stats
+
+
+def check_database(alias="default"):
+    """
+    Runs SELECT 1 on `alias`. Returns {"ok", "latency_ms", "error"}; the
+    latency includes getting a connection (from the pool, if there is one).
+    """
+    started = time.perf_counter()
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+    except Exception as exc:
+        return {"ok": False, "latency_ms": round((time.perf_counter() - started) * 1000.0, 3), "error": str(exc)}
+    return {"ok": True, "latency_ms": round((time.perf_counter() - started) * 1000.0, 3), "error": None}
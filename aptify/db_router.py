@@ -0,0 +1,148 @@
+"""
+Read-replica routing with read-your-writes stickiness.
+
+Reads of the models in READ_REPLICAS["MODELS"] (reports and skill rollups)
+go to a random replica; so do querysets that ask for ``read_replica()``
+explicitly (exports, listings, dashboards). Everything else, and every
+write, stays on the primary. A request that wrote anything keeps reading
+from the primary for the rest of the request, and its response carries a
+short-lived cookie (READ_REPLICAS["STICKY_SECONDS"]) that keeps the
+browser's next requests on the primary too, so nobody reads their own
+answers back from a lagging replica. Reads inside a transaction on the
+primary never leave it.
+
+Without configured replicas every alias resolves to the primary and the
+router is a no-op.
+"""
+import contextvars
+import random
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+DEFAULT_REPLICA_SETTINGS = {
+    "ALIASES": [],
+    "MODELS": [],
+    "STICKY_SECONDS": 10,
+    "COOKIE": "aptify_primary",
+}
+
+
+def replica_settings():
+    return {**DEFAULT_REPLICA_SETTINGS, **getattr(settings, "READ_REPLICAS", {})}
+
+
+class _RequestState:
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+# Per request (set by the middleware); mutated in place so writes made in
+# sync_to_async threads of an async view are seen by the middleware too.
+_state = contextvars.ContextVar("aptify_db_routing", default=None)
+
+
+def pin_primary():
+    """Sends the rest of this request's (or this thread's) reads to the primary."""
+    state = _state.get()
+    if state is None:
+        # Outside a request (commands, grading consumers): stick for good.
+        state = _RequestState()
+        _state.set(state)
+    state.pinned = state.wrote = True
+
+
+@contextmanager
+def use_primary():
+    """Reads inside the block go to the primary, whatever the request did before."""
+    token = _state.set(_RequestState(pinned=True))
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+def _pinned():
+    state = _state.get()
+    return state is not None and state.pinned
+
+
+def read_replica():
+    """
+    Alias for a read that may lag behind the primary: a random replica, or
+    the primary when there is none or this request has to see its writes.
+    """
+    aliases = replica_settings()["ALIASES"]
+    if not aliases or _pinned() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return DEFAULT_DB_ALIAS
+    return random.choice(aliases)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            # Related objects come from wherever the instance was loaded.
+            return instance._state.db
+        if model._meta.label in replica_settings()["MODELS"]:
+            return read_replica()
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        pin_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in replica_settings()["ALIASES"]
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Opens the per-request routing state (pinned if the sticky cookie is
+    present) and sets the cookie on responses to requests that wrote.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = _RequestState(pinned=replica_settings()["COOKIE"] in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._stick(response, state)
+
+    async def __acall__(self, request):
+        state = _RequestState(pinned=replica_settings()["COOKIE"] in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._stick(response, state)
+
+    @staticmethod
+    def _stick(response, state):
+        config = replica_settings()
+        if state.wrote and config["ALIASES"]:
+            response.set_cookie(
+                config["COOKIE"], "1", max_age=config["STICKY_SECONDS"], httponly=True, samesite="Lax",
+            )
+        return response
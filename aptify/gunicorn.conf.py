@@ -0,0 +1,36 @@
+"""
+Gunicorn profile for serving AptiFy over ASGI with uvicorn workers:
+
+    gunicorn -c aptify/gunicorn.conf.py aptify.asgi:application
+
+Each worker is a single event loop. The async endpoints (code submit and
+status long-poll / SSE, attempt summary, gap report) wait on that loop, so
+one process keeps thousands of connections open; sync endpoints still run
+in Django's thread executor. See DEPLOYMENT.md.
+"""
+import multiprocessing
+import os
+
+# Read by aptify.settings (persistent DB connections are off under ASGI).
+os.environ.setdefault("ASGI_SERVER", "true")
+
+bind = f"{os.environ.get('HOST', '0.0.0.0')}:{os.environ.get('PORT', '8000')}"
+worker_class = "uvicorn_worker.UvicornWorker"
+# Every web worker starts its own sandbox pool (SANDBOX_WORKERS processes), so
+# keep this near the core count and scale grading separately.
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+
+# Long-polls hold a request for up to GRADING_QUEUE_LONG_POLL_MAX seconds and
+# SSE streams until grading finishes; the worker timeout only has to cover a
+# blocked event loop, not an open connection.
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+# Longer than a typical load balancer idle timeout (60s), so the proxy closes first.
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 75))
+
+# Recycle workers now and then; jitter keeps them from restarting together.
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 20000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 2000))
+
+accesslog = os.environ.get("GUNICORN_ACCESSLOG", "-")
+forwarded_allow_ips = os.environ.get("FORWARDED_ALLOW_IPS", "127.0.0.1")
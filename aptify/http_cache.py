@@ -0,0 +1,159 @@
+"""
+Response cache with strong ETags for read-mostly JSON endpoints and pages.
+
+Payloads are serialized once and stored in Django's cache together with a
+strong ETag (a hash of the exact response body). Requests carrying a matching
+``If-None-Match`` get a bodiless 304, and neither case touches the database
+while the entry is cached. Writers call ``invalidate()`` with the same
+``cache_key()``; it bumps the key's version once their transaction commits.
+Entries are stored under the version read *before* the payload was built, so
+a build that raced a write lands under the old version and is never served.
+``aget_entry()`` and ``acached_json_response()`` are the same for async views.
+
+The cache must be shared by every web process (Redis / Memcached via
+CACHE_URL): with the per-process default, an invalidation only reaches the
+process that made the write.
+
+Payloads are always built from the primary database: an entry built from a
+replica that hasn't replayed the write behind the last invalidation would
+stay stale until the next one. Read storms are absorbed by the cache.
+"""
+import hashlib
+import json
+import time
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+
+from aptify.db_router import use_primary
+
+DEFAULT_TIMEOUT = 60 * 60
+
+# Per-user data: browsers may keep it but must revalidate every time.
+CACHE_CONTROL = "private, no-cache"
+
+
+def cache_key(kind, object_id):
+    return f"http:{kind}:{object_id}"
+
+
+def _version_key(key):
+    return f"{key}:version"
+
+
+def _versioned(key, version):
+    return f"{key}:{version}"
+
+
+def _fresh_version():
+    # Not a small counter: if the version itself is evicted, restarting from
+    # a new value keeps entries stored under the old ones unreachable.
+    return time.time_ns()
+
+
+def _version(key):
+    version = cache.get(_version_key(key))
+    if version is None:
+        cache.add(_version_key(key), _fresh_version(), None)
+        version = cache.get(_version_key(key))
+    return version
+
+
+async def _aversion(key):
+    version = await cache.aget(_version_key(key))
+    if version is None:
+        await cache.aadd(_version_key(key), _fresh_version(), None)
+        version = await cache.aget(_version_key(key))
+    return version
+
+
+def make_etag(body):
+    if isinstance(body, str):
+        body = body.encode()
+    return '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+
+
+def etag_matches(request, etag):
+    header = request.headers.get("If-None-Match")
+    if not header or etag is None:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so a W/ prefix is ignored.
+    candidates = (candidate.strip() for candidate in header.split(","))
+    return etag in (candidate[2:] if candidate.startswith("W/") else candidate for candidate in candidates)
+
+
+def get_entry(key, build, timeout=DEFAULT_TIMEOUT):
+    """
+    Returns {"etag", "body"} for `key`, building and caching it from
+    `build()` on a miss. `build` returns a JSON-serializable payload, or None
+    for "nothing to cache yet".
+    """
+    key = _versioned(key, _version(key))
+    entry = cache.get(key)
+    if entry is None:
+        with use_primary():
+            payload = build()
+        if payload is None:
+            return None
+        body = json.dumps(payload, cls=DjangoJSONEncoder)
+        entry = {"etag": make_etag(body), "body": body}
+        cache.set(key, entry, timeout)
+    return entry
+
+
+async def aget_entry(key, abuild, timeout=DEFAULT_TIMEOUT):
+    """get_entry() with the async cache API; `abuild` is a coroutine function."""
+    key = _versioned(key, await _aversion(key))
+    entry = await cache.aget(key)
+    if entry is None:
+        with use_primary():
+            payload = await abuild()
+        if payload is None:
+            return None
+        body = json.dumps(payload, cls=DjangoJSONEncoder)
+        entry = {"etag": make_etag(body), "body": body}
+        await cache.aset(key, entry, timeout)
+    return entry
+
+
+def cached_json_response(request, key, build, timeout=DEFAULT_TIMEOUT):
+    """JSON response (or 304) for a cached payload; see get_entry()."""
+    return _entry_response(request, get_entry(key, build, timeout))
+
+
+async def acached_json_response(request, key, abuild, timeout=DEFAULT_TIMEOUT):
+    """cached_json_response() for async views."""
+    return _entry_response(request, await aget_entry(key, abuild, timeout))
+
+
+def _entry_response(request, entry):
+    if entry is None:
+        return None
+    if etag_matches(request, entry["etag"]):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(entry["body"], content_type="application/json")
+    response["ETag"] = entry["etag"]
+    response["Cache-Control"] = CACHE_CONTROL
+    return response
+
+
+def invalidate(*keys):
+    """
+    Retires the cached responses once the current transaction commits: the
+    next read builds under a new version, old entries simply expire.
+    """
+    keys = list(keys)
+
+    def bump():
+        for key in keys:
+            try:
+                cache.incr(_version_key(key))
+            except ValueError:
+                # Never read (or evicted): any fresh version will do.
+                cache.set(_version_key(key), _fresh_version(), None)
+    transaction.on_commit(bump)
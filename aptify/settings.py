@@ -81,6 +81,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    # Before anything that may write, so those writes pin the request to the primary.
+    "aptify.db_router.ReplicaStickinessMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -180,8 +182,181 @@ else:
             }
         }
 
-# Connection lifetime
-DATABASES["default"].setdefault("CONN_MAX_AGE", env.int("CONN_MAX_AGE", 600))
+# Read replicas (aptify.db_router): DATABASE_REPLICA_URLS=postgres://...,postgres://...
+# become replica_1, replica_2, ... Reports and skill rollups, exports and listings read
+# from them; writes and grading stay on the primary. A request that wrote reads from
+# the primary, and so does the same browser for STICKY_SECONDS afterwards (covering
+# replication lag).
+for _index, _url in enumerate(env.list("DATABASE_REPLICA_URLS", default=[]), start=1):
+    _replica = environ.Env.db_url_config(_url)
+    if "sslmode" in DATABASES["default"].get("OPTIONS", {}):
+        _replica.setdefault("OPTIONS", {}).setdefault("sslmode", DATABASES["default"]["OPTIONS"]["sslmode"])
+    _replica["TEST"] = {"MIRROR": "default"}
+    DATABASES[f"replica_{_index}"] = _replica
+
+READ_REPLICAS = {
+    "ALIASES": [alias for alias in DATABASES if alias != "default"],
+    "MODELS": [
+        "analysis.GapAnalysisReport", "analysis.SkillAnalysis",
+        "assignments.SkillScore", "assignments.UserSkillScore",
+    ],
+    "STICKY_SECONDS": env.int("DATABASE_REPLICA_STICKY_SECONDS", default=10),
+    "COOKIE": "aptify_primary",
+}
+DATABASE_ROUTERS = ["aptify.db_router.ReplicaRouter"]
+
+# Served through aptify.asgi (see aptify/gunicorn.conf.py and DEPLOYMENT.md)?
+ASGI_SERVER = env.bool("ASGI_SERVER", default=False)
+
+# Postgres connection handling (aptify.db, DEPLOYMENT.md)
+# DB_POOLER=pgbouncer: DATABASE_URL points at a transaction-mode pooler (Supabase's
+# port 6543, PgBouncer). Statements of one session may run on different server
+# connections there, so server-side cursors and prepared statements are turned off.
+# DB_POOL: psycopg's connection pool in every process (needs psycopg[pool]). With
+# CONN_HEALTH_CHECKS, connections are checked on checkout, so one the server (or
+# pooler) dropped is replaced instead of failing the request.
+DB_POOLER = env("DB_POOLER", default="")
+DB_POOL = {
+    "ENABLED": env.bool("DB_POOL", default=False),
+    "MIN_SIZE": env.int("DB_POOL_MIN_SIZE", default=2),
+    "MAX_SIZE": env.int("DB_POOL_MAX_SIZE", default=10),
+    # Longest a request waits for a free connection before failing.
+    "TIMEOUT": env.float("DB_POOL_TIMEOUT", default=10.0),
+    "MAX_IDLE": env.float("DB_POOL_MAX_IDLE", default=300.0),
+    "MAX_LIFETIME": env.float("DB_POOL_MAX_LIFETIME", default=1800.0),
+}
+
+# Applied to the primary and every replica alike; each alias gets its own pool.
+for _database in DATABASES.values():
+    if _database["ENGINE"] == "django.db.backends.postgresql":
+        _options = _database.setdefault("OPTIONS", {})
+        if DB_POOLER == "pgbouncer":
+            _database["DISABLE_SERVER_SIDE_CURSORS"] = True
+            _options["prepare_threshold"] = None
+            _options["server_side_binding"] = False
+        if DB_POOL["ENABLED"]:
+            _options["pool"] = {
+                "min_size": DB_POOL["MIN_SIZE"],
+                "max_size": DB_POOL["MAX_SIZE"],
+                "timeout": DB_POOL["TIMEOUT"],
+                "max_idle": DB_POOL["MAX_IDLE"],
+                "max_lifetime": DB_POOL["MAX_LIFETIME"],
+            }
+            # Pooled connections go back to the pool after every request.
+            _database["CONN_MAX_AGE"] = 0
+
+    # Connection lifetime. Under ASGI, async views run their queries on
+    # short-lived executor threads, where persistent connections would pile up
+    # instead of being reused, so they are off by default there (use DB_POOL).
+    _database.setdefault("CONN_MAX_AGE", env.int("CONN_MAX_AGE", 0 if ASGI_SERVER else 600))
+    # Persistent and pooled connections are pinged before reuse, so a database
+    # restart doesn't fail requests.
+    _database.setdefault("CONN_HEALTH_CHECKS", env.bool("CONN_HEALTH_CHECKS", default=True))
+
+# Bearer token for /api/metrics scrapers (staff sessions work without one).
+METRICS_TOKEN = env("METRICS_TOKEN", default="")
+
+
+# The covering index on CodingSubmission uses INCLUDE on Postgres; the sqlite
+# fallback simply builds it without the extra columns.
+SILENCED_SYSTEM_CHECKS = ["models.W040"]
+
+
+# Cache (e.g. CACHE_URL=redis://127.0.0.1:6379/1); per-process memory by default.
+# Any deployment with more than one web process needs a shared backend (Redis /
+# Memcached): the response cache (aptify.http_cache) and the answer-key / grading
+# caches invalidate through it, and a per-process cache only sees its own writes.
+CACHES = {
+    "default": env.cache_url("CACHE_URL", default="locmemcache://"),
+}
+
+# Answer keys of quiz / output questions (assignments.services.answer_key_cache):
+# a per-process LRU in front of the shared cache above.
+ANSWER_KEY_CACHE = {
+    "LOCAL_MAXSIZE": env.int("ANSWER_KEY_CACHE_LOCAL_MAXSIZE", default=4096),
+    "LOCAL_TTL": env.float("ANSWER_KEY_CACHE_LOCAL_TTL", default=30.0),
+    "SHARED_TTL": env.int("ANSWER_KEY_CACHE_SHARED_TTL", default=3600),
+}
+
+# Sandboxed code execution (assignments.services.execution_engine)
+# Each web process keeps SANDBOX_WORKERS warm workers; every test case runs in a
+# forked child limited to CPU_SECONDS of CPU, MEMORY_MB of extra address space and
+# WALL_SECONDS of wall-clock time.
+SANDBOX = {
+    "WORKERS": env.int("SANDBOX_WORKERS", default=4),
+    "CPU_SECONDS": env.int("SANDBOX_CPU_SECONDS", default=2),
+    "MEMORY_MB": env.int("SANDBOX_MEMORY_MB", default=256),
+    "WALL_SECONDS": env.float("SANDBOX_WALL_SECONDS", default=5.0),
+    "OUTPUT_BYTES": env.int("SANDBOX_OUTPUT_BYTES", default=1024 * 1024),
+    "ACQUIRE_TIMEOUT": env.float("SANDBOX_ACQUIRE_TIMEOUT", default=30.0),
+    # "full" runs every case on one worker; "fail_fast" stops at the first failure
+    # (pass/fail only); "fanout" shards the cases over up to FANOUT_SHARDS workers.
+    "GRADING_MODE": env("SANDBOX_GRADING_MODE", default="full"),
+    "FANOUT_SHARDS": env.int("SANDBOX_FANOUT_SHARDS", default=4),
+    # Workers clear their environment, chroot into JAIL_DIR (empty; default
+    # <tmp>/aptify-sandbox) and, when started as root, switch to UID/GID before
+    # running anything. They refuse to start unconfined unless ALLOW_UNCONFINED.
+    "UID": env.int("SANDBOX_UID", default=65534),
+    "GID": env.int("SANDBOX_GID", default=65534),
+    "JAIL_DIR": env("SANDBOX_JAIL_DIR", default=None),
+    "ALLOW_UNCONFINED": env.bool("SANDBOX_ALLOW_UNCONFINED", default=False),
+}
+
+
+# Empirical complexity estimation (assignments.services.complexity_estimator)
+# Submissions to questions with an input generator are re-run on inputs of doubling
+# size, from START_SIZE up to MAX_SIZE, within BUDGET_SECONDS per submission.
+COMPLEXITY_PROBE = {
+    "ENABLED": env.bool("COMPLEXITY_PROBE_ENABLED", default=True),
+    "BUDGET_SECONDS": env.float("COMPLEXITY_PROBE_BUDGET_SECONDS", default=3.0),
+    "START_SIZE": env.int("COMPLEXITY_PROBE_START_SIZE", default=16),
+    "MAX_SIZE": env.int("COMPLEXITY_PROBE_MAX_SIZE", default=1 << 16),
+}
+
+# Content-addressed test-case store (assignments.services.testcase_store)
+# Large test inputs / outputs live in ROOT as files named by their sha256; each
+# sandbox worker memory-maps them and keeps up to WORKER_CACHE_MB mapped.
+# `manage.py externalize_test_cases` moves inline cases of INLINE_MAX_BYTES or more.
+TESTCASE_STORE = {
+    "ROOT": env("TESTCASE_STORE_ROOT", default=str(BASE_DIR / "testcase_store")),
+    "INLINE_MAX_BYTES": env.int("TESTCASE_STORE_INLINE_MAX_BYTES", default=4096),
+    "WORKER_CACHE_MB": env.int("TESTCASE_STORE_WORKER_CACHE_MB", default=256),
+}
+
+# Sandbox results reused for identical (whitespace-normalized) code against the
+# same test-suite version (assignments.services.grading_cache).
+GRADING_CACHE = {
+    "ENABLED": env.bool("GRADING_CACHE_ENABLED", default=True),
+    "LOCAL_MAXSIZE": env.int("GRADING_CACHE_LOCAL_MAXSIZE", default=2048),
+    "LOCAL_TTL": env.float("GRADING_CACHE_LOCAL_TTL", default=30.0),
+    "SHARED_TTL": env.int("GRADING_CACHE_SHARED_TTL", default=24 * 60 * 60),
+}
+
+# Grading queue (assignments.services.grading_queue)
+# "local" grades inside each web process with CONSUMERS threads; "database" uses the
+# CodingSubmission table as the queue, consumed by `manage.py run_grading_workers`.
+GRADING_QUEUE = {
+    "BACKEND": env("GRADING_QUEUE_BACKEND", default="local"),
+    "CONSUMERS": env.int("GRADING_QUEUE_CONSUMERS", default=2),
+    "POLL_INTERVAL": env.float("GRADING_QUEUE_POLL_INTERVAL", default=0.5),
+    "LONG_POLL_MAX": env.float("GRADING_QUEUE_LONG_POLL_MAX", default=25.0),
+    "STALE_AFTER": env.float("GRADING_QUEUE_STALE_AFTER", default=120.0),
+    # A submission that crashes its sandbox worker (or whose grader dies) this many
+    # times is marked FAILED instead of being queued again.
+    "MAX_ATTEMPTS": env.int("GRADING_QUEUE_MAX_ATTEMPTS", default=3),
+}
+
+
+# Relative coding score baseline: "mean" (running averages) or "percentile"
+# (per-question quantile sketches, robust to outlier runs).
+SCORING = {
+    "MODE": env("SCORING_MODE", default="mean"),
+    # Timing the time score and benchmarks use: "wall" (execution_time_ms), "cpu"
+    # (cpu_time_ms, barely affected by host load) or "ops" (op_count, executed lines;
+    # deterministic, but tracing slows grading down). Run rebuild_question_benchmarks
+    # after changing it.
+    "TIME_METRIC": env("SCORING_TIME_METRIC", default="wall"),
+}
 
 
 # CUSTOM USER MODEL
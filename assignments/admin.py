@@ -1,7 +1,8 @@
 from django.contrib import admin
 from .models import (
     Assignment, Skill, Question, QuizQuestion, OutputGuessQuestion, CodingQuestion,
-    AssignmentAttempt, QuizSubmission, OutputGuessSubmission, CodingSubmission
+    AssignmentAttempt, QuizSubmission, OutputGuessSubmission, CodingSubmission,
+    QuestionBenchmark, SkillScore, UserSkillScore
 )
 
 @admin.register(Assignment)
@@ -12,6 +13,7 @@ class AssignmentAdmin(admin.ModelAdmin):
 @admin.register(Skill)
 class SkillAdmin(admin.ModelAdmin):
     list_display = ('name',)
+    filter_horizontal = ('prerequisites',)
 
 class QuizQuestionInline(admin.StackedInline):
     model = QuizQuestion
@@ -36,6 +38,22 @@ class AssignmentAttemptAdmin(admin.ModelAdmin):
     list_display = ('user', 'assignment', 'started_at', 'completed_at', 'concept_score', 'logic_score', 'execution_score')
     list_filter = ('assignment', 'started_at')
 
+@admin.register(QuestionBenchmark)
+class QuestionBenchmarkAdmin(admin.ModelAdmin):
+    list_display = ('question', 'submission_count', 'avg_time', 'avg_complexity', 'updated_at')
+    readonly_fields = ('submission_count', 'time_sum', 'time_sq_sum', 'complexity_sum', 'complexity_sq_sum')
+
+@admin.register(SkillScore)
+class SkillScoreAdmin(admin.ModelAdmin):
+    list_display = ('attempt', 'skill', 'sub_skill', 'answered', 'score')
+    list_filter = ('skill',)
+
+@admin.register(UserSkillScore)
+class UserSkillScoreAdmin(admin.ModelAdmin):
+    list_display = ('user', 'skill', 'answered', 'score', 'updated_at')
+    list_filter = ('skill',)
+    search_fields = ('user__username',)
+
 # Registering specialized question models separately if needed, 
 # though they are managed via QuestionAdmin inlines mostly.
 admin.site.register(QuizQuestion)
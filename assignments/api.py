@@ -1,9 +1,17 @@
+import json
 from typing import List, Optional
+from django.http import StreamingHttpResponse
 from ninja import Router, Schema
+from ninja.errors import HttpError
 from ninja.security import django_auth
-from django.shortcuts import get_object_or_404
-from assignments.models import AssignmentAttempt, Question
-from assignments.services.submission_service import SubmissionService
+from django.shortcuts import aget_object_or_404
+from aptify.auth import is_recruiter
+from aptify.db_router import read_replica
+from aptify.http_cache import acached_json_response, cache_key
+from aptify.pagination import DEFAULT_LIMIT, keyset_page, select_fields
+from assignments.models import AssignmentAttempt, CodingSubmission, Question
+from assignments.services.grading_queue import GradingQueue, TERMINAL_STATUSES, queue_settings
+from assignments.services.submission_service import DuplicateAnswer, SubmissionService
 
 router = Router()
 
@@ -22,14 +30,25 @@ class OutputSubmitSchema(Schema):
     question_id: int
     predicted_output: str
 
+class AnswerItemSchema(Schema):
+    question_id: int
+    question_type: Question.QuestionType # QUIZ or OUTPUT
+    answer: str # selected option id or predicted output
+    time_taken_seconds: float = 0.0
+
+# Well above the question count of any assessment; larger batches are refused
+# with a 400 before anything is written.
+MAX_BATCH_ANSWERS = 200
+
+class BatchAnswerSchema(Schema):
+    attempt_id: int
+    answers: List[AnswerItemSchema]
+
 class CodeSubmitSchema(Schema):
     attempt_id: int
     question_id: int
     code: str
-    execution_time: float # ms
-    complexity_rank: int # 1-4
-    testcases_passed_percentage: float
-    code_runs: bool
+    time_taken_seconds: float = 0.0 # Time spent on the question, not execution time
     language: str = "python"
 
 class AttemptSummarySchema(Schema):
@@ -42,15 +61,65 @@ class AttemptSummarySchema(Schema):
     logic_score: float
     execution_score: float
 
+# LISTING FIELDS (public name -> ORM path). Heavy columns are only read
+# when a client names them in `fields`.
+
+ATTEMPT_FIELDS = {
+    "id": "id",
+    "user_id": "user_id",
+    "user_code": "user__user_code",
+    "username": "user__username",
+    "assignment_id": "assignment_id",
+    "started_at": "started_at",
+    "completed_at": "completed_at",
+    "concept_score": "concept_score",
+    "logic_score": "logic_score",
+    "execution_score": "execution_score",
+    "quiz_correct": "quiz_correct",
+    "quiz_total": "quiz_total",
+    "output_correct": "output_correct",
+    "output_total": "output_total",
+    "coding_total": "coding_total",
+    "question_plan": "question_plan",
+    "error_patterns": "error_patterns",
+}
+ATTEMPT_DEFAULT_FIELDS = [name for name in ATTEMPT_FIELDS if name not in ("question_plan", "error_patterns")]
+
+SUBMISSION_FIELDS = {
+    "id": "id",
+    "attempt_id": "attempt_id",
+    "user_id": "attempt__user_id",
+    "question_id": "question_id",
+    "created_at": "created_at",
+    "time_taken_seconds": "time_taken_seconds",
+    "grading_status": "grading_status",
+    "graded_at": "graded_at",
+    "code_runs": "code_runs",
+    "is_correct": "is_correct",
+    "passed_test_cases": "passed_test_cases",
+    "total_test_cases": "total_test_cases",
+    "execution_time_ms": "execution_time_ms",
+    "cpu_time_ms": "cpu_time_ms",
+    "op_count": "op_count",
+    "memory_usage_kb": "memory_usage_kb",
+    "complexity_analysis": "complexity_analysis",
+    "correctness_score": "correctness_score",
+    "time_perf_score": "time_perf_score",
+    "optimality_score": "optimality_score",
+    "total_score": "total_score",
+    "feedback_tag": "feedback_tag",
+    "grading_error": "grading_error",
+    "submitted_code": "submitted_code",
+}
+SUBMISSION_DEFAULT_FIELDS = [name for name in SUBMISSION_FIELDS if name not in ("grading_error", "submitted_code")]
+
 # ENDPOINTS
 
-@router.post("/start", auth=django_auth, response=AttemptSummarySchema)
-def start_assignment(request, data: StartAssignmentSchema):
-    attempt = SubmissionService.start_assignment(request.user, data.assignment_id)
+def _attempt_summary(attempt):
     return {
         "id": attempt.id,
-        "user_id": attempt.user.id,
-        "assignment_id": attempt.assignment.id,
+        "user_id": attempt.user_id,
+        "assignment_id": attempt.assignment_id,
         "started_at": str(attempt.started_at),
         "completed_at": str(attempt.completed_at) if attempt.completed_at else None,
         "concept_score": attempt.concept_score,
@@ -58,55 +127,204 @@ def start_assignment(request, data: StartAssignmentSchema):
         "execution_score": attempt.execution_score,
     }
 
+@router.post("/start", auth=django_auth, response=AttemptSummarySchema)
+def start_assignment(request, data: StartAssignmentSchema):
+    attempt = SubmissionService.start_assignment(request.user, data.assignment_id)
+    return _attempt_summary(attempt)
+
+def _check_attempt(request, attempt_id):
+    """404 unless the attempt exists and belongs to the caller; answers are only ever stored on one's own attempt."""
+    if not AssignmentAttempt.objects.filter(id=attempt_id, user=request.user).exists():
+        raise HttpError(404, "Attempt not found")
+
 @router.post("/quiz/submit", auth=django_auth)
 def submit_quiz_answer(request, data: QuizSubmitSchema):
-    is_correct = SubmissionService.submit_quiz_answer(
-        data.attempt_id, data.question_id, data.selected_option_id
-    )
+    _check_attempt(request, data.attempt_id)
+    try:
+        is_correct = SubmissionService.submit_quiz_answer(
+            data.attempt_id, data.question_id, data.selected_option_id
+        )
+    except DuplicateAnswer as exc:
+        raise HttpError(409, str(exc))
     return {"success": True, "is_correct": is_correct}
 
 @router.post("/output/submit", auth=django_auth)
 def submit_output_guess(request, data: OutputSubmitSchema):
-    is_correct = SubmissionService.submit_output_guess(
-        data.attempt_id, data.question_id, data.predicted_output
-    )
+    _check_attempt(request, data.attempt_id)
+    try:
+        is_correct = SubmissionService.submit_output_guess(
+            data.attempt_id, data.question_id, data.predicted_output
+        )
+    except DuplicateAnswer as exc:
+        raise HttpError(409, str(exc))
     return {"success": True, "is_correct": is_correct}
 
+@router.post("/answers/batch", auth=django_auth)
+def submit_answers_batch(request, data: BatchAnswerSchema):
+    """
+    Submits many quiz / output-guess answers of one attempt in a single
+    request, e.g. when a mobile client syncs after being offline.
+    """
+    if len(data.answers) > MAX_BATCH_ANSWERS:
+        raise HttpError(400, f"At most {MAX_BATCH_ANSWERS} answers per batch")
+    if any(item.question_type == Question.QuestionType.CODE for item in data.answers):
+        raise HttpError(400, "Coding answers must go through /code/submit")
+    _check_attempt(request, data.attempt_id)
+    try:
+        results = SubmissionService.submit_answers_batch(
+            data.attempt_id, [item.dict() for item in data.answers]
+        )
+    except DuplicateAnswer as exc:
+        raise HttpError(409, str(exc))
+    return {"success": True, "results": results}
+
+# The submit / status / summary endpoints are async: under ASGI a long-poll
+# or an SSE stream waits on the event loop instead of tying up a thread.
+
 @router.post("/code/submit", auth=django_auth)
-def submit_code(request, data: CodeSubmitSchema):
-    submission = SubmissionService.submit_code(
+async def submit_code(request, data: CodeSubmitSchema):
+    if data.language != "python":
+        raise HttpError(400, "Only Python submissions are supported")
+    # request.auth: the lazy request.user can't be resolved on the event loop.
+    if not await AssignmentAttempt.objects.filter(id=data.attempt_id, user=request.auth).aexists():
+        raise HttpError(404, "Attempt not found")
+    submission = await SubmissionService.asubmit_code(
         data.attempt_id, 
         data.question_id, 
         data.code, 
-        data.execution_time, 
-        data.complexity_rank,
-        data.testcases_passed_percentage,
-        data.code_runs,
+        data.time_taken_seconds,
         data.language
     )
+    # Grading happens in the background; poll or stream the status endpoint.
     return {
         "success": True, 
         "submission_id": submission.id,
-        "is_correct": submission.is_correct,
-        "total_score": submission.total_score,
+        "status": submission.grading_status,
+        "status_url": f"{request.path.rsplit('/submit', 1)[0]}/{submission.id}/status",
+    }
+
+def _grading_payload(status):
+    return {
+        "submission_id": status["id"],
+        "status": status["grading_status"],
+        "error": status["grading_error"] or None,
+        "is_correct": status["is_correct"],
+        "total_score": status["total_score"],
+        "execution": {
+            "code_runs": status["code_runs"],
+            "passed_test_cases": status["passed_test_cases"],
+            "total_test_cases": status["total_test_cases"],
+            "execution_time_ms": status["execution_time_ms"],
+            "cpu_time_ms": status["cpu_time_ms"],
+            "op_count": status["op_count"],
+            "memory_usage_kb": status["memory_usage_kb"],
+        },
         "feedback": {
-            "correctness": submission.correctness_score,
-            "time_score": submission.time_perf_score,
-            "optimality": submission.optimality_score,
-            "tag": getattr(submission, 'tag', "Evaluated")
-        }
+            "correctness": status["correctness_score"],
+            "time_score": status["time_perf_score"],
+            "optimality": status["optimality_score"],
+            "complexity": status["complexity_analysis"] or None,
+            "tag": status["feedback_tag"] or "Evaluated",
+        },
     }
 
+@router.get("/code/{submission_id}/status", auth=django_auth)
+async def get_code_status(request, submission_id: int, wait: float = 0.0, last_status: Optional[str] = None):
+    """
+    Grading status of a coding submission. With `wait` > 0 this long-polls:
+    the response is held until the status changes or grading finishes.
+    """
+    status = await GradingQueue.await_for_status(submission_id, request.auth, timeout=wait, last_status=last_status)
+    if status is None:
+        raise HttpError(404, "Submission not found")
+    return _grading_payload(status)
+
+@router.get("/code/{submission_id}/events", auth=django_auth)
+async def stream_code_status(request, submission_id: int):
+    """
+    Server-Sent Events stream of status changes; closes after the final result.
+    """
+    user = request.auth
+    if await GradingQueue.aget_status(submission_id, user) is None:
+        raise HttpError(404, "Submission not found")
+
+    async def events():
+        last_status = None
+        while True:
+            status = await GradingQueue.await_for_status(
+                submission_id, user, timeout=queue_settings()["LONG_POLL_MAX"], last_status=last_status
+            )
+            if status["grading_status"] != last_status:
+                last_status = status["grading_status"]
+                yield f"event: status\ndata: {json.dumps(_grading_payload(status))}\n\n"
+            else:
+                yield ": keep-alive\n\n"
+            if last_status in TERMINAL_STATUSES:
+                return
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+@router.get("/attempts", auth=django_auth)
+def list_attempts(
+    request, assignment: Optional[int] = None, user: Optional[int] = None, completed: Optional[bool] = None,
+    fields: Optional[str] = None, cursor: Optional[str] = None, limit: int = DEFAULT_LIMIT,
+):
+    """
+    Attempts, newest first, keyset-paginated on (started_at, id): pass
+    `next_cursor` back as `cursor`. Candidates only see their own attempts.
+    Served from a read replica unless this client just wrote.
+    """
+    attempts = AssignmentAttempt.objects.using(read_replica())
+    if not is_recruiter(request.user):
+        attempts = attempts.filter(user_id=request.user.id)
+    if assignment is not None:
+        attempts = attempts.filter(assignment_id=assignment)
+    if user is not None:
+        attempts = attempts.filter(user_id=user)
+    if completed is not None:
+        attempts = attempts.filter(completed_at__isnull=not completed)
+    names = select_fields(fields, ATTEMPT_FIELDS, ATTEMPT_DEFAULT_FIELDS)
+    return keyset_page(attempts, "started_at", ATTEMPT_FIELDS, names, cursor, limit)
+
+@router.get("/submissions", auth=django_auth)
+def list_submissions(
+    request, attempt: Optional[int] = None, question: Optional[int] = None, assignment: Optional[int] = None,
+    user: Optional[int] = None, status: Optional[CodingSubmission.GradingStatus] = None,
+    fields: Optional[str] = None, cursor: Optional[str] = None, limit: int = DEFAULT_LIMIT,
+):
+    """
+    Coding submissions, newest first, keyset-paginated on (created_at, id).
+    `submitted_code` is only loaded when listed in `fields`. Served from a
+    read replica unless this client just wrote.
+    """
+    submissions = CodingSubmission.objects.using(read_replica())
+    if not is_recruiter(request.user):
+        submissions = submissions.filter(attempt__user_id=request.user.id)
+    if attempt is not None:
+        submissions = submissions.filter(attempt_id=attempt)
+    if question is not None:
+        submissions = submissions.filter(question_id=question)
+    if assignment is not None:
+        submissions = submissions.filter(attempt__assignment_id=assignment)
+    if user is not None:
+        submissions = submissions.filter(attempt__user_id=user)
+    if status is not None:
+        submissions = submissions.filter(grading_status=status)
+    names = select_fields(fields, SUBMISSION_FIELDS, SUBMISSION_DEFAULT_FIELDS)
+    return keyset_page(submissions, "created_at", SUBMISSION_FIELDS, names, cursor, limit)
+
 @router.get("/{attempt_id}/summary", auth=django_auth, response=AttemptSummarySchema)
-def get_attempt_summary(request, attempt_id: int):
+async def get_attempt_summary(request, attempt_id: int):
+    # Pure read: scores are maintained incrementally by the submit endpoints,
+    # which also drop this cached response (ETag / 304 aware).
+    async def build():
+        return _attempt_summary(await aget_object_or_404(AssignmentAttempt, id=attempt_id))
+    return await acached_json_response(request, cache_key('attempt_summary', attempt_id), build)
+
+@router.post("/{attempt_id}/finalize", auth=django_auth, response=AttemptSummarySchema)
+def finalize_attempt(request, attempt_id: int):
     attempt = SubmissionService.finalize_attempt(attempt_id)
-    return {
-        "id": attempt.id,
-        "user_id": attempt.user.id,
-        "assignment_id": attempt.assignment.id,
-        "started_at": str(attempt.started_at),
-        "completed_at": str(attempt.completed_at) if attempt.completed_at else None,
-        "concept_score": attempt.concept_score,
-        "logic_score": attempt.logic_score,
-        "execution_score": attempt.execution_score,
-    }
+    return _attempt_summary(attempt)
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from assignments.models import CodingQuestion
+from assignments.services.testcase_store import TestCaseStore, store_settings
+
+
+class Command(BaseCommand):
+    help = "Moves large inline test-case inputs / outputs into the content-addressed test-case store."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--question", type=int, action="append", dest="questions",
+            help="Only these question ids (repeatable). Defaults to every coding question.",
+        )
+        parser.add_argument(
+            "--min-bytes", type=int, default=None,
+            help="Move values of at least this size. Defaults to TESTCASE_STORE['INLINE_MAX_BYTES'].",
+        )
+
+    def handle(self, *args, **options):
+        coding_questions = CodingQuestion.objects.only("id", "test_cases", "input_generator")
+        if options["questions"]:
+            coding_questions = coding_questions.filter(question_id__in=options["questions"])
+
+        updated = moved = 0
+        for coding_question in coding_questions.iterator(chunk_size=100):
+            cases, count = TestCaseStore.externalize(coding_question.test_cases or [], options["min_bytes"])
+            if count:
+                coding_question.test_cases = cases
+                coding_question.save(update_fields=["test_cases"])
+                updated += 1
+                moved += count
+        self.stdout.write(self.style.SUCCESS(
+            f"Moved {moved} test-case values of {updated} questions to {store_settings()['ROOT']}."
+        ))
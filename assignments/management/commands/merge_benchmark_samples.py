@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from assignments.services.benchmark_service import BenchmarkService
+
+
+class Command(BaseCommand):
+    help = "Folds buffered benchmark samples into the QuestionBenchmark digests (run periodically, e.g. from cron)."
+
+    def handle(self, *args, **options):
+        count = BenchmarkService.merge_samples()
+        self.stdout.write(self.style.SUCCESS(f"Merged {count} benchmark samples."))
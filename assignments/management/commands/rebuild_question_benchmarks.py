@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from assignments.services.benchmark_service import BenchmarkService
+
+
+class Command(BaseCommand):
+    help = "Recomputes QuestionBenchmark running stats from the graded coding submissions."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--question", type=int, action="append", dest="questions",
+            help="Only rebuild these question ids (repeatable). Defaults to all questions.",
+        )
+
+    def handle(self, *args, **options):
+        count = BenchmarkService.rebuild(options["questions"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} question benchmarks."))
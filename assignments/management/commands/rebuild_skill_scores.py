@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from assignments.models import AssignmentAttempt
+from assignments.services.skill_score_service import SkillScoreService
+
+
+class Command(BaseCommand):
+    help = "Recomputes the SkillScore / UserSkillScore rollups from the submission tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--assignment", type=int, action="append", dest="assignments",
+            help="Only rebuild attempts at these assignment ids (repeatable). Defaults to everything.",
+        )
+
+    def handle(self, *args, **options):
+        attempt_ids = None
+        if options["assignments"]:
+            attempt_ids = list(
+                AssignmentAttempt.objects.filter(assignment_id__in=options["assignments"]).values_list("id", flat=True)
+            )
+        count = SkillScoreService.rebuild(attempt_ids)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} skill score rows."))
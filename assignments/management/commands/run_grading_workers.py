@@ -0,0 +1,42 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from assignments.services.grading_queue import GradingQueue, queue_settings
+
+
+class Command(BaseCommand):
+    help = "Runs grading consumers for queued coding submissions (database queue backend)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--consumers", type=int, default=None,
+            help="Number of consumer threads (defaults to GRADING_QUEUE['CONSUMERS']).",
+        )
+
+    def handle(self, *args, **options):
+        if queue_settings()["BACKEND"] != "database":
+            self.stderr.write(
+                "GRADING_QUEUE['BACKEND'] is not 'database'; jobs are consumed inside the web processes."
+            )
+            return
+
+        count = options["consumers"] or queue_settings()["CONSUMERS"]
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+        threads = [
+            threading.Thread(target=GradingQueue.consume_forever, args=(stop,), name=f"grader-{i}")
+            for i in range(count)
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(self.style.SUCCESS(f"Started {count} grading consumers."))
+
+        while not stop.is_set():
+            stop.wait(1.0)
+        for thread in threads:
+            thread.join()
+        self.stdout.write("Grading consumers stopped.")
@@ -0,0 +1,49 @@
+# Generated by Django 6.1.2 on 2026-10-17 07:14
+
+from django.db import migrations, models
+
+
+def mark_existing_graded(apps, schema_editor):
+    # Submissions created before the queue existed were graded inline.
+    CodingSubmission = apps.get_model('assignments', 'CodingSubmission')
+    CodingSubmission.objects.update(grading_status='DONE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='codingsubmission',
+            name='feedback_tag',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='codingsubmission',
+            name='graded_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='codingsubmission',
+            name='grading_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='codingsubmission',
+            name='grading_started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='codingsubmission',
+            name='grading_status',
+            field=models.CharField(choices=[('QUEUED', 'Queued'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='QUEUED', max_length=10),
+        ),
+        migrations.RunPython(mark_existing_graded, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='codingsubmission',
+            index=models.Index(condition=models.Q(('grading_status__in', ['QUEUED', 'RUNNING'])), fields=['grading_status', 'id'], name='codingsub_grading_queue_idx'),
+        ),
+    ]
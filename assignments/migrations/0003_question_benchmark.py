@@ -0,0 +1,50 @@
+# Generated by Django 6.1.2 on 2026-10-17 07:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, FloatField, Sum, Value
+from django.db.models.functions import Cast, Coalesce
+
+
+def backfill_benchmarks(apps, schema_editor):
+    CodingSubmission = apps.get_model('assignments', 'CodingSubmission')
+    QuestionBenchmark = apps.get_model('assignments', 'QuestionBenchmark')
+    time_ms = Coalesce('execution_time_ms', Value(0.0))
+    rank = Cast('complexity_rank', FloatField())
+    rows = (
+        CodingSubmission.objects.filter(code_runs=True)
+        .values('question_id')
+        .order_by('question_id')
+        .annotate(
+            submission_count=Count('id'),
+            time_sum=Sum(time_ms),
+            time_sq_sum=Sum(time_ms * time_ms),
+            complexity_sum=Sum(rank),
+            complexity_sq_sum=Sum(rank * rank),
+        )
+    )
+    QuestionBenchmark.objects.bulk_create([QuestionBenchmark(**row) for row in rows], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0002_coding_submission_grading_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionBenchmark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('submission_count', models.PositiveIntegerField(default=0)),
+                ('time_sum', models.FloatField(default=0.0)),
+                ('time_sq_sum', models.FloatField(default=0.0)),
+                ('complexity_sum', models.FloatField(default=0.0)),
+                ('complexity_sq_sum', models.FloatField(default=0.0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='benchmark', to='assignments.question')),
+            ],
+        ),
+        migrations.RunPython(backfill_benchmarks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 6.1.2 on 2026-10-17 07:17
+
+from django.db import migrations, models
+
+from assignments.services.quantile_sketch import TDigest
+
+
+def backfill_digests(apps, schema_editor):
+    CodingSubmission = apps.get_model('assignments', 'CodingSubmission')
+    QuestionBenchmark = apps.get_model('assignments', 'QuestionBenchmark')
+    for benchmark in QuestionBenchmark.objects.all():
+        time_digest, complexity_digest = TDigest(), TDigest()
+        rows = (
+            CodingSubmission.objects.filter(question_id=benchmark.question_id, code_runs=True)
+            .values_list('execution_time_ms', 'complexity_rank')
+            .iterator(chunk_size=2000)
+        )
+        for execution_time_ms, complexity_rank in rows:
+            time_digest.add(execution_time_ms or 0.0)
+            complexity_digest.add(complexity_rank)
+        benchmark.time_digest = time_digest.to_dict()
+        benchmark.complexity_digest = complexity_digest.to_dict()
+        benchmark.save(update_fields=['time_digest', 'complexity_digest'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0003_question_benchmark'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='questionbenchmark',
+            name='complexity_digest',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='questionbenchmark',
+            name='time_digest',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.RunPython(backfill_digests, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 6.1.2 on 2026-10-17 07:18
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_counters(apps, schema_editor):
+    AssignmentAttempt = apps.get_model('assignments', 'AssignmentAttempt')
+    QuizSubmission = apps.get_model('assignments', 'QuizSubmission')
+    OutputGuessSubmission = apps.get_model('assignments', 'OutputGuessSubmission')
+    CodingSubmission = apps.get_model('assignments', 'CodingSubmission')
+
+    counters = {}
+    for model, correct_field, total_field in (
+        (QuizSubmission, 'quiz_correct', 'quiz_total'),
+        (OutputGuessSubmission, 'output_correct', 'output_total'),
+    ):
+        rows = model.objects.values('attempt_id').order_by('attempt_id').annotate(
+            total=Count('id'), correct=Count('id', filter=Q(is_correct=True))
+        )
+        for row in rows:
+            entry = counters.setdefault(row['attempt_id'], {})
+            entry[correct_field] = row['correct']
+            entry[total_field] = row['total']
+
+    rows = CodingSubmission.objects.filter(grading_status='DONE').values('attempt_id').order_by('attempt_id').annotate(
+        total=Count('id'), score_sum=Sum('total_score')
+    )
+    for row in rows:
+        entry = counters.setdefault(row['attempt_id'], {})
+        entry['coding_total'] = row['total']
+        entry['coding_score_sum'] = row['score_sum'] or 0.0
+
+    fields = [
+        'quiz_correct', 'quiz_total', 'output_correct', 'output_total', 'coding_total', 'coding_score_sum',
+        'concept_score', 'logic_score', 'execution_score',
+    ]
+    attempts = []
+    for attempt in AssignmentAttempt.objects.filter(id__in=counters.keys()).iterator():
+        for field, value in counters[attempt.id].items():
+            setattr(attempt, field, value)
+        # The summary only reads these scores now, and the old finalize never
+        # stored real ones; derive them from the counters (same formulas as
+        # SubmissionService._record_answers / _record_coding_score).
+        attempt.concept_score = attempt.quiz_correct * 100.0 / attempt.quiz_total if attempt.quiz_total else 0.0
+        attempt.logic_score = attempt.output_correct * 100.0 / attempt.output_total if attempt.output_total else 0.0
+        attempt.execution_score = attempt.coding_score_sum / attempt.coding_total if attempt.coding_total else 0.0
+        attempts.append(attempt)
+    AssignmentAttempt.objects.bulk_update(attempts, fields, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0004_question_benchmark_digests'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignmentattempt',
+            name='coding_score_sum',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='assignmentattempt',
+            name='coding_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='assignmentattempt',
+            name='output_correct',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='assignmentattempt',
+            name='output_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='assignmentattempt',
+            name='quiz_correct',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='assignmentattempt',
+            name='quiz_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 6.1.2 on 2026-10-17 07:22
+
+from django.db import migrations, models
+
+SECTION_ORDER = ('QUIZ', 'OUTPUT', 'CODE')
+
+
+def backfill_plans(apps, schema_editor):
+    AssignmentAttempt = apps.get_model('assignments', 'AssignmentAttempt')
+    Question = apps.get_model('assignments', 'Question')
+    submission_models = [
+        apps.get_model('assignments', name)
+        for name in ('QuizSubmission', 'OutputGuessSubmission', 'CodingSubmission')
+    ]
+
+    questions = {}
+    for question_id, assignment_id, question_type in Question.objects.order_by('id').values_list(
+        'id', 'assignment_id', 'question_type'
+    ):
+        questions.setdefault(assignment_id, []).append([question_id, question_type])
+    plans = {
+        assignment_id: [step for section in SECTION_ORDER for step in rows if step[1] == section]
+        for assignment_id, rows in questions.items()
+    }
+
+    answered = {}
+    for model in submission_models:
+        for attempt_id, question_id in model.objects.values_list('attempt_id', 'question_id').distinct():
+            answered.setdefault(attempt_id, set()).add(question_id)
+
+    attempts = []
+    for attempt in AssignmentAttempt.objects.iterator():
+        attempt.question_plan = plans.get(attempt.assignment_id, [])
+        done = answered.get(attempt.id, set())
+        positions = [index for index, (question_id, _) in enumerate(attempt.question_plan) if question_id in done]
+        attempt.plan_cursor = max(positions) + 1 if positions else 0
+        attempts.append(attempt)
+    AssignmentAttempt.objects.bulk_update(attempts, ['question_plan', 'plan_cursor'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0005_attempt_running_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignment',
+            name='shuffle_questions',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='assignmentattempt',
+            name='plan_cursor',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='assignmentattempt',
+            name='question_plan',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(backfill_plans, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 6.1.2 on 2026-10-17 07:23
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, Q
+
+
+def drop_duplicate_answers(apps, schema_editor):
+    """
+    Keeps the first answer per (attempt, question) so the unique constraints
+    can be created, and recounts the affected attempts.
+    """
+    AssignmentAttempt = apps.get_model('assignments', 'AssignmentAttempt')
+    for model_name, score_field, correct_field, total_field in (
+        ('QuizSubmission', 'concept_score', 'quiz_correct', 'quiz_total'),
+        ('OutputGuessSubmission', 'logic_score', 'output_correct', 'output_total'),
+    ):
+        model = apps.get_model('assignments', model_name)
+        duplicates = (
+            model.objects.values('attempt_id', 'question_id').order_by()
+            .annotate(first_id=Min('id'), copies=Count('id')).filter(copies__gt=1)
+        )
+        affected = set()
+        for row in duplicates.iterator():
+            model.objects.filter(
+                attempt_id=row['attempt_id'], question_id=row['question_id']
+            ).exclude(id=row['first_id']).delete()
+            affected.add(row['attempt_id'])
+        if not affected:
+            continue
+
+        counts = (
+            model.objects.filter(attempt_id__in=affected).values('attempt_id').order_by('attempt_id')
+            .annotate(total=Count('id'), correct=Count('id', filter=Q(is_correct=True)))
+        )
+        for row in counts:
+            AssignmentAttempt.objects.filter(id=row['attempt_id']).update(**{
+                correct_field: row['correct'],
+                total_field: row['total'],
+                score_field: row['correct'] * 100.0 / row['total'],
+            })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0006_attempt_question_plan'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_answers, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='assignmentattempt',
+            index=models.Index(fields=['user', 'assignment'], name='attempt_user_assignment_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='codingsubmission',
+            index=models.Index(condition=models.Q(('code_runs', True)), fields=['question'], include=('execution_time_ms', 'complexity_rank'), name='codingsub_question_runs_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='codingsubmission',
+            index=models.Index(fields=['attempt', 'question'], name='codingsub_attempt_question_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['assignment', 'question_type'], name='question_assignment_type_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='outputguesssubmission',
+            constraint=models.UniqueConstraint(fields=('attempt', 'question'), name='outputsub_unique_attempt_question'),
+        ),
+        migrations.AddConstraint(
+            model_name='quizsubmission',
+            constraint=models.UniqueConstraint(fields=('attempt', 'question'), name='quizsub_unique_attempt_question'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-17 07:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0007_submission_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='skill',
+            name='prerequisites',
+            field=models.ManyToManyField(blank=True, related_name='dependents', to='assignments.skill'),
+        ),
+    ]
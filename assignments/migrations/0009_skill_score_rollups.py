@@ -0,0 +1,83 @@
+# Generated by Django 6.1.2 on 2026-10-17 07:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_skill_scores(apps, schema_editor):
+    SkillScore = apps.get_model('assignments', 'SkillScore')
+    UserSkillScore = apps.get_model('assignments', 'UserSkillScore')
+    sources = [
+        (apps.get_model('assignments', 'QuizSubmission').objects.all(), Count('id', filter=Q(is_correct=True)), 100.0),
+        (apps.get_model('assignments', 'OutputGuessSubmission').objects.all(), Count('id', filter=Q(is_correct=True)), 100.0),
+        (apps.get_model('assignments', 'CodingSubmission').objects.filter(grading_status='DONE'), Sum('total_score'), 1.0),
+    ]
+    totals = {}
+    for submissions, points, scale in sources:
+        rows = (
+            submissions.filter(question__skill__isnull=False)
+            .values_list('attempt_id', 'question__skill_id', 'question__sub_skill').order_by()
+            .annotate(points=points, answered=Count('id'))
+        )
+        for attempt_id, skill_id, sub_skill, row_points, answered in rows.iterator():
+            entry = totals.setdefault((attempt_id, skill_id, sub_skill), [0.0, 0])
+            entry[0] += (row_points or 0.0) * scale
+            entry[1] += answered
+
+    SkillScore.objects.bulk_create([
+        SkillScore(attempt_id=attempt_id, skill_id=skill_id, sub_skill=sub_skill,
+                   points=points, answered=answered, score=points / answered)
+        for (attempt_id, skill_id, sub_skill), (points, answered) in totals.items()
+    ], batch_size=1000)
+    user_rows = (
+        SkillScore.objects.values_list('attempt__user_id', 'skill_id').order_by()
+        .annotate(points=Sum('points'), answered=Sum('answered'))
+    )
+    UserSkillScore.objects.bulk_create([
+        UserSkillScore(user_id=user_id, skill_id=skill_id, points=points, answered=answered, score=points / answered)
+        for user_id, skill_id, points, answered in user_rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0008_skill_prerequisites'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SkillScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sub_skill', models.CharField(blank=True, max_length=100)),
+                ('points', models.FloatField(default=0.0)),
+                ('answered', models.PositiveIntegerField(default=0)),
+                ('score', models.FloatField(default=0.0)),
+                ('attempt', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='skill_scores', to='assignments.assignmentattempt')),
+                ('skill', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='assignments.skill')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('attempt', 'skill', 'sub_skill'), name='skillscore_unique_attempt_skill')],
+            },
+        ),
+        migrations.CreateModel(
+            name='UserSkillScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('points', models.FloatField(default=0.0)),
+                ('answered', models.PositiveIntegerField(default=0)),
+                ('score', models.FloatField(default=0.0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('skill', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='assignments.skill')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='skill_scores', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'skill'), name='userskillscore_unique_user_skill')],
+            },
+        ),
+        migrations.RunPython(backfill_skill_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.1.2 on 2026-10-17 07:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0009_skill_score_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assignmentattempt',
+            index=models.Index(fields=['assignment', '-started_at', '-id'], name='attempt_assignment_recent_idx'),
+        ),
+    ]
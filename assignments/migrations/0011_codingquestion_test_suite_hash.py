@@ -0,0 +1,30 @@
+# Generated by Django 6.1.2 on 2026-10-17 07:45
+
+import hashlib
+import json
+
+from django.db import migrations, models
+
+
+def backfill_test_suite_hash(apps, schema_editor):
+    CodingQuestion = apps.get_model('assignments', 'CodingQuestion')
+    for coding_question in CodingQuestion.objects.only('id', 'test_cases').iterator(chunk_size=100):
+        canonical = json.dumps(coding_question.test_cases or [], sort_keys=True, separators=(',', ':'))
+        coding_question.test_suite_hash = hashlib.sha256(canonical.encode()).hexdigest()
+        coding_question.save(update_fields=['test_suite_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0010_attempt_assignment_recent_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='codingquestion',
+            name='test_suite_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.RunPython(backfill_test_suite_hash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-17 07:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0011_codingquestion_test_suite_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='codingquestion',
+            name='input_generator',
+            field=models.TextField(blank=True, help_text='Python code defining generate(n) -> str (stdin for an input of size n). Enables automatic complexity estimation.'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.1.2 on 2026-10-17 07:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0012_codingquestion_input_generator'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='codingsubmission',
+            name='codingsub_question_runs_idx',
+        ),
+        migrations.AddField(
+            model_name='codingsubmission',
+            name='cpu_time_ms',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='codingsubmission',
+            name='op_count',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AddIndex(
+            model_name='codingsubmission',
+            index=models.Index(condition=models.Q(('code_runs', True)), fields=['question'], include=('execution_time_ms', 'cpu_time_ms', 'op_count', 'complexity_rank'), name='codingsub_question_runs_idx'),
+        ),
+    ]
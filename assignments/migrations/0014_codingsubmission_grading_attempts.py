@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-17 08:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0013_codingsubmission_cpu_time_op_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='codingsubmission',
+            name='grading_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
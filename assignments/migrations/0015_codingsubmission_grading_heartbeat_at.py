@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-17 08:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0014_codingsubmission_grading_attempts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='codingsubmission',
+            name='grading_heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
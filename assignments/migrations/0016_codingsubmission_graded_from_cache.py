@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-17 08:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0015_codingsubmission_grading_heartbeat_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='codingsubmission',
+            name='graded_from_cache',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.1.2 on 2026-10-17 08:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0016_codingsubmission_graded_from_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BenchmarkSample',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('time_value', models.FloatField()),
+                ('complexity_value', models.FloatField()),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='benchmark_samples', to='assignments.question')),
+            ],
+        ),
+    ]
@@ -1,7 +1,76 @@
+import hashlib
+import json
 from django.db import models
 from django.conf import settings
 from django.contrib.postgres.fields import ArrayField
 from django.utils.translation import gettext_lazy as _
+from assignments.services.quantile_sketch import TDigest
+
+class HeavyFieldsQuerySet(models.QuerySet):
+    """
+    QuerySet for models with large text / JSON columns (`heavy_fields`). The
+    default manager leaves those columns out of every SELECT; the code paths
+    that actually need one opt back in (e.g. `.with_code()`), so hot queries,
+    aggregates and admin changelists move far fewer bytes.
+    """
+    heavy_fields = ()
+
+    def with_fields(self, *fields):
+        """Loads the given deferred columns again (works after defer() and only())."""
+        clone = self._chain()
+        names, defer = clone.query.deferred_loading
+        if defer:
+            clone.query.deferred_loading = (frozenset(names).difference(fields), True)
+        else:
+            clone.query.add_immediate_loading(set(names).union(fields))
+        return clone
+
+    def with_heavy_fields(self):
+        return self.with_fields(*self.heavy_fields)
+
+class HeavyFieldsManager(models.Manager):
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        return queryset.defer(*queryset.heavy_fields)
+
+class OutputGuessQuestionQuerySet(HeavyFieldsQuerySet):
+    heavy_fields = ('code_snippet',)
+
+    def with_code(self):
+        return self.with_fields('code_snippet')
+
+def test_suite_hash(test_cases, input_generator=''):
+    """
+    Version of a test suite: sha256 of its canonical JSON, plus the input
+    generator (which decides the complexity results) when there is one.
+    """
+    suite = [test_cases or [], input_generator] if input_generator else test_cases or []
+    canonical = json.dumps(suite, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+class CodingQuestionQuerySet(HeavyFieldsQuerySet):
+    heavy_fields = ('problem_statement', 'test_cases', 'input_generator')
+
+    def with_statement(self):
+        return self.with_fields('problem_statement')
+
+    def with_tests(self):
+        return self.with_fields('test_cases')
+
+    def with_generator(self):
+        return self.with_fields('input_generator')
+
+class AssignmentAttemptQuerySet(HeavyFieldsQuerySet):
+    heavy_fields = ('error_patterns',)
+
+    def with_error_patterns(self):
+        return self.with_fields('error_patterns')
+
+class CodingSubmissionQuerySet(HeavyFieldsQuerySet):
+    heavy_fields = ('submitted_code',)
+
+    def with_code(self):
+        return self.with_fields('submitted_code')
 
 class Assignment(models.Model):
     """
@@ -9,6 +78,8 @@ class Assignment(models.Model):
     """
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
+    # Randomize the question order within each section, per attempt.
+    shuffle_questions = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -20,6 +91,8 @@ class Skill(models.Model):
     Represents a broad skill (e.g., 'Python', 'Algorithms').
     """
     name = models.CharField(max_length=100, unique=True)
+    # Skills this one builds on (e.g. 'Recursion' requires 'Functions'). Must stay acyclic.
+    prerequisites = models.ManyToManyField('self', symmetrical=False, related_name='dependents', blank=True)
     
     def __str__(self):
         return self.name
@@ -47,6 +120,12 @@ class Question(models.Model):
     # Common fields
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Section lookups: questions of one type within an assignment.
+            models.Index(fields=['assignment', 'question_type'], name='question_assignment_type_idx'),
+        ]
+
     def __str__(self):
         return f"{self.get_question_type_display()} - {self.id}"
 
@@ -70,8 +149,10 @@ class OutputGuessQuestion(models.Model):
     code_snippet = models.TextField()
     correct_output = models.TextField()
 
+    objects = HeavyFieldsManager.from_queryset(OutputGuessQuestionQuerySet)()
+
     def __str__(self):
-        return f"Output Guess - {self.question.id}"
+        return f"Output Guess - {self.question_id}"
 
 class CodingQuestion(models.Model):
     """
@@ -82,9 +163,96 @@ class CodingQuestion(models.Model):
     constraints = models.TextField(blank=True)
     # Test cases: [{'input': '...', 'output': '...', 'hidden': boolean}]
     test_cases = models.JSONField()
+    # Changes whenever test_cases do; cached grading results are keyed by it.
+    test_suite_hash = models.CharField(max_length=64, blank=True, editable=False)
+    # Python source defining `generate(n)`, which returns the stdin of a size-n
+    # input; used to estimate the time complexity of submissions.
+    input_generator = models.TextField(
+        blank=True,
+        help_text="Python code defining generate(n) -> str (stdin for an input of size n). "
+                  "Enables automatic complexity estimation.",
+    )
+
+    objects = HeavyFieldsManager.from_queryset(CodingQuestionQuerySet)()
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        deferred = self.get_deferred_fields()
+        if not {'test_cases', 'input_generator'} & deferred and (
+            update_fields is None or {'test_cases', 'input_generator'} & set(update_fields)
+        ):
+            self.test_suite_hash = test_suite_hash(self.test_cases, self.input_generator)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'test_suite_hash'}
+        super().save(*args, **kwargs)
     
     def __str__(self):
-        return f"Coding - {self.question.id}"
+        return f"Coding - {self.question_id}"
+
+class QuestionBenchmark(models.Model):
+    """
+    Running statistics over the valid (code_runs=True) submissions of a coding
+    question. Maintained incrementally on every graded submission so scoring
+    reads one row instead of aggregating the question's whole history. The
+    counters are exact; the digests trail them by the BenchmarkSamples not
+    merged yet.
+    """
+    question = models.OneToOneField(Question, related_name='benchmark', on_delete=models.CASCADE)
+    submission_count = models.PositiveIntegerField(default=0)
+    time_sum = models.FloatField(default=0.0)
+    time_sq_sum = models.FloatField(default=0.0)
+    complexity_sum = models.FloatField(default=0.0)
+    complexity_sq_sum = models.FloatField(default=0.0)
+    # Serialized quantile sketches (assignments.services.quantile_sketch.TDigest)
+    time_digest = models.JSONField(default=dict, blank=True)
+    complexity_digest = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @staticmethod
+    def _mean(total, count):
+        return total / count if count else None
+
+    @staticmethod
+    def _stddev(total, sq_total, count):
+        if count < 2:
+            return 0.0
+        variance = (sq_total - (total * total) / count) / (count - 1)
+        return max(variance, 0.0) ** 0.5
+
+    @property
+    def avg_time(self):
+        return self._mean(self.time_sum, self.submission_count)
+
+    @property
+    def avg_complexity(self):
+        return self._mean(self.complexity_sum, self.submission_count)
+
+    def time_quantile(self, q):
+        return TDigest.from_dict(self.time_digest).quantile(q)
+
+    def complexity_quantile(self, q):
+        return TDigest.from_dict(self.complexity_digest).quantile(q)
+
+class BenchmarkSample(models.Model):
+    """
+    A graded sample waiting to be folded into its question's benchmark
+    digests (BenchmarkService.merge_samples). Buffered so the grading
+    transaction only inserts a row instead of rewriting the sketches.
+    """
+    question = models.ForeignKey(Question, related_name='benchmark_samples', on_delete=models.CASCADE)
+    time_value = models.FloatField()
+    complexity_value = models.FloatField()
+
+    @property
+    def time_stddev(self):
+        return self._stddev(self.time_sum, self.time_sq_sum, self.submission_count)
+
+    @property
+    def complexity_stddev(self):
+        return self._stddev(self.complexity_sum, self.complexity_sq_sum, self.submission_count)
+
+    def __str__(self):
+        return f"Benchmark - {self.question_id} ({self.submission_count} runs)"
 
 class AssignmentAttempt(models.Model):
     """
@@ -100,9 +268,32 @@ class AssignmentAttempt(models.Model):
     logic_score = models.FloatField(default=0.0)   # From Output Guess
     execution_score = models.FloatField(default=0.0) # From Coding
     
+    # Running counters, updated atomically by every submission so the scores
+    # above never need aggregate scans over the submission tables.
+    quiz_correct = models.PositiveIntegerField(default=0)
+    quiz_total = models.PositiveIntegerField(default=0)
+    output_correct = models.PositiveIntegerField(default=0)
+    output_total = models.PositiveIntegerField(default=0)
+    coding_total = models.PositiveIntegerField(default=0)
+    coding_score_sum = models.FloatField(default=0.0)
+    
+    # Question order fixed at start ([[question_id, question_type], ...]) and
+    # the index of the next question to show.
+    question_plan = models.JSONField(default=list, blank=True)
+    plan_cursor = models.PositiveIntegerField(default=0)
+    
     # Metadata
     error_patterns = models.JSONField(default=list, blank=True)
+
+    objects = HeavyFieldsManager.from_queryset(AssignmentAttemptQuerySet)()
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'assignment'], name='attempt_user_assignment_idx'),
+            # Newest-first keyset pages of an assignment's attempts (recruiter listings).
+            models.Index(fields=['assignment', '-started_at', '-id'], name='attempt_assignment_recent_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user} - {self.assignment} - {self.started_at}"
 
@@ -122,13 +313,44 @@ class QuizSubmission(Submission):
     selected_option_id = models.CharField(max_length=50)
     is_correct = models.BooleanField()
 
+    class Meta:
+        constraints = [
+            # One answer per question and attempt; also the (attempt, question) lookup index.
+            models.UniqueConstraint(fields=['attempt', 'question'], name='quizsub_unique_attempt_question'),
+        ]
+
 class OutputGuessSubmission(Submission):
     predicted_output = models.TextField()
     is_correct = models.BooleanField()
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['attempt', 'question'], name='outputsub_unique_attempt_question'),
+        ]
+
 class CodingSubmission(Submission):
+    class GradingStatus(models.TextChoices):
+        QUEUED = 'QUEUED', _('Queued')
+        RUNNING = 'RUNNING', _('Running')
+        DONE = 'DONE', _('Done')
+        FAILED = 'FAILED', _('Failed')
+
     submitted_code = models.TextField()
     
+    # Grading queue state (rows with QUEUED status double as the database queue)
+    grading_status = models.CharField(max_length=10, choices=GradingStatus.choices, default=GradingStatus.QUEUED)
+    grading_started_at = models.DateTimeField(null=True, blank=True)
+    # Refreshed by the grader while it works; RUNNING rows without a recent
+    # heartbeat are reclaimed by the database queue.
+    grading_heartbeat_at = models.DateTimeField(null=True, blank=True)
+    # Times a grader claimed the row; caps retries of submissions that crash their worker.
+    grading_attempts = models.PositiveSmallIntegerField(default=0)
+    graded_at = models.DateTimeField(null=True, blank=True)
+    grading_error = models.TextField(blank=True)
+    # Scored from a GradingCache hit rather than a sandbox run; such results
+    # are not benchmark samples (see BenchmarkService).
+    graded_from_cache = models.BooleanField(default=False)
+    
     # Execution Metrics
     is_correct = models.BooleanField(default=False)
     passed_test_cases = models.IntegerField(default=0)
@@ -143,11 +365,78 @@ class CodingSubmission(Submission):
     
     # Metadata
     execution_time_ms = models.FloatField(null=True)
+    # Load-independent timings, see SCORING["TIME_METRIC"]; op_count is only
+    # measured when scoring uses it.
+    cpu_time_ms = models.FloatField(null=True)
+    op_count = models.BigIntegerField(null=True)
     memory_usage_kb = models.FloatField(null=True)
-    complexity_analysis = models.CharField(max_length=50, blank=True) # e.g. O(n)
+    complexity_analysis = models.CharField(max_length=50, blank=True) # e.g. O(n), estimated by the sandbox
+    feedback_tag = models.CharField(max_length=50, blank=True) # e.g. Industry-ready
     
     # Strict metrics for Relative Scoring
+    # Measured by the sandbox when the question has an input generator; stays 3 otherwise.
     complexity_rank = models.IntegerField(default=3, help_text="1=O(n), 2=O(nlogn), 3=O(n^2), 4=O(n^3)")
     testcases_passed_percentage = models.FloatField(default=0.0)
     code_runs = models.BooleanField(default=False)
 
+    objects = HeavyFieldsManager.from_queryset(CodingSubmissionQuerySet)()
+
+    class Meta:
+        indexes = [
+            # Keeps the database grading queue poll cheap: only pending rows are indexed.
+            models.Index(
+                fields=['grading_status', 'id'],
+                name='codingsub_grading_queue_idx',
+                condition=models.Q(grading_status__in=['QUEUED', 'RUNNING']),
+            ),
+            # Benchmark rebuilds / scoring read only runnable submissions of a
+            # question; on Postgres the metrics are covered by the index itself.
+            models.Index(
+                fields=['question'],
+                name='codingsub_question_runs_idx',
+                condition=models.Q(code_runs=True),
+                include=['execution_time_ms', 'cpu_time_ms', 'op_count', 'complexity_rank'],
+            ),
+            # Coding answers may be resubmitted, so this one is not unique.
+            models.Index(fields=['attempt', 'question'], name='codingsub_attempt_question_idx'),
+        ]
+
+class SkillScore(models.Model):
+    """
+    Materialized per-skill result of an attempt, kept current by every
+    submission: correct answers add 100 points, graded coding submissions
+    their total_score.
+    """
+    attempt = models.ForeignKey(AssignmentAttempt, related_name='skill_scores', on_delete=models.CASCADE)
+    skill = models.ForeignKey(Skill, on_delete=models.CASCADE)
+    sub_skill = models.CharField(max_length=100, blank=True)
+    points = models.FloatField(default=0.0)
+    answered = models.PositiveIntegerField(default=0)
+    score = models.FloatField(default=0.0) # points / answered, 0-100
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['attempt', 'skill', 'sub_skill'], name='skillscore_unique_attempt_skill'),
+        ]
+
+    def __str__(self):
+        return f"{self.attempt_id} - {self.skill} {self.sub_skill}: {self.score:.1f}"
+
+class UserSkillScore(models.Model):
+    """
+    A candidate's skill profile across all attempts (same points as SkillScore).
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='skill_scores', on_delete=models.CASCADE)
+    skill = models.ForeignKey(Skill, on_delete=models.CASCADE)
+    points = models.FloatField(default=0.0)
+    answered = models.PositiveIntegerField(default=0)
+    score = models.FloatField(default=0.0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'skill'], name='userskillscore_unique_user_skill'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.skill}: {self.score:.1f}"
@@ -0,0 +1,136 @@
+"""
+Two-tier cache of quiz / output-guess answer keys.
+
+Answer keys hardly ever change during an exam window, so grading reads them
+from a per-process LRU first, then from Django's shared cache (locmem, file,
+redis, ...), and only on a miss from the database. A miss warms every key of
+the question's assignment at once. Ids without an answer key (coding
+questions, unknown ids) are cached too, as NO_ANSWER_KEY, so repeated lookups
+of them stay off the database. Model signals (assignments/signals.py) drop
+entries when a question changes; other processes pick the change up once
+their local TTL expires.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from assignments.models import OutputGuessQuestion, Question, QuizQuestion
+from assignments.services.lru_cache import LRUCache
+
+DEFAULT_ANSWER_KEY_CACHE_SETTINGS = {
+    "LOCAL_MAXSIZE": 4096,
+    "LOCAL_TTL": 30.0,
+    "SHARED_TTL": 3600,
+}
+
+# Negative entry: a plain string so it survives the shared cache's pickling.
+NO_ANSWER_KEY = "answer_key:none"
+
+
+def answer_key_cache_settings():
+    return {**DEFAULT_ANSWER_KEY_CACHE_SETTINGS, **getattr(settings, "ANSWER_KEY_CACHE", {})}
+
+
+class AnswerKeyCache:
+    _local = None
+
+    @classmethod
+    def local(cls):
+        if cls._local is None:
+            config = answer_key_cache_settings()
+            cls._local = LRUCache(maxsize=config["LOCAL_MAXSIZE"], ttl=config["LOCAL_TTL"])
+        return cls._local
+
+    @staticmethod
+    def _key(question_id):
+        return f"answer_key:{question_id}"
+
+    @classmethod
+    def get(cls, question_id):
+        """
+        Returns the entry for a quiz / output question, e.g.
+        {"question_type": "QUIZ", "answer": "b", "assignment_id": 1,
+        "skill_id": 3, "sub_skill": "Loops"}, or None if it has no answer key.
+        """
+        return cls.get_many([question_id]).get(question_id)
+
+    @classmethod
+    def get_many(cls, question_ids):
+        local = cls.local()
+        found = {}
+        missing = []
+        for question_id in question_ids:
+            entry = local.get(question_id)
+            if entry is None:
+                missing.append(question_id)
+            elif entry != NO_ANSWER_KEY:
+                found[question_id] = entry
+        if not missing:
+            return found
+
+        shared = cache.get_many([cls._key(question_id) for question_id in missing])
+        still_missing = []
+        for question_id in missing:
+            entry = shared.get(cls._key(question_id))
+            if entry is None:
+                still_missing.append(question_id)
+                continue
+            local.set(question_id, entry)
+            if entry != NO_ANSWER_KEY:
+                found[question_id] = entry
+        if not still_missing:
+            return found
+
+        assignment_ids = set(
+            Question.objects.filter(id__in=still_missing).values_list("assignment_id", flat=True)
+        )
+        for assignment_id in assignment_ids:
+            entries = cls.warm(assignment_id)
+            for question_id in still_missing:
+                if question_id in entries:
+                    found[question_id] = entries[question_id]
+
+        unresolved = [question_id for question_id in still_missing if question_id not in found]
+        if unresolved:
+            cache.set_many(
+                {cls._key(question_id): NO_ANSWER_KEY for question_id in unresolved},
+                timeout=answer_key_cache_settings()["SHARED_TTL"],
+            )
+            for question_id in unresolved:
+                local.set(question_id, NO_ANSWER_KEY)
+        return found
+
+    @classmethod
+    def warm(cls, assignment_id):
+        """Loads every answer key of an assignment into both tiers."""
+        entries = {}
+        quiz_keys = QuizQuestion.objects.filter(question__assignment_id=assignment_id).values_list(
+            "question_id", "correct_option_id", "question__skill_id", "question__sub_skill"
+        )
+        for question_id, answer, skill_id, sub_skill in quiz_keys:
+            entries[question_id] = {
+                "question_type": Question.QuestionType.QUIZ, "answer": answer,
+                "assignment_id": assignment_id, "skill_id": skill_id, "sub_skill": sub_skill,
+            }
+        output_keys = OutputGuessQuestion.objects.filter(question__assignment_id=assignment_id).values_list(
+            "question_id", "correct_output", "question__skill_id", "question__sub_skill"
+        )
+        for question_id, answer, skill_id, sub_skill in output_keys:
+            entries[question_id] = {
+                "question_type": Question.QuestionType.OUTPUT, "answer": answer,
+                "assignment_id": assignment_id, "skill_id": skill_id, "sub_skill": sub_skill,
+            }
+
+        if entries:
+            cache.set_many(
+                {cls._key(question_id): entry for question_id, entry in entries.items()},
+                timeout=answer_key_cache_settings()["SHARED_TTL"],
+            )
+            local = cls.local()
+            for question_id, entry in entries.items():
+                local.set(question_id, entry)
+        return entries
+
+    @classmethod
+    def invalidate(cls, question_id):
+        cache.delete(cls._key(question_id))
+        cls.local().delete(question_id)
@@ -0,0 +1,166 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from assignments.models import BenchmarkSample, CodingSubmission, QuestionBenchmark
+from assignments.services.quantile_sketch import TDigest
+
+class BenchmarkService:
+    @staticmethod
+    def _bump(queryset, time_value, complexity_value):
+        return queryset.update(
+            submission_count=F('submission_count') + 1,
+            time_sum=F('time_sum') + time_value,
+            time_sq_sum=F('time_sq_sum') + time_value * time_value,
+            complexity_sum=F('complexity_sum') + complexity_value,
+            complexity_sq_sum=F('complexity_sq_sum') + complexity_value * complexity_value,
+            updated_at=timezone.now(),
+        )
+
+    @staticmethod
+    def record(question_id, time_value, complexity_rank):
+        """
+        Adds one valid submission to the question's running stats.
+        `time_value` is in the SCORING["TIME_METRIC"] unit. Called inside the
+        grading transaction, so it only bumps the counters in place and
+        buffers the sample; the quantile sketches are merged once that
+        transaction has committed.
+        """
+        time_value = float(time_value or 0.0)
+        complexity_value = float(complexity_rank)
+        rows = QuestionBenchmark.objects.filter(question_id=question_id)
+        if not BenchmarkService._bump(rows, time_value, complexity_value):
+            try:
+                with transaction.atomic():
+                    QuestionBenchmark.objects.create(
+                        question_id=question_id,
+                        submission_count=1,
+                        time_sum=time_value,
+                        time_sq_sum=time_value * time_value,
+                        complexity_sum=complexity_value,
+                        complexity_sq_sum=complexity_value * complexity_value,
+                    )
+            except IntegrityError:
+                # Another grader created the row first.
+                BenchmarkService._bump(rows, time_value, complexity_value)
+        BenchmarkSample.objects.create(question_id=question_id, time_value=time_value, complexity_value=complexity_value)
+        transaction.on_commit(lambda: BenchmarkService.merge_samples([question_id]))
+
+    @staticmethod
+    def merge_samples(question_ids=None):
+        """
+        Folds the buffered samples into the benchmark digests, one short
+        transaction per question. Runs after each grading commit; the
+        merge_benchmark_samples command picks up whatever a crashed process
+        left behind. Returns the number of samples merged.
+        """
+        if question_ids is None:
+            question_ids = BenchmarkSample.objects.values_list('question_id', flat=True).distinct()
+        merged = 0
+        for question_id in list(question_ids):
+            with transaction.atomic():
+                # The lock orders concurrent merges of the same question; the
+                # samples are read under it so none is folded in twice.
+                benchmark = QuestionBenchmark.objects.select_for_update().filter(question_id=question_id).first()
+                if benchmark is None:
+                    continue
+                samples = list(
+                    BenchmarkSample.objects.filter(question_id=question_id)
+                    .order_by('id').values_list('id', 'time_value', 'complexity_value')
+                )
+                if not samples:
+                    continue
+                time_digest = TDigest.from_dict(benchmark.time_digest)
+                complexity_digest = TDigest.from_dict(benchmark.complexity_digest)
+                for _, time_value, complexity_value in samples:
+                    time_digest.add(time_value)
+                    complexity_digest.add(complexity_value)
+                # Only the digests: the counters are bumped by concurrent graders.
+                QuestionBenchmark.objects.filter(id=benchmark.id).update(
+                    time_digest=time_digest.to_dict(), complexity_digest=complexity_digest.to_dict(),
+                )
+                BenchmarkSample.objects.filter(id__in=[sample_id for sample_id, _, _ in samples]).delete()
+                merged += len(samples)
+        return merged
+
+    @staticmethod
+    def get(question_id):
+        return QuestionBenchmark.objects.filter(question_id=question_id).first()
+
+    @staticmethod
+    def merged_time_digest(benchmarks):
+        """
+        Merges the time sketches of several benchmarks (e.g. shards of the
+        same question or per-window snapshots) into a single TDigest.
+        """
+        return TDigest.merge_all(TDigest.from_dict(b.time_digest) for b in benchmarks)
+
+    @staticmethod
+    def rebuild(question_ids=None):
+        """
+        Recomputes benchmarks from the submissions table in a single streamed
+        pass. Used for backfills, after bulk data fixes and after switching
+        SCORING["TIME_METRIC"]. The affected benchmark rows stay locked for
+        the whole rebuild, so graders recording into them wait for it
+        instead of having their updates overwritten.
+        """
+        # ScoringService imports this module.
+        from assignments.services.scoring_service import ScoringService
+
+        existing = QuestionBenchmark.objects.all()
+        pending = BenchmarkSample.objects.all()
+        # Cache hits were never recorded as samples (see SubmissionService._apply_result).
+        submissions = CodingSubmission.objects.filter(code_runs=True, graded_from_cache=False)
+        if question_ids is not None:
+            existing = existing.filter(question_id__in=question_ids)
+            pending = pending.filter(question_id__in=question_ids)
+            submissions = submissions.filter(question_id__in=question_ids)
+
+        with transaction.atomic():
+            # Lock first, then read: every submission recorded into these rows
+            # before the lock has committed and is counted below, every later
+            # one waits on the lock and is added on top of the rebuilt row.
+            list(existing.select_for_update().values_list('id', flat=True))
+            rows = (
+                submissions.order_by('question_id')
+                .values_list('question_id', ScoringService.time_field(), 'complexity_rank')
+                .iterator(chunk_size=2000)
+            )
+
+            benchmarks = {}
+            digests = {}
+            for question_id, time_value, complexity_rank in rows:
+                benchmark = benchmarks.get(question_id)
+                if benchmark is None:
+                    benchmark = benchmarks[question_id] = QuestionBenchmark(question_id=question_id)
+                    digests[question_id] = (TDigest(), TDigest())
+                time_value = float(time_value or 0.0)
+                complexity_value = float(complexity_rank)
+                benchmark.submission_count += 1
+                benchmark.time_sum += time_value
+                benchmark.time_sq_sum += time_value * time_value
+                benchmark.complexity_sum += complexity_value
+                benchmark.complexity_sq_sum += complexity_value * complexity_value
+                digests[question_id][0].add(time_value)
+                digests[question_id][1].add(complexity_value)
+
+            for question_id, benchmark in benchmarks.items():
+                time_digest, complexity_digest = digests[question_id]
+                benchmark.time_digest = time_digest.to_dict()
+                benchmark.complexity_digest = complexity_digest.to_dict()
+
+            # Upsert in place rather than delete + insert, which would let a
+            # grader recreate a row in between.
+            QuestionBenchmark.objects.bulk_create(
+                benchmarks.values(),
+                batch_size=500,
+                update_conflicts=True,
+                unique_fields=['question'],
+                update_fields=[
+                    'submission_count', 'time_sum', 'time_sq_sum', 'complexity_sum', 'complexity_sq_sum',
+                    'time_digest', 'complexity_digest', 'updated_at',
+                ],
+            )
+            existing.exclude(question_id__in=list(benchmarks)).delete()
+            # Their submissions are already in the rebuilt digests.
+            pending.delete()
+        return len(benchmarks)
@@ -0,0 +1,170 @@
+"""
+Empirical time-complexity estimation for coding submissions.
+
+The sandbox runs a submission on generated inputs of growing size (doubling
+``n``) and records two curves per size: the number of Python lines executed
+(exact and noise-free, but blind to work done inside C builtins such as
+``sorted``) and the CPU time of the run (sees everything, but noisy at small
+sizes). Each curve is least-squares fitted against the candidate classes
+below as ``y = a * f(n) + b``; the class with the smallest relative error
+wins. Probing stops as soon as the fit is confident, the next size would not
+fit in the time budget, or a run fails.
+
+Like the execution engine this module imports no Django code: the probe loop
+runs inside the sandbox workers.
+"""
+import math
+import time
+
+# (label, rank, f(n)); rank follows CodingSubmission.complexity_rank
+# (1=O(n) or better, 2=O(n log n), 3=O(n^2), 4=O(n^3) or worse).
+CLASSES = [
+    ("O(1)", 1, lambda n: 1.0),
+    ("O(log n)", 1, lambda n: math.log2(n)),
+    ("O(n)", 1, lambda n: float(n)),
+    ("O(n log n)", 2, lambda n: n * math.log2(n)),
+    ("O(n^2)", 3, lambda n: float(n) ** 2),
+    ("O(n^3)", 4, lambda n: float(n) ** 3),
+]
+
+DEFAULT_PROBE_SETTINGS = {
+    "ENABLED": True,
+    "BUDGET_SECONDS": 3.0,
+    "START_SIZE": 16,
+    "MAX_SIZE": 1 << 16,
+    "MIN_POINTS": 4,
+    # A fit is confident when its relative error is below MAX_ERROR and the
+    # runner-up's error is at least MARGIN times larger.
+    "MAX_ERROR": 0.05,
+    "MARGIN": 3.0,
+    # CPU times below this are mostly fork / interpreter noise and not fitted.
+    "MIN_CPU_MS": 2.0,
+    # CPU time must grow by this much across the probe before the CPU curve
+    # can confirm the op-count class.
+    "MIN_CPU_SPAN_MS": 20.0,
+}
+
+
+def fit(sizes, values):
+    """
+    Fits `values` measured at `sizes` against every class. Returns
+    {"label", "rank", "error", "confidence"} for the best class, or None
+    with fewer than three points.
+    """
+    if len(sizes) < 3:
+        return None
+    mean_value = sum(values) / len(values)
+    if mean_value <= 0:
+        return {"label": "O(1)", "rank": 1, "error": 0.0, "confidence": 1.0}
+
+    errors = []
+    for label, rank, function in CLASSES:
+        xs = [function(n) for n in sizes]
+        mean_x = sum(xs) / len(xs)
+        spread = sum((x - mean_x) ** 2 for x in xs)
+        if spread == 0:
+            slope, intercept = 0.0, mean_value
+        else:
+            slope = sum((x - mean_x) * (y - mean_value) for x, y in zip(xs, values)) / spread
+            intercept = mean_value - slope * mean_x
+        if slope < 0:
+            # Shrinking with n: no growth class explains it.
+            errors.append((math.inf, label, rank))
+            continue
+        residual = sum((y - (slope * x + intercept)) ** 2 for x, y in zip(xs, values)) / len(xs)
+        errors.append((math.sqrt(residual) / mean_value, label, rank))
+
+    errors.sort(key=lambda entry: entry[0])
+    (best_error, label, rank), (second_error, _, _) = errors[0], errors[1]
+    if best_error == 0:
+        confidence = 1.0
+    else:
+        confidence = max(0.0, min(1.0, 1.0 - best_error / second_error)) if second_error < math.inf else 1.0
+    return {"label": label, "rank": rank, "error": best_error, "confidence": confidence}
+
+
+def _confident(estimate, options):
+    return (
+        estimate is not None
+        and estimate["error"] <= options["MAX_ERROR"]
+        and estimate["confidence"] >= 1.0 - 1.0 / options["MARGIN"]
+    )
+
+
+def _flat(estimate):
+    return estimate["label"] == "O(1)"
+
+
+def probe(run_size, options):
+    """
+    Adaptive probe. `run_size(n)` runs the submission on an input of size n
+    and returns (op_count, cpu_ms), or None if the run failed / timed out.
+    Returns {"label", "rank", "confidence", "sizes", "op_counts", "cpu_ms"}
+    or None when too few sizes could be measured.
+    """
+    options = {**DEFAULT_PROBE_SETTINGS, **options}
+    deadline = time.monotonic() + float(options["BUDGET_SECONDS"])
+    sizes, op_counts, cpu_times = [], [], []
+    by_ops = by_time = None
+    n = int(options["START_SIZE"])
+    last_elapsed = None
+
+    while n <= int(options["MAX_SIZE"]):
+        remaining = deadline - time.monotonic()
+        # Predict the next run from the last growth ratio; stop rather than overrun the budget.
+        if last_elapsed is not None and len(sizes) >= 2 and cpu_times[-2] > 0:
+            predicted = last_elapsed * max(1.0, cpu_times[-1] / cpu_times[-2])
+            if predicted > remaining:
+                break
+        if remaining <= 0:
+            break
+
+        started = time.monotonic()
+        measured = run_size(n)
+        last_elapsed = time.monotonic() - started
+        if measured is None:
+            break
+        sizes.append(n)
+        op_counts.append(measured[0])
+        cpu_times.append(measured[1])
+
+        if len(sizes) >= int(options["MIN_POINTS"]):
+            by_ops = fit(sizes, op_counts)
+            timed = [(size, cpu) for size, cpu in zip(sizes, cpu_times) if cpu >= float(options["MIN_CPU_MS"])]
+            by_time = fit([size for size, _ in timed], [cpu for _, cpu in timed])
+            # Done once the exact op-count curve is settled and the CPU curve,
+            # which also sees work done in C, has grown enough to agree with it.
+            # A flat op count says nothing about C code, so then the CPU
+            # curve has to be settled on its own.
+            cpu_span = max(cpu_times) - min(cpu_times)
+            if (
+                _confident(by_ops, options) and by_time is not None
+                and cpu_span >= float(options["MIN_CPU_SPAN_MS"]) and by_time["rank"] <= by_ops["rank"]
+                and (not _flat(by_ops) or _confident(by_time, options))
+            ):
+                break
+        n *= 2
+
+    if by_ops is None:
+        by_ops = fit(sizes, op_counts)
+    if by_ops is None:
+        return None
+    estimate = by_ops
+    # Builtins like sorted() do their work in C, invisible to the op count;
+    # trust a confidently higher CPU-time class in that case. When the op
+    # count doesn't grow at all but CPU time does, the work is all in C and
+    # the CPU fit is the only measurement there is.
+    cpu_grows = bool(cpu_times) and max(cpu_times) - min(cpu_times) >= float(options["MIN_CPU_SPAN_MS"])
+    if by_time is not None and (
+        (by_time["rank"] > by_ops["rank"] and _confident(by_time, options))
+        or (_flat(by_ops) and cpu_grows and not _flat(by_time))
+    ):
+        estimate = by_time
+    return {
+        "label": estimate["label"],
+        "rank": estimate["rank"],
+        "confidence": round(estimate["confidence"], 3),
+        "sizes": sizes,
+        "op_counts": op_counts,
+        "cpu_ms": [round(cpu, 3) for cpu in cpu_times],
+    }
@@ -0,0 +1,864 @@
+"""
+Server-side sandboxed execution of coding submissions.
+
+A small pool of warm worker processes is started once per web process. Each
+worker has already paid the interpreter start-up cost, so running a test case
+only costs an ``os.fork()``: the forked child applies resource limits (CPU,
+address space, file size, no new processes), runs the submission with the
+test input on stdin and reports its stdout back over a pipe. The worker then
+reaps the child with ``wait4`` which gives us the peak RSS and the CPU time
+for free.
+
+Before a worker takes its first job it clears its environment, chroots
+into an empty directory and drops to an unprivileged uid (SANDBOX["UID"] /
+["GID"]), so a submission can neither read the web process's secrets nor
+its files, and the "no new processes" limit actually binds (RLIMIT_NPROC
+is ignored for root). Test-case blobs stay reachable through a directory
+descriptor the worker opened before the chroot.
+
+Every case reports wall time, CPU time and, when asked for, an operation
+count (executed lines of the submission). Wall time swings with host load;
+CPU time mostly does not, and the operation count is fully deterministic,
+so scoring can use either of them (see SCORING["TIME_METRIC"]).
+
+This module deliberately imports no Django models so it is cheap to preload
+in the forkserver and safe to import inside the sandbox workers.
+"""
+import atexit
+import builtins
+from concurrent.futures import ThreadPoolExecutor
+import io
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import resource
+import select
+import signal
+import sys
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+from assignments.services import complexity_estimator
+from assignments.services.testcase_store import BlobCache, TestCaseStore, blob_path, store_settings
+
+logger = logging.getLogger(__name__)
+
+class Verdict:
+    PASSED = "PASSED"
+    WRONG_ANSWER = "WRONG_ANSWER"
+    RUNTIME_ERROR = "RUNTIME_ERROR"
+    TIME_LIMIT = "TIME_LIMIT"
+    MEMORY_LIMIT = "MEMORY_LIMIT"
+    COMPILE_ERROR = "COMPILE_ERROR"
+    SKIPPED = "SKIPPED"  # not run: an earlier case failed in fail-fast mode
+
+
+class GradingMode:
+    FULL = "full"            # every case, in series on one worker
+    FAIL_FAST = "fail_fast"  # stop at the first failing case (pass/fail only)
+    FANOUT = "fanout"        # shard the cases across several workers in parallel
+
+
+DEFAULT_LIMITS = {
+    "WORKERS": 4,
+    "CPU_SECONDS": 2,
+    "MEMORY_MB": 256,
+    "WALL_SECONDS": 5.0,
+    "OUTPUT_BYTES": 1024 * 1024,
+    "ACQUIRE_TIMEOUT": 30.0,
+    "GRADING_MODE": GradingMode.FULL,
+    "FANOUT_SHARDS": 4,
+    # Unprivileged identity the workers switch to when started as root.
+    "UID": 65534,
+    "GID": 65534,
+    # Empty directory the workers chroot into; defaults to <tmp>/aptify-sandbox.
+    "JAIL_DIR": None,
+    # Development only: run workers unconfined where chroot is not permitted
+    # (non-root without user namespaces) instead of refusing to start them.
+    "ALLOW_UNCONFINED": False,
+}
+
+# Imported once in every worker so submissions get them without touching
+# disk. The worker is chrooted into an empty directory, so these (and what
+# the engine itself imports) are the only modules a submission can import.
+PRELOADED_MODULES = (
+    "array", "bisect", "collections", "copy", "dataclasses", "datetime",
+    "decimal", "fractions", "functools", "heapq", "itertools", "math",
+    "operator", "re", "string", "random", "statistics", "typing",
+)
+
+# Descriptors the worker opens before confining itself; see _confine_worker.
+_store_fd = None
+_statm_fd = None
+
+
+class SandboxUnavailable(Exception):
+    """Raised when no sandbox worker could be acquired in time."""
+
+
+class SandboxWorkerCrashed(SandboxUnavailable):
+    """
+    The worker died or stopped responding while running the job. Unlike a
+    busy pool this may well be the submission's doing (e.g. it killed its
+    worker), so callers should not retry it forever.
+    """
+
+
+# ---------------------------------------------------------------------------
+# Worker side (runs inside the pre-forked sandbox processes)
+# ---------------------------------------------------------------------------
+
+class _BoundedWriter(io.StringIO):
+    """stdout replacement that silently stops collecting after `limit` chars."""
+
+    def __init__(self, limit):
+        super().__init__()
+        self._limit = limit
+
+    def write(self, s):
+        remaining = self._limit - self.tell()
+        if remaining > 0:
+            super().write(s[:remaining])
+        return len(s)
+
+
+class _BlobReader(io.RawIOBase):
+    """Raw stream over a memory-mapped test input; bytes are only copied as the submission reads them."""
+
+    def __init__(self, blob):
+        self._view = memoryview(blob)
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        chunk = self._view[self._position:self._position + len(buffer)]
+        buffer[:len(chunk)] = chunk
+        self._position += len(chunk)
+        return len(chunk)
+
+
+class _LineCounter:
+    """
+    Counts executed lines of the submission (not of library code): the
+    deterministic operation count used by complexity estimation and the
+    "ops" timing metric. Uses sys.monitoring where available, which turns
+    the event off for every line outside the submission after its first hit;
+    sys.settrace otherwise.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._monitoring = getattr(sys, "monitoring", None)
+
+    def start(self):
+        monitoring = self._monitoring
+        if monitoring is None:
+            sys.settrace(self._trace)
+            return
+        monitoring.use_tool_id(monitoring.PROFILER_ID, "aptify-sandbox")
+        monitoring.register_callback(monitoring.PROFILER_ID, monitoring.events.LINE, self._on_line)
+        monitoring.set_events(monitoring.PROFILER_ID, monitoring.events.LINE)
+
+    def stop(self):
+        monitoring = self._monitoring
+        if monitoring is None:
+            sys.settrace(None)
+            return
+        monitoring.set_events(monitoring.PROFILER_ID, monitoring.events.NO_EVENTS)
+        monitoring.free_tool_id(monitoring.PROFILER_ID)
+
+    def _on_line(self, code, line_number):
+        if code.co_filename != "<submission>":
+            return self._monitoring.DISABLE
+        self.count += 1
+
+    def _trace(self, frame, event, arg):
+        return self._line if frame.f_code.co_filename == "<submission>" else None
+
+    def _line(self, frame, event, arg):
+        if event == "line":
+            self.count += 1
+        return self._line
+
+
+def _isolate_network():
+    """
+    Move the worker into fresh user + network namespaces so submissions only
+    see a loopback device that is down. Falls back to stubbing out the socket
+    constructors when unprivileged namespaces are not available.
+    """
+    try:
+        os.unshare(os.CLONE_NEWUSER | os.CLONE_NEWNET)
+        return True
+    except (AttributeError, OSError):
+        return False
+
+
+def _confine_worker(store_root, limits):
+    """
+    Locks the worker down before it takes any job: empty environment, empty
+    chroot, unprivileged uid. Returns whether the network is isolated.
+    Raises OSError when the worker cannot be confined (and that isn't
+    explicitly allowed), so an unconfined worker never runs submissions.
+    """
+    global _store_fd, _statm_fd
+    os.makedirs(store_root, exist_ok=True)
+    _store_fd = os.open(store_root, os.O_RDONLY | os.O_DIRECTORY)
+    _statm_fd = os.open("/proc/self/statm", os.O_RDONLY)
+    # DATABASE_URL, SECRET_KEY & co. must not be one os.environ away.
+    os.environ.clear()
+
+    jail = limits.get("JAIL_DIR") or os.path.join(tempfile.gettempdir(), "aptify-sandbox")
+    if os.geteuid() == 0:
+        # Root can get a network namespace without a user namespace, and has
+        # to keep its uid mapped until setuid() below.
+        try:
+            os.unshare(os.CLONE_NEWNET)
+            network_isolated = True
+        except (AttributeError, OSError):
+            network_isolated = False
+        _enter_jail(jail)
+        os.setgroups([])
+        os.setgid(int(limits["GID"]))
+        os.setuid(int(limits["UID"]))
+        return network_isolated
+
+    # Unprivileged: the user namespace is what allows the chroot.
+    network_isolated = _isolate_network()
+    try:
+        _enter_jail(jail)
+    except OSError:
+        if not limits.get("ALLOW_UNCONFINED"):
+            raise
+    return network_isolated
+
+
+def _enter_jail(jail):
+    os.makedirs(jail, mode=0o555, exist_ok=True)
+    if os.listdir(jail):
+        raise PermissionError(f"Sandbox jail {jail} is not empty")
+    os.chroot(jail)
+    os.chdir("/")
+
+
+def _describe_error(exc):
+    """
+    Exception type and the submission line it came from, e.g.
+    "ZeroDivisionError on line 3". The message itself is never reported: it
+    can carry anything the code managed to read.
+    """
+    line = None
+    tb = exc.__traceback__
+    while tb is not None:
+        if tb.tb_frame.f_code.co_filename == "<submission>":
+            line = tb.tb_lineno
+        tb = tb.tb_next
+    name = type(exc).__name__
+    return f"{name} on line {line}" if line else name
+
+
+def _block_sockets():
+    import socket
+    import _socket
+
+    def _denied(*args, **kwargs):
+        raise PermissionError("Network access is disabled in the sandbox")
+
+    socket.socket = _denied
+    socket.create_connection = _denied
+    _socket.socket = _denied
+
+
+def _address_space_bytes():
+    # Current virtual size of this process; limits are relative to it so the
+    # interpreter's own mappings don't eat into the submission's budget.
+    # /proc is outside the jail, hence the descriptor opened beforehand.
+    if _statm_fd is not None:
+        pages = int(os.pread(_statm_fd, 128, 0).split()[0])
+    else:
+        with open("/proc/self/statm") as fh:
+            pages = int(fh.read().split()[0])
+    return pages * resource.getpagesize()
+
+
+def _apply_child_limits(limits, base_vm_bytes):
+    cpu = int(limits["CPU_SECONDS"])
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+    memory = base_vm_bytes + int(limits["MEMORY_MB"]) * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0))
+    # Only binds because the worker is no longer root (see _confine_worker).
+    resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+
+
+def _exec_child(code_obj, stdin_data, write_fd, limits, base_vm_bytes, network_isolated, count_ops=False):
+    """Body of the forked child. Never returns."""
+    own_pid = os.getpid()
+    try:
+        # Own process group, so anything the submission forks is killed with it.
+        os.setpgid(0, 0)
+        # The store descriptor leads out of the jail; the submission doesn't need it.
+        if _store_fd is not None:
+            os.close(_store_fd)
+        _apply_child_limits(limits, base_vm_bytes)
+        if not network_isolated:
+            _block_sockets()
+
+        stdout = _BoundedWriter(int(limits["OUTPUT_BYTES"]))
+        if isinstance(stdin_data, str):
+            stdin_data = stdin_data.encode()
+        # A real text stream (with .buffer) over the bytes or the mapped blob.
+        sys.stdin = io.TextIOWrapper(io.BufferedReader(_BlobReader(stdin_data)))
+        sys.stdout = stdout
+        sys.stderr = io.StringIO()
+
+        error = None
+        memory_exceeded = False
+        namespace = {"__name__": "__main__", "__builtins__": builtins}
+        counter = _LineCounter() if count_ops else None
+        try:
+            if counter is not None:
+                counter.start()
+            exec(code_obj, namespace)
+            # Starter templates define `solve()`; call it when the script
+            # didn't produce output on its own.
+            solve = namespace.get("solve")
+            if callable(solve) and not stdout.tell():
+                result = solve()
+                if result is not None:
+                    print(result)
+        except SystemExit as exc:
+            if exc.code not in (None, 0):
+                error = f"SystemExit: {exc.code}" if isinstance(exc.code, int) else "SystemExit"
+        except MemoryError:
+            memory_exceeded = True
+            error = "MemoryError"
+        except BaseException as exc:
+            error = _describe_error(exc)
+        finally:
+            if counter is not None:
+                counter.stop()
+
+        if os.getpid() != own_pid:
+            # A process forked by the submission must not report results.
+            os._exit(0)
+
+        payload = json.dumps({
+            "stdout": stdout.getvalue(),
+            "error": error,
+            "memory_exceeded": memory_exceeded,
+            "op_count": counter.count if counter is not None else None,
+        }).encode()
+        view = memoryview(payload)
+        while view:
+            written = os.write(write_fd, view)
+            view = view[written:]
+    finally:
+        os._exit(0)
+
+
+def _read_until_eof(fd, deadline):
+    """Read everything from `fd` until EOF or until `deadline` passes."""
+    chunks = []
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return b"".join(chunks), True
+        ready, _, _ = select.select([fd], [], [], remaining)
+        if not ready:
+            continue
+        chunk = os.read(fd, 65536)
+        if not chunk:
+            return b"".join(chunks), False
+        chunks.append(chunk)
+
+
+def _outputs_match(actual, expected):
+    """
+    Compare outputs ignoring trailing whitespace and trailing blank lines.
+    `expected` is a string or a memory-mapped blob from the test-case store.
+    """
+    if not isinstance(expected, str):
+        # Byte-exact output is the common case; compare it against the
+        # mapped pages directly and only decode the blob on a mismatch.
+        with memoryview(expected) as view:
+            if view == actual.encode():
+                return True
+        expected = expected[:].decode(errors="replace")
+
+    def normalize(text):
+        lines = [line.rstrip() for line in str(text).replace("\r\n", "\n").split("\n")]
+        while lines and not lines[-1]:
+            lines.pop()
+        return lines
+    return normalize(actual) == normalize(expected)
+
+
+def _run_case(code_obj, stdin_data, expected, limits, network_isolated, count_ops=False):
+    """Runs one case in a forked child; `expected` None only checks that the run succeeds."""
+    # Measured per case: mapped test-case blobs count towards this process's
+    # address space and must not eat into the submission's budget.
+    base_vm_bytes = _address_space_bytes()
+    read_fd, write_fd = os.pipe()
+    started = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        _exec_child(code_obj, stdin_data, write_fd, limits, base_vm_bytes, network_isolated, count_ops)
+    os.close(write_fd)
+
+    try:
+        raw, timed_out = _read_until_eof(read_fd, time.monotonic() + float(limits["WALL_SECONDS"]))
+    finally:
+        os.close(read_fd)
+    if timed_out:
+        os.kill(pid, signal.SIGKILL)
+    _, status, usage = os.wait4(pid, 0)
+    wall_ms = (time.perf_counter() - started) * 1000.0
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+    result = {
+        "verdict": Verdict.RUNTIME_ERROR,
+        "time_ms": round(wall_ms, 3),
+        "memory_kb": float(usage.ru_maxrss),  # kilobytes on Linux
+        "cpu_ms": round((usage.ru_utime + usage.ru_stime) * 1000.0, 3),
+        "op_count": None,
+        "error": None,
+    }
+
+    if timed_out or (os.WIFSIGNALED(status) and os.WTERMSIG(status) == signal.SIGXCPU):
+        result["verdict"] = Verdict.TIME_LIMIT
+        return result
+    if os.WIFSIGNALED(status) or not raw:
+        result["error"] = f"Process terminated (status {status})"
+        return result
+
+    try:
+        payload = json.loads(raw)
+    except ValueError:
+        result["error"] = "Malformed sandbox output"
+        return result
+    result["op_count"] = payload["op_count"]
+    if payload["memory_exceeded"]:
+        result["verdict"] = Verdict.MEMORY_LIMIT
+    elif payload["error"]:
+        result["error"] = payload["error"]
+    elif expected is None or _outputs_match(payload["stdout"], expected):
+        result["verdict"] = Verdict.PASSED
+    else:
+        result["verdict"] = Verdict.WRONG_ANSWER
+    return result
+
+
+def _run_stored_case(code_obj, case, blobs, limits, network_isolated):
+    """Resolves the case's store references (if any) through the worker's blob cache and runs it."""
+    try:
+        stdin_data = blobs.get(case["input_ref"]) if case.get("input_ref") else case.get("input", "")
+        expected = blobs.get(case["output_ref"]) if case.get("output_ref") else case.get("output", "")
+    except OSError:
+        return {
+            "verdict": Verdict.RUNTIME_ERROR, "time_ms": 0.0, "memory_kb": 0.0,
+            "cpu_ms": 0.0, "op_count": None, "error": "Test data unavailable",
+        }
+    try:
+        return _run_case(code_obj, stdin_data, expected, limits, network_isolated, bool(limits.get("COUNT_OPS")))
+    finally:
+        del stdin_data, expected
+        blobs.trim()
+
+
+def _generate_input(generator_obj, n, limits, network_isolated):
+    """
+    Builds the probe input of size `n`: runs the question's generator module
+    and its `generate(n)`, seeded with `n` so every submission sees the same
+    input, in a forked child under the same CPU / memory / wall-time limits
+    as a test case. Returns the input text, or None if the generator failed
+    or ran out of limits.
+    """
+    base_vm_bytes = _address_space_bytes()
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            os.close(read_fd)
+            os.setpgid(0, 0)
+            if _store_fd is not None:
+                os.close(_store_fd)
+            _apply_child_limits(limits, base_vm_bytes)
+            if not network_isolated:
+                _block_sockets()
+            import random
+
+            namespace = {"__name__": "input_generator", "__builtins__": builtins}
+            exec(generator_obj, namespace)
+            random.seed(n)
+            view = memoryview(str(namespace["generate"](n)).encode())
+            while view:
+                written = os.write(write_fd, view)
+                view = view[written:]
+            status = 0
+        finally:
+            os._exit(status)
+    os.close(write_fd)
+
+    try:
+        raw, timed_out = _read_until_eof(read_fd, time.monotonic() + float(limits["WALL_SECONDS"]))
+    finally:
+        os.close(read_fd)
+    if timed_out:
+        os.kill(pid, signal.SIGKILL)
+    _, status, _ = os.wait4(pid, 0)
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+    if timed_out or not os.WIFEXITED(status) or os.WEXITSTATUS(status) != 0:
+        return None
+    return raw.decode(errors="replace")
+
+
+def _probe_complexity(code_obj, generator_source, options, limits, network_isolated):
+    """
+    Runs the complexity probe: the question's `generate(n)` builds stdin for
+    each size, the submission runs on it with line counting. The generator
+    is the question author's code, so it gets a limited child of its own
+    per size too (see _generate_input).
+    """
+    try:
+        generator_obj = compile(generator_source, "<input_generator>", "exec")
+    except (SyntaxError, ValueError):
+        return None
+
+    def run_size(n):
+        stdin_data = _generate_input(generator_obj, n, limits, network_isolated)
+        if stdin_data is None:
+            return None
+        result = _run_case(code_obj, stdin_data, None, limits, network_isolated, count_ops=True)
+        if result["verdict"] != Verdict.PASSED or result["op_count"] is None:
+            return None
+        return result["op_count"], result["cpu_ms"]
+
+    return complexity_estimator.probe(run_size, options)
+
+
+def _worker_main(conn, store_root, cache_bytes, limits):
+    """
+    Entry point of a warm sandbox worker. Receives `("run", source, cases,
+    limits)` jobs, replying with one result dict per case in order, and
+    `("probe", source, generator_source, options, limits)` jobs, replying
+    with a complexity estimate (or None). `limits["COUNT_OPS"]` turns on
+    line counting for a run. `limits` carries the confinement settings.
+    """
+    for name in PRELOADED_MODULES:
+        __import__(name)
+    try:
+        network_isolated = _confine_worker(store_root, limits)
+    except OSError as exc:
+        # Exiting makes every job on this worker fail with SandboxUnavailable.
+        print(f"Sandbox worker could not be confined: {exc}", file=sys.stderr)
+        return
+    blobs = BlobCache(store_root, cache_bytes, dir_fd=_store_fd)
+
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            break
+        if job is None:
+            break
+        if job[0] == "probe":
+            _, source, generator_source, options, limits = job
+            code_obj = compile(source, "<submission>", "exec")
+            conn.send(_probe_complexity(code_obj, generator_source, options, limits, network_isolated))
+            continue
+        _, source, cases, limits = job
+        code_obj = compile(source, "<submission>", "exec")
+        results = []
+        for case in cases:
+            result = _run_stored_case(code_obj, case, blobs, limits, network_isolated)
+            results.append(result)
+            if limits.get("FAIL_FAST") and result["verdict"] != Verdict.PASSED:
+                results.extend(
+                    {"verdict": Verdict.SKIPPED, "time_ms": 0.0, "memory_kb": 0.0,
+                     "cpu_ms": 0.0, "op_count": None, "error": None}
+                    for _ in cases[len(results):]
+                )
+                break
+        conn.send(results)
+
+
+# ---------------------------------------------------------------------------
+# Parent side (runs inside Django)
+# ---------------------------------------------------------------------------
+
+class _Worker:
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+
+    def kill(self):
+        try:
+            self.conn.close()
+        finally:
+            if self.process.is_alive():
+                self.process.kill()
+            self.process.join(timeout=1)
+
+
+class SandboxPool:
+    """
+    Fixed-size pool of warm sandbox workers. Thread-safe: each job checks a
+    worker out, so concurrent requests never share a worker.
+    """
+
+    def __init__(self, size, limits, store=None):
+        self.limits = limits
+        self.store = store or store_settings()
+        self._ctx = multiprocessing.get_context("forkserver")
+        self._ctx.set_forkserver_preload([__name__])
+        self._idle = queue.LifoQueue()
+        self._closed = False
+        self._size = size
+        self._size_lock = threading.Lock()
+        for _ in range(size):
+            self._idle.put(self._spawn())
+
+    def _spawn(self):
+        parent_conn, child_conn = self._ctx.Pipe()
+        cache_bytes = int(self.store["WORKER_CACHE_MB"]) * 1024 * 1024
+        process = self._ctx.Process(
+            target=_worker_main, args=(child_conn, self.store["ROOT"], cache_bytes, self.limits), daemon=True
+        )
+        process.start()
+        child_conn.close()
+        return _Worker(process, parent_conn)
+
+    def _respawn(self):
+        """
+        A fresh worker to replace a crashed one, or None when it can't be
+        started (fork / memory pressure); the pool then runs one short.
+        """
+        try:
+            return self._spawn()
+        except Exception:
+            with self._size_lock:
+                self._size -= 1
+                size = self._size
+            logger.exception("Could not replace a crashed sandbox worker; pool shrinks to %s", size)
+            return None
+
+    def _request(self, job, budget, limits):
+        try:
+            worker = self._idle.get(timeout=float(limits["ACQUIRE_TIMEOUT"]))
+        except queue.Empty:
+            raise SandboxUnavailable("No sandbox worker became available in time")
+        try:
+            worker.conn.send(job)
+            if not worker.conn.poll(budget):
+                raise TimeoutError("Sandbox worker stopped responding")
+            reply = worker.conn.recv()
+        except (EOFError, OSError, TimeoutError) as exc:
+            worker.kill()
+            # Never hand the dead worker back out.
+            worker = self._respawn()
+            raise SandboxWorkerCrashed(f"Sandbox worker failed: {exc}") from exc
+        finally:
+            if worker is not None:
+                self._idle.put(worker)
+        return reply
+
+    def run(self, source, cases, limits=None):
+        limits = limits or self.limits
+        # Every case is bounded by WALL_SECONDS inside the worker; the extra
+        # second covers fork/reap overhead.
+        budget = (float(limits["WALL_SECONDS"]) + 1.0) * max(len(cases), 1)
+        return self._request(("run", source, cases, limits), budget, limits)
+
+    def probe(self, source, generator_source, options, limits=None):
+        """Complexity estimate of `source` on inputs from `generator_source`; see complexity_estimator."""
+        limits = limits or self.limits
+        # The last size may start right before the probe budget runs out.
+        budget = float(options["BUDGET_SECONDS"]) + float(limits["WALL_SECONDS"]) + 1.0
+        return self._request(("probe", source, generator_source, options, limits), budget, limits)
+
+    def run_sharded(self, source, cases, shards, limits=None):
+        """
+        Runs `cases` split into `shards` (lists of case indexes) on as many
+        workers at once and returns the results in the original case order.
+        Wall time is roughly that of the slowest shard.
+        """
+        results = [None] * len(cases)
+
+        def run_shard(indexes):
+            return indexes, self.run(source, [cases[index] for index in indexes], limits)
+
+        with ThreadPoolExecutor(max_workers=len(shards)) as executor:
+            for indexes, shard_results in executor.map(run_shard, shards):
+                for index, result in zip(indexes, shard_results):
+                    results[index] = result
+        return results
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            worker.kill()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class ExecutionEngine:
+    @staticmethod
+    def limits() -> dict:
+        return {**DEFAULT_LIMITS, **getattr(settings, "SANDBOX", {})}
+
+    @staticmethod
+    def get_pool() -> SandboxPool:
+        global _pool
+        if _pool is None:
+            with _pool_lock:
+                if _pool is None:
+                    limits = ExecutionEngine.limits()
+                    _pool = SandboxPool(int(limits["WORKERS"]), limits)
+                    atexit.register(_pool.close)
+        return _pool
+
+    @staticmethod
+    def probe_settings() -> dict:
+        return {**complexity_estimator.DEFAULT_PROBE_SETTINGS, **getattr(settings, "COMPLEXITY_PROBE", {})}
+
+    @staticmethod
+    def estimate_complexity(source: str, generator_source: str):
+        """
+        Empirical complexity of `source` on the question's generated inputs:
+        {"label": "O(n log n)", "rank": 2, "confidence", ...}, or None when
+        probing is disabled, there is no generator or too few sizes ran.
+        """
+        options = ExecutionEngine.probe_settings()
+        if not options["ENABLED"] or not (generator_source or "").strip():
+            return None
+        return ExecutionEngine.get_pool().probe(source, generator_source, options)
+
+    @staticmethod
+    def shard_cases(cases, count):
+        """
+        Splits case indexes into up to `count` shards of similar total input
+        size (greedy, largest first), so no shard is stuck with all the
+        stress tests. Each shard keeps the original case order.
+        """
+        root = store_settings()["ROOT"]
+
+        def size(case):
+            if case.get("input_ref"):
+                try:
+                    return os.path.getsize(blob_path(root, case["input_ref"]))
+                except OSError:
+                    return 0
+            return len(case.get("input", ""))
+
+        sizes = [size(case) for case in cases]
+        shards = [[] for _ in range(min(count, len(cases)))]
+        loads = [0] * len(shards)
+        for index in sorted(range(len(cases)), key=lambda index: -sizes[index]):
+            target = loads.index(min(loads))
+            shards[target].append(index)
+            # +1 so empty inputs still spread out by count.
+            loads[target] += sizes[index] + 1
+        return [sorted(shard) for shard in shards if shard]
+
+    @staticmethod
+    def run_test_cases(source: str, test_cases: list, mode: str = None, count_ops: bool = False) -> dict:
+        """
+        Runs `source` against the test cases and returns the aggregated
+        metrics in the shape of the CodingSubmission fields. `mode` is a
+        GradingMode and defaults to SANDBOX["GRADING_MODE"]. `count_ops`
+        also counts executed lines (op_count); tracing slows the run down,
+        so wall time is not comparable with uncounted runs.
+        """
+        limits = ExecutionEngine.limits()
+        mode = mode or limits["GRADING_MODE"]
+        total = len(test_cases)
+        summary = {
+            "code_runs": False,
+            "passed_test_cases": 0,
+            "total_test_cases": total,
+            "testcases_passed_percentage": 0.0,
+            "execution_time_ms": None,
+            "cpu_time_ms": None,
+            "op_count": None,
+            "memory_usage_kb": None,
+            "verdicts": [],
+            "error": None,
+        }
+
+        # Syntax errors are cheap to detect here and don't need a worker.
+        try:
+            compile(source, "<submission>", "exec")
+        except (SyntaxError, ValueError) as exc:
+            summary["verdicts"] = [Verdict.COMPILE_ERROR] * total
+            line = getattr(exc, "lineno", None)
+            summary["error"] = f"{type(exc).__name__} on line {line}" if line else type(exc).__name__
+            return summary
+
+        if total == 0:
+            summary["code_runs"] = True
+            return summary
+
+        # Large inputs / outputs stay in the test-case store; only their
+        # digests travel to the worker, which maps the files itself.
+        missing = TestCaseStore.missing(test_cases)
+        if missing:
+            raise FileNotFoundError(f"Test-case blobs missing from the store: {', '.join(missing)}")
+        cases = [
+            {field: c[field] for field in ("input", "output", "input_ref", "output_ref") if field in c}
+            for c in test_cases
+        ]
+        pool = ExecutionEngine.get_pool()
+        run_limits = {**pool.limits, "COUNT_OPS": count_ops}
+        shard_count = min(int(limits["FANOUT_SHARDS"]), int(limits["WORKERS"]), total)
+        if mode == GradingMode.FAIL_FAST:
+            results = pool.run(source, cases, {**run_limits, "FAIL_FAST": True})
+        elif mode == GradingMode.FANOUT and shard_count > 1:
+            results = pool.run_sharded(source, cases, ExecutionEngine.shard_cases(cases, shard_count), run_limits)
+        else:
+            results = pool.run(source, cases, run_limits)
+
+        passed = sum(1 for r in results if r["verdict"] == Verdict.PASSED)
+        summary["passed_test_cases"] = passed
+        summary["testcases_passed_percentage"] = (passed / total) * 100.0
+        # Summed over cases in every mode, so benchmarks stay comparable.
+        summary["execution_time_ms"] = round(sum(r["time_ms"] for r in results), 3)
+        # CPU time and op count don't depend on how busy the host is.
+        summary["cpu_time_ms"] = round(sum(r["cpu_ms"] for r in results), 3)
+        if count_ops:
+            summary["op_count"] = sum(r["op_count"] or 0 for r in results)
+        summary["memory_usage_kb"] = max(r["memory_kb"] for r in results)
+        summary["verdicts"] = [r["verdict"] for r in results]
+        # The code "runs" when at least one case finished without crashing.
+        summary["code_runs"] = any(
+            r["verdict"] in (Verdict.PASSED, Verdict.WRONG_ANSWER) for r in results
+        )
+        summary["error"] = next((r["error"] for r in results if r["error"]), None)
+        return summary
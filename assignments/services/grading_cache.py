@@ -0,0 +1,130 @@
+"""
+Cache of sandbox results keyed by (test-suite version, normalized source).
+
+Contest traffic is full of byte-identical solutions (up to line endings) and plain
+resubmissions. Their sandbox result (test verdicts, timings, memory) is
+reused instead of running the code again; only the relative scoring, which
+depends on the live benchmarks, is recomputed. Keys embed
+CodingQuestion.test_suite_hash, so editing a question's test cases makes its
+old results unreachable; signals drop the cached suite version itself.
+Same two tiers as the answer-key cache: a per-process LRU, then Django's
+shared cache.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from assignments.models import CodingQuestion
+from assignments.services.execution_engine import GradingMode, Verdict
+from assignments.services.lru_cache import LRUCache
+from assignments.services.scoring_service import ScoringService
+
+DEFAULT_GRADING_CACHE_SETTINGS = {
+    "ENABLED": True,
+    "LOCAL_MAXSIZE": 2048,
+    "LOCAL_TTL": 30.0,
+    "SHARED_TTL": 24 * 60 * 60,
+}
+
+# Time / memory limit verdicts can be caused by a loaded host; never reuse them.
+UNSTABLE_VERDICTS = {Verdict.TIME_LIMIT, Verdict.MEMORY_LIMIT}
+
+
+def grading_cache_settings():
+    return {**DEFAULT_GRADING_CACHE_SETTINGS, **getattr(settings, "GRADING_CACHE", {})}
+
+
+def normalize_source(code):
+    """
+    Drops differences that cannot change what the program does: line
+    endings (the compiler reads all of them as "\\n") and blank lines at the
+    very end of the file. Nothing else is touched: trailing whitespace can
+    sit inside a multi-line string, and leading blank lines shift every
+    line number a traceback or the program itself can observe.
+    """
+    lines = code.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    while lines and not lines[-1].strip():
+        lines.pop()
+    return "\n".join(lines)
+
+
+def source_hash(code):
+    return hashlib.sha256(normalize_source(code).encode()).hexdigest()
+
+
+class GradingCache:
+    _local = None
+
+    @classmethod
+    def local(cls):
+        if cls._local is None:
+            config = grading_cache_settings()
+            cls._local = LRUCache(maxsize=config["LOCAL_MAXSIZE"], ttl=config["LOCAL_TTL"])
+        return cls._local
+
+    @staticmethod
+    def _suite_key(question_id):
+        return f"test_suite:{question_id}"
+
+    @classmethod
+    def suite_version(cls, question_id):
+        """test_suite_hash of a coding question, or None if it has none."""
+        key = cls._suite_key(question_id)
+        version = cls.local().get(key)
+        if version is None:
+            version = cache.get(key)
+            if version is None:
+                version = (
+                    CodingQuestion.objects.filter(question_id=question_id)
+                    .values_list("test_suite_hash", flat=True).first()
+                )
+                if not version:
+                    return None
+                cache.set(key, version, grading_cache_settings()["SHARED_TTL"])
+            cls.local().set(key, version)
+        return version
+
+    @classmethod
+    def _result_key(cls, question_id, code, mode, version=None):
+        version = version or cls.suite_version(question_id)
+        if version is None:
+            return None
+        # Full and fan-out grading give the same verdicts; fail-fast does not.
+        mode = "fail_fast" if mode == GradingMode.FAIL_FAST else "full"
+        # Results graded without line counting carry no op_count.
+        timing = "ops" if ScoringService.time_metric() == "ops" else "cpu"
+        return f"grading_result:{question_id}:{version[:16]}:{mode}:{timing}:{source_hash(code)}"
+
+    @classmethod
+    def get(cls, question_id, code, mode, version=None):
+        """
+        The cached sandbox result of this (normalized) code, or None.
+        `version` is the question's test_suite_hash when the caller has it.
+        """
+        if not grading_cache_settings()["ENABLED"]:
+            return None
+        key = cls._result_key(question_id, code, mode, version)
+        if key is None:
+            return None
+        result = cls.local().get(key)
+        if result is None:
+            result = cache.get(key)
+            if result is not None:
+                cls.local().set(key, result)
+        return result
+
+    @classmethod
+    def set(cls, question_id, code, mode, result, version=None):
+        if not grading_cache_settings()["ENABLED"] or UNSTABLE_VERDICTS.intersection(result["verdicts"]):
+            return
+        key = cls._result_key(question_id, code, mode, version)
+        if key is None:
+            return
+        cache.set(key, result, grading_cache_settings()["SHARED_TTL"])
+        cls.local().set(key, result)
+
+    @classmethod
+    def invalidate(cls, question_id):
+        cache.delete(cls._suite_key(question_id))
+        cls.local().delete(cls._suite_key(question_id))
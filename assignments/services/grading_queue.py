@@ -0,0 +1,354 @@
+"""
+Asynchronous grading queue for coding submissions.
+
+`/code/submit` only stores the submission (status QUEUED) and hands its id to
+the queue; a pool of consumers runs the sandbox + scoring later. Two backends:
+
+* ``local``    - an in-process queue with consumer threads. No extra moving
+                 parts, good for development and single-box deployments.
+* ``database`` - the CodingSubmission rows themselves are the queue. Consumers
+                 claim rows with SELECT ... FOR UPDATE SKIP LOCKED, so they can
+                 run in separate processes (``manage.py run_grading_workers``)
+                 and be scaled independently from the web workers.
+
+Async views (under ASGI) use ``aenqueue()``, ``aget_status()`` and
+``await_for_status()``: a long-poll then waits on the event loop instead of
+holding a thread for its whole duration.
+
+A claim stamps ``grading_started_at``; the grader writes its result only
+while the row still carries that stamp, so a job reclaimed from a grader
+that was merely slow is never counted twice. While grading, the consumer
+refreshes ``grading_heartbeat_at`` every STALE_AFTER / 4 seconds; only rows
+whose heartbeat is older than STALE_AFTER are reclaimed.
+"""
+import asyncio
+import logging
+import queue
+import threading
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from assignments.models import CodingSubmission
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SETTINGS = {
+    "BACKEND": "local",
+    "CONSUMERS": 2,
+    "POLL_INTERVAL": 0.5,
+    "LONG_POLL_MAX": 25.0,
+    "STALE_AFTER": 120.0,
+    # Claims of one submission before it is given up on as FAILED.
+    "MAX_ATTEMPTS": 3,
+}
+
+TERMINAL_STATUSES = (
+    CodingSubmission.GradingStatus.DONE,
+    CodingSubmission.GradingStatus.FAILED,
+)
+
+
+# Columns of a status payload (see assignments.api._grading_payload).
+STATUS_FIELDS = (
+    "id", "grading_status", "grading_error", "is_correct",
+    "passed_test_cases", "total_test_cases", "execution_time_ms", "cpu_time_ms", "op_count",
+    "memory_usage_kb", "code_runs", "correctness_score",
+    "time_perf_score", "optimality_score", "total_score", "feedback_tag",
+    "complexity_analysis",
+)
+
+
+def queue_settings():
+    return {**DEFAULT_QUEUE_SETTINGS, **getattr(settings, "GRADING_QUEUE", {})}
+
+
+class LocalQueueBackend:
+    """
+    In-process FIFO. Pending rows are re-read from the database when the
+    consumers start, so a restart delays jobs but doesn't lose them.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+
+    def push(self, submission_id):
+        self._queue.put(submission_id)
+
+    def pop(self, timeout):
+        try:
+            submission_id = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        # Conditional claim, so a job pushed twice is still graded once.
+        now = timezone.now()
+        claimed = CodingSubmission.objects.filter(
+            id=submission_id, grading_status=CodingSubmission.GradingStatus.QUEUED
+        ).update(
+            grading_status=CodingSubmission.GradingStatus.RUNNING,
+            grading_started_at=now,
+            grading_heartbeat_at=now,
+            grading_attempts=F("grading_attempts") + 1,
+        )
+        return submission_id if claimed else None
+
+    def recover(self):
+        # Jobs queued before a restart are only known to the database.
+        pending = CodingSubmission.objects.filter(
+            grading_status=CodingSubmission.GradingStatus.QUEUED
+        ).order_by("id").values_list("id", flat=True)
+        for submission_id in pending.iterator():
+            self.push(submission_id)
+
+
+class DatabaseQueueBackend:
+    """Uses QUEUED CodingSubmission rows as the job table."""
+
+    def push(self, submission_id):
+        # The row was written with status QUEUED; consumers will find it.
+        pass
+
+    def pop(self, timeout):
+        deadline = time.monotonic() + timeout
+        stale_before = timezone.now() - timedelta(seconds=queue_settings()["STALE_AFTER"])
+        while True:
+            submission_id = self._claim(stale_before)
+            if submission_id is not None or time.monotonic() >= deadline:
+                return submission_id
+            time.sleep(queue_settings()["POLL_INTERVAL"])
+
+    @staticmethod
+    def _claim(stale_before):
+        Status = CodingSubmission.GradingStatus
+        with transaction.atomic():
+            pending = (
+                CodingSubmission.objects
+                .select_for_update(skip_locked=True)
+                .filter(grading_status=Status.QUEUED)
+                .order_by("id")
+                .values_list("id", flat=True)
+                .first()
+            )
+            if pending is None:
+                # Re-claim jobs whose consumer died mid-grading: a live
+                # consumer keeps the heartbeat fresh however long grading takes.
+                pending = (
+                    CodingSubmission.objects
+                    .select_for_update(skip_locked=True)
+                    .filter(grading_status=Status.RUNNING)
+                    .filter(
+                        Q(grading_heartbeat_at__lt=stale_before)
+                        | Q(grading_heartbeat_at__isnull=True, grading_started_at__lt=stale_before)
+                    )
+                    .order_by("id")
+                    .values_list("id", flat=True)
+                    .first()
+                )
+            if pending is None:
+                return None
+            now = timezone.now()
+            CodingSubmission.objects.filter(id=pending).update(
+                grading_status=Status.RUNNING, grading_started_at=now, grading_heartbeat_at=now,
+                grading_attempts=F("grading_attempts") + 1,
+            )
+            return pending
+
+
+class _Heartbeat:
+    """
+    Keeps refreshing the heartbeat of one claimed submission from a side
+    thread until stopped. Only touches the row while it still carries the
+    claim it started with.
+    """
+
+    def __init__(self, submission_id, interval):
+        self._stopped = threading.Event()
+        claim = CodingSubmission.objects.filter(id=submission_id).values_list("grading_started_at", flat=True).first()
+        self._thread = threading.Thread(
+            target=self._beat, args=(submission_id, claim, interval),
+            name=f"grading-heartbeat-{submission_id}", daemon=True,
+        )
+        self._thread.start()
+
+    def _beat(self, submission_id, claim, interval):
+        try:
+            while not self._stopped.wait(interval):
+                CodingSubmission.objects.filter(
+                    id=submission_id,
+                    grading_status=CodingSubmission.GradingStatus.RUNNING,
+                    grading_started_at=claim,
+                ).update(grading_heartbeat_at=timezone.now())
+        except Exception:
+            logger.exception("Heartbeat failed for submission %s", submission_id)
+        finally:
+            connection.close()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+
+BACKENDS = {
+    "local": LocalQueueBackend,
+    "database": DatabaseQueueBackend,
+}
+
+
+class GradingQueue:
+    _backend = None
+    _consumers = []
+    _lock = threading.RLock()
+    # Wakes long-pollers in this process as soon as a job finishes.
+    _finished = threading.Condition()
+    # Same for async long-pollers: (event loop, asyncio.Event) pairs.
+    _async_waiters = set()
+
+    @classmethod
+    def backend(cls):
+        if cls._backend is None:
+            with cls._lock:
+                if cls._backend is None:
+                    cls._backend = BACKENDS[queue_settings()["BACKEND"]]()
+        return cls._backend
+
+    @classmethod
+    def enqueue(cls, submission_id):
+        """
+        Hands a saved submission to the graders once the surrounding
+        transaction commits.
+        """
+        def push():
+            cls.backend().push(submission_id)
+            if queue_settings()["BACKEND"] == "local":
+                cls.start_consumers()
+        transaction.on_commit(push)
+
+    @classmethod
+    async def aenqueue(cls, submission_id):
+        """
+        enqueue() for async views. They run in autocommit mode (the async ORM
+        has no transactions), so the row is already committed.
+        """
+        if queue_settings()["BACKEND"] == "local" and not cls._consumers:
+            # Recovery reads pending rows; keep that off the event loop.
+            await sync_to_async(cls.start_consumers)()
+        cls.backend().push(submission_id)
+
+    @classmethod
+    def start_consumers(cls, count=None):
+        with cls._lock:
+            if cls._consumers:
+                return cls._consumers
+            count = count or queue_settings()["CONSUMERS"]
+            if hasattr(cls.backend(), "recover"):
+                cls.backend().recover()
+            for index in range(count):
+                thread = threading.Thread(
+                    target=cls.consume_forever, name=f"grading-consumer-{index}", daemon=True
+                )
+                thread.start()
+                cls._consumers.append(thread)
+        return cls._consumers
+
+    @classmethod
+    def consume_forever(cls, stop_event=None):
+        while stop_event is None or not stop_event.is_set():
+            cls.consume_one(timeout=queue_settings()["POLL_INTERVAL"] * 4)
+
+    @classmethod
+    def consume_one(cls, timeout):
+        # Imported here: the submission service enqueues through this module.
+        from assignments.services.submission_service import SubmissionService
+
+        close_old_connections()
+        try:
+            submission_id = cls.backend().pop(timeout)
+            if submission_id is None:
+                return None
+            heartbeat = _Heartbeat(submission_id, queue_settings()["STALE_AFTER"] / 4)
+            try:
+                SubmissionService.grade_submission(submission_id)
+            except Exception:
+                logger.exception("Grading failed for submission %s", submission_id)
+            finally:
+                heartbeat.stop()
+            with cls._finished:
+                cls._finished.notify_all()
+            cls._wake_async_waiters()
+            return submission_id
+        finally:
+            close_old_connections()
+
+    @classmethod
+    def get_status(cls, submission_id, user=None):
+        queryset = CodingSubmission.objects.filter(id=submission_id)
+        if user is not None:
+            queryset = queryset.filter(attempt__user=user)
+        return queryset.values(*STATUS_FIELDS).first()
+
+    @classmethod
+    def wait_for_status(cls, submission_id, user=None, timeout=0.0, last_status=None):
+        """
+        Long-poll helper: returns as soon as the status differs from
+        `last_status` (or grading finished), or when `timeout` expires.
+        """
+        timeout = min(float(timeout), queue_settings()["LONG_POLL_MAX"])
+        deadline = time.monotonic() + timeout
+        while True:
+            status = cls.get_status(submission_id, user)
+            if status is None or status["grading_status"] in TERMINAL_STATUSES:
+                return status
+            if last_status is not None and status["grading_status"] != last_status:
+                return status
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return status
+            with cls._finished:
+                cls._finished.wait(min(remaining, queue_settings()["POLL_INTERVAL"]))
+
+    @classmethod
+    def _wake_async_waiters(cls):
+        # Called from consumer threads; asyncio events are set on their own loop.
+        for loop, event in list(cls._async_waiters):
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # The loop was closed.
+                cls._async_waiters.discard((loop, event))
+
+    @classmethod
+    async def aget_status(cls, submission_id, user=None):
+        queryset = CodingSubmission.objects.filter(id=submission_id)
+        if user is not None:
+            queryset = queryset.filter(attempt__user=user)
+        return await queryset.values(*STATUS_FIELDS).afirst()
+
+    @classmethod
+    async def await_for_status(cls, submission_id, user=None, timeout=0.0, last_status=None):
+        """wait_for_status() for async views; sleeps on the event loop between polls."""
+        timeout = min(float(timeout), queue_settings()["LONG_POLL_MAX"])
+        deadline = time.monotonic() + timeout
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        cls._async_waiters.add(waiter)
+        try:
+            while True:
+                status = await cls.aget_status(submission_id, user)
+                if status is None or status["grading_status"] in TERMINAL_STATUSES:
+                    return status
+                if last_status is not None and status["grading_status"] != last_status:
+                    return status
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return status
+                waiter[1].clear()
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), min(remaining, queue_settings()["POLL_INTERVAL"]))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            cls._async_waiters.discard(waiter)
@@ -0,0 +1,166 @@
+"""
+Mergeable streaming quantile sketch (a merging t-digest).
+
+Values are summarized into at most ~`compression` weighted centroids, kept
+small near the tails (p1/p99) and larger around the median. Quantile and CDF
+queries walk the centroid list, so they cost O(compression) no matter how many
+values were added - constant time from the caller's point of view. Two
+digests built on different shards or time windows merge into one digest of
+the union.
+
+The serialized form is a compact dict suitable for a JSONField:
+``{"n": total_weight, "min": ..., "max": ..., "c": [[mean, weight], ...]}``.
+"""
+import math
+
+DEFAULT_COMPRESSION = 100
+
+
+class TDigest:
+    def __init__(self, compression=DEFAULT_COMPRESSION):
+        self.compression = compression
+        self._means = []
+        self._weights = []
+        self._buffer = []
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    # -- building ---------------------------------------------------------
+
+    def add(self, value, weight=1.0):
+        value = float(value)
+        self._buffer.append((value, float(weight)))
+        self.total += weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self._buffer) >= self.compression * 5:
+            self._compress()
+        return self
+
+    def merge(self, other):
+        """Folds `other` (a TDigest) into this digest."""
+        other._compress()
+        self._buffer.extend(zip(other._means, other._weights))
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    @classmethod
+    def merge_all(cls, digests, compression=DEFAULT_COMPRESSION):
+        merged = cls(compression)
+        for digest in digests:
+            merged.merge(digest)
+        return merged
+
+    def _scale(self, q):
+        # k1 scale function: centroids stay tiny at the tails.
+        return self.compression / (2 * math.pi) * math.asin(2 * min(max(q, 0.0), 1.0) - 1)
+
+    def _compress(self):
+        if not self._buffer:
+            return
+        points = sorted(list(zip(self._means, self._weights)) + self._buffer)
+        self._buffer = []
+        total = sum(w for _, w in points)
+
+        means, weights = [], []
+        current_mean, current_weight = points[0]
+        weight_so_far = 0.0
+        k_lower = self._scale(0.0)
+        for mean, weight in points[1:]:
+            proposed = current_weight + weight
+            # Identical values always merge (lossless), which keeps discrete
+            # metrics such as complexity ranks down to one centroid per value.
+            if mean == current_mean or self._scale((weight_so_far + proposed) / total) - k_lower <= 1.0:
+                current_mean += (mean - current_mean) * weight / proposed
+                current_weight = proposed
+            else:
+                means.append(current_mean)
+                weights.append(current_weight)
+                weight_so_far += current_weight
+                k_lower = self._scale(weight_so_far / total)
+                current_mean, current_weight = mean, weight
+        means.append(current_mean)
+        weights.append(current_weight)
+        self._means, self._weights = means, weights
+
+    # -- queries ----------------------------------------------------------
+
+    def __len__(self):
+        return int(self.total)
+
+    def quantile(self, q):
+        """Estimated value at quantile `q` (0..1), or None when empty."""
+        self._compress()
+        if not self._means:
+            return None
+        if len(self._means) == 1:
+            return self._means[0]
+        target = min(max(q, 0.0), 1.0) * self.total
+
+        previous_mean, previous_position = self.min, 0.0
+        cumulative = 0.0
+        for mean, weight in zip(self._means, self._weights):
+            position = cumulative + weight / 2
+            if target < position:
+                span = position - previous_position
+                fraction = (target - previous_position) / span if span > 0 else 0.0
+                return previous_mean + fraction * (mean - previous_mean)
+            previous_mean, previous_position = mean, position
+            cumulative += weight
+
+        span = self.total - previous_position
+        fraction = (target - previous_position) / span if span > 0 else 1.0
+        return previous_mean + fraction * (self.max - previous_mean)
+
+    def cdf(self, value):
+        """Estimated fraction of values <= `value`, or None when empty."""
+        self._compress()
+        if not self._means:
+            return None
+        if value < self.min:
+            return 0.0
+        if value >= self.max:
+            return 1.0
+
+        previous_mean, previous_position = self.min, 0.0
+        cumulative = 0.0
+        for mean, weight in zip(self._means, self._weights):
+            position = cumulative + weight / 2
+            if value < mean:
+                span = mean - previous_mean
+                fraction = (value - previous_mean) / span if span > 0 else 1.0
+                return (previous_position + fraction * (position - previous_position)) / self.total
+            previous_mean, previous_position = mean, position
+            cumulative += weight
+
+        span = self.max - previous_mean
+        fraction = (value - previous_mean) / span if span > 0 else 1.0
+        return (previous_position + fraction * (self.total - previous_position)) / self.total
+
+    # -- persistence ------------------------------------------------------
+
+    def to_dict(self):
+        self._compress()
+        if not self._means:
+            return {}
+        return {
+            "n": self.total,
+            "min": self.min,
+            "max": self.max,
+            "c": [[round(m, 6), w] for m, w in zip(self._means, self._weights)],
+        }
+
+    @classmethod
+    def from_dict(cls, data, compression=DEFAULT_COMPRESSION):
+        digest = cls(compression)
+        if data:
+            digest._means = [m for m, _ in data["c"]]
+            digest._weights = [w for _, w in data["c"]]
+            digest.total = data["n"]
+            digest.min = data["min"]
+            digest.max = data["max"]
+        return digest
@@ -0,0 +1,96 @@
+"""
+Per-attempt question plan.
+
+`start_assignment` fixes the order of every question of the attempt once
+(quiz section, then output-guess, then coding; shuffled within each section
+when the assignment asks for it) and stores it on the attempt together with a
+cursor. Page transitions then only look at plan[cursor], and submissions move
+the cursor forward in the UPDATE they already run on the attempt.
+"""
+import random
+
+from django.core.cache import cache
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+from assignments.models import AssignmentAttempt, Question
+
+SECTION_ORDER = (
+    Question.QuestionType.QUIZ,
+    Question.QuestionType.OUTPUT,
+    Question.QuestionType.CODE,
+)
+
+# Positions are looked up by every submission; attempts rarely outlive this.
+POSITIONS_CACHE_TIMEOUT = 6 * 60 * 60
+
+
+class QuestionPlanService:
+    @staticmethod
+    def build(assignment_id, rng=None):
+        """Returns the plan as a list of [question_id, question_type] pairs."""
+        rows = list(
+            Question.objects.filter(assignment_id=assignment_id)
+            .order_by('id')
+            .values_list('id', 'question_type', 'assignment__shuffle_questions')
+        )
+        shuffle = bool(rows) and rows[0][2]
+        rng = rng or random.Random()
+
+        plan = []
+        for question_type in SECTION_ORDER:
+            section = [[question_id, kind] for question_id, kind, _ in rows if kind == question_type]
+            if shuffle:
+                rng.shuffle(section)
+            plan.extend(section)
+        return plan
+
+    @staticmethod
+    def _positions_key(attempt_id):
+        return f"question_plan:{attempt_id}"
+
+    @staticmethod
+    def cache_positions(attempt_id, plan):
+        positions = {question_id: index for index, (question_id, _) in enumerate(plan)}
+        cache.set(QuestionPlanService._positions_key(attempt_id), positions, timeout=POSITIONS_CACHE_TIMEOUT)
+        return positions
+
+    @staticmethod
+    def positions(attempt_id):
+        positions = cache.get(QuestionPlanService._positions_key(attempt_id))
+        if positions is None:
+            plan = AssignmentAttempt.objects.filter(id=attempt_id).values_list('question_plan', flat=True).first()
+            positions = QuestionPlanService.cache_positions(attempt_id, plan or [])
+        return positions
+
+    @staticmethod
+    def advanced_cursor(attempt_id, question_ids):
+        """
+        Expression for the new plan_cursor once `question_ids` are answered:
+        just past the furthest of them, never moving backwards (re-submitting
+        an earlier question keeps the cursor where it is).
+        """
+        positions = QuestionPlanService.positions(attempt_id)
+        answered = [positions[question_id] for question_id in question_ids if question_id in positions]
+        if not answered:
+            return F('plan_cursor')
+        return Greatest(F('plan_cursor'), Value(max(answered) + 1))
+
+    @staticmethod
+    def current(attempt):
+        """
+        The step the attempt is on, e.g. {"question_id": 7, "question_type":
+        "OUTPUT", "number": 2, "total": 3} (number / total within the
+        section), or None once every question was answered.
+        """
+        plan = attempt.question_plan
+        if attempt.plan_cursor >= len(plan):
+            return None
+        question_id, question_type = plan[attempt.plan_cursor]
+        section = [index for index, (_, kind) in enumerate(plan) if kind == question_type]
+        return {
+            "question_id": question_id,
+            "question_type": question_type,
+            "number": section.index(attempt.plan_cursor) + 1,
+            "total": len(section),
+        }
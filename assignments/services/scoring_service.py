@@ -1,7 +1,43 @@
-from django.db.models import Avg
-from assignments.models import CodingSubmission, Question
+from django.conf import settings
+from assignments.models import CodingSubmission
+from assignments.services.benchmark_service import BenchmarkService
+from assignments.services.quantile_sketch import TDigest
+
+# SCORING["TIME_METRIC"] -> CodingSubmission field holding that timing.
+TIME_METRICS = {
+    "wall": "execution_time_ms",
+    "cpu": "cpu_time_ms",
+    "ops": "op_count",
+}
 
 class ScoringService:
+    @staticmethod
+    def scoring_mode() -> str:
+        """
+        "mean" (default) scores time/optimality against the running averages;
+        "percentile" scores against the per-question quantile sketches.
+        """
+        return getattr(settings, "SCORING", {}).get("MODE", "mean")
+
+    @staticmethod
+    def time_metric() -> str:
+        """
+        "wall" (default), "cpu" or "ops": which timing the time score and the
+        benchmarks use. CPU time and op count stay stable when grading runs
+        at high concurrency; wall time does not.
+        """
+        return getattr(settings, "SCORING", {}).get("TIME_METRIC", "wall")
+
+    @staticmethod
+    def time_field() -> str:
+        return TIME_METRICS[ScoringService.time_metric()]
+
+    @staticmethod
+    def time_value(submission) -> float:
+        """The submission's timing in the configured metric (0.0 if not measured)."""
+        value = getattr(submission, ScoringService.time_field())
+        return float(value) if value is not None else 0.0
+
     @staticmethod
     def calculate_quiz_score(correct_count: int, total_count: int) -> float:
         """
@@ -39,49 +75,22 @@ class ScoringService:
             }
 
         # STEP 2: Calculate Benchmarks
-        # Valid submissions are those where code_runs=True
-        valid_submissions = CodingSubmission.objects.filter(
-            question_id=question_id,
-            code_runs=True
-        ).exclude(id=submission.id) # Should we exclude current? The prompt says "Average of all valid submissions". 
-        # Usually "all" includes the current one to establish the universe.
-        # "Average of all submissions acts as baseline". Let's include current if saved, but it might not be saved yet?
-        # If not saved, we can't query it. If saved, we query it.
-        # Let's query all valid including this one if it's in DB, or append values if not.
-        # Since we are calling this likely BEFORE or AFTER save? 
-        # Usually scoring happens before final save or updates it. 
-        # Let's assume we fetch averages of *others* + *current* to be mathematically strict "all".
-        
-        # However, for stability, often benchmarks are periodic. But prompt implies dynamic.
-        stats = CodingSubmission.objects.filter(question_id=question_id, code_runs=True).aggregate(
-            avg_time=Avg('execution_time_ms'),
-            avg_complexity=Avg('complexity_rank')
-        )
+        # "Average of all valid submissions acts as baseline". Both modes score
+        # against the submissions graded before this one: the benchmark row
+        # (mean) and its sketches (percentile) are read as they are, and the
+        # current submission is recorded only after scoring.
+        benchmark = BenchmarkService.get(question_id)
         
-        # If this is the very first submission, stats will be None or just this one.
-        # Ensure current values are part of the average if they aren't in DB yet?
-        # Using a simplistic approach: Use DB stats. If None (first sub), use current as baseline.
-        
-        avg_time = stats['avg_time']
-        avg_complexity = stats['avg_complexity']
-        
-        user_time = submission.execution_time_ms if submission.execution_time_ms is not None else 0.0
+        user_time = ScoringService.time_value(submission)
         user_complexity = submission.complexity_rank
         
-        if avg_time is None:
+        # If this is the very first submission, the current values are the baseline.
+        if benchmark and benchmark.submission_count:
+            avg_time = benchmark.avg_time
+            avg_complexity = benchmark.avg_complexity
+        else:
             avg_time = user_time
-        elif submission.id is None: # Not in DB yet
-             # Re-calculate average manually if strict "all" needed
-             count = CodingSubmission.objects.filter(question_id=question_id, code_runs=True).count()
-             total_time = (avg_time * count) + user_time
-             avg_time = total_time / (count + 1)
-             
-        if avg_complexity is None:
-            avg_complexity = float(user_complexity)
-        elif submission.id is None:
-             count = CodingSubmission.objects.filter(question_id=question_id, code_runs=True).count()
-             total_comp = (avg_complexity * count) + user_complexity
-             avg_complexity = total_comp / (count + 1)
+            avg_complexity = user_complexity
 
         # STEP 3: Correctness Score (50%)
         passed_pct = submission.testcases_passed_percentage
@@ -119,10 +128,23 @@ class ScoringService:
                 "tag": "Needs practice"
             }
 
+        # Percentile mode scores against the median/rank instead of the mean,
+        # so a single pathological run can't skew everyone's baseline.
+        time_digest = None
+        complexity_digest = None
+        if ScoringService.scoring_mode() == "percentile" and benchmark and benchmark.time_digest:
+            time_digest = TDigest.from_dict(benchmark.time_digest)
+            complexity_digest = TDigest.from_dict(benchmark.complexity_digest)
+
         # STEP 4: Time Performance Score (25%)
         # BASELINE 15
         time_score = 15.0
-        if avg_time > 0:
+        if time_digest is not None:
+            # Share of valid runs that were at most as fast as this one:
+            # median -> 15, fastest -> 25, slowest -> 5.
+            time_rank = time_digest.cdf(user_time)
+            time_score = 5 + (1 - time_rank) * 20
+        elif avg_time > 0:
             diff_factor = ((avg_time - user_time) / avg_time) * 10
             time_score = 15 + diff_factor
         
@@ -135,7 +157,9 @@ class ScoringService:
         # Lower rank is better.
         # Formula: 15 + ((avg_complexity - user_complexity) * 5)
         # If user (1) < avg (3) -> 15 + (2*5) = 25. High score for low complexity. Correct.
-        diff_val = (avg_complexity - user_complexity) * 5
+        # Percentile mode compares against the median complexity instead.
+        baseline_complexity = complexity_digest.quantile(0.5) if complexity_digest is not None else avg_complexity
+        diff_val = (baseline_complexity - user_complexity) * 5
         optimal_score = 15 + diff_val
         
         # Clamp 0-25
@@ -178,5 +202,7 @@ class ScoringService:
             "final_score": round(final_score, 2),
             "benchmark_avg_time": round(avg_time, 2),
             "benchmark_avg_complexity": round(avg_complexity, 2),
+            "benchmark_p50_time": round(time_digest.quantile(0.5), 2) if time_digest is not None else None,
+            "benchmark_p90_time": round(time_digest.quantile(0.9), 2) if time_digest is not None else None,
             "tag": tag
         }
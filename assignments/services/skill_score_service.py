@@ -0,0 +1,136 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+from assignments.models import (
+    AssignmentAttempt, CodingSubmission, OutputGuessSubmission, QuizSubmission, SkillScore, UserSkillScore
+)
+
+class SkillScoreService:
+    @staticmethod
+    def _bump(queryset, points, answered, **extra):
+        # Same "right-hand sides see the pre-update values" trick as the attempt counters.
+        return queryset.update(
+            points=F('points') + points,
+            answered=F('answered') + answered,
+            score=(F('points') + points) / (F('answered') + answered),
+            **extra,
+        )
+
+    @staticmethod
+    def record(attempt_id, entries):
+        """
+        Adds answers to the attempt's and the user's skill rollups. `entries`
+        maps (skill_id, sub_skill) to (points, answered); answers of untagged
+        questions (skill_id None) are skipped. Update first, create on the
+        first answer for a skill; call inside the submission's transaction.
+        """
+        user_entries = {}
+        for (skill_id, sub_skill), (points, answered) in entries.items():
+            if skill_id is None or not answered:
+                continue
+            user_points, user_answered = user_entries.get(skill_id, (0.0, 0))
+            user_entries[skill_id] = (user_points + points, user_answered + answered)
+
+            rows = SkillScore.objects.filter(attempt_id=attempt_id, skill_id=skill_id, sub_skill=sub_skill)
+            if not SkillScoreService._bump(rows, points, answered):
+                try:
+                    with transaction.atomic():
+                        SkillScore.objects.create(
+                            attempt_id=attempt_id, skill_id=skill_id, sub_skill=sub_skill,
+                            points=points, answered=answered, score=points / answered,
+                        )
+                except IntegrityError:
+                    # A concurrent submission created the row first.
+                    SkillScoreService._bump(rows, points, answered)
+
+        user_id = None
+        for skill_id, (points, answered) in user_entries.items():
+            rows = UserSkillScore.objects.filter(
+                user_id=AssignmentAttempt.objects.filter(id=attempt_id).values('user_id')[:1], skill_id=skill_id
+            )
+            if SkillScoreService._bump(rows, points, answered, updated_at=timezone.now()):
+                continue
+            if user_id is None:
+                user_id = AssignmentAttempt.objects.values_list('user_id', flat=True).get(id=attempt_id)
+            try:
+                with transaction.atomic():
+                    UserSkillScore.objects.create(
+                        user_id=user_id, skill_id=skill_id, points=points, answered=answered, score=points / answered,
+                    )
+            except IntegrityError:
+                SkillScoreService._bump(rows, points, answered, updated_at=timezone.now())
+
+    @staticmethod
+    def profile(attempt_id):
+        """Skill profile of an attempt, one indexed query."""
+        return list(
+            SkillScore.objects.filter(attempt_id=attempt_id)
+            .values('skill_id', 'skill__name', 'sub_skill', 'answered', 'score')
+            .order_by('skill__name', 'sub_skill')
+        )
+
+    @staticmethod
+    def user_profile(user_id):
+        return list(
+            UserSkillScore.objects.filter(user_id=user_id)
+            .values('skill_id', 'skill__name', 'answered', 'score', 'updated_at')
+            .order_by('skill__name')
+        )
+
+    @staticmethod
+    def rebuild(attempt_ids=None):
+        """
+        Recomputes the rollups from the submission tables with grouped
+        aggregates (three queries), then rewrites SkillScore rows for the
+        attempts and UserSkillScore rows for their users in bulk.
+        """
+        totals = {}
+        sources = [
+            (QuizSubmission.objects.all(), Count('id', filter=Q(is_correct=True)), 100.0),
+            (OutputGuessSubmission.objects.all(), Count('id', filter=Q(is_correct=True)), 100.0),
+            (CodingSubmission.objects.filter(grading_status=CodingSubmission.GradingStatus.DONE), Sum('total_score'), 1.0),
+        ]
+        for submissions, points, scale in sources:
+            submissions = submissions.filter(question__skill__isnull=False)
+            if attempt_ids is not None:
+                submissions = submissions.filter(attempt_id__in=attempt_ids)
+            rows = (
+                submissions.values_list('attempt_id', 'question__skill_id', 'question__sub_skill').order_by()
+                .annotate(points=points, answered=Count('id'))
+            )
+            for attempt_id, skill_id, sub_skill, row_points, answered in rows.iterator(chunk_size=2000):
+                entry = totals.setdefault((attempt_id, skill_id, sub_skill), [0.0, 0])
+                entry[0] += (row_points or 0.0) * scale
+                entry[1] += answered
+
+        skill_scores = [
+            SkillScore(
+                attempt_id=attempt_id, skill_id=skill_id, sub_skill=sub_skill,
+                points=points, answered=answered, score=points / answered,
+            )
+            for (attempt_id, skill_id, sub_skill), (points, answered) in totals.items()
+        ]
+        with transaction.atomic():
+            stale = SkillScore.objects.all()
+            if attempt_ids is not None:
+                stale = stale.filter(attempt_id__in=attempt_ids)
+            stale.delete()
+            SkillScore.objects.bulk_create(skill_scores, batch_size=1000)
+
+            # User profiles cover every attempt of the user, so refold them from SkillScore.
+            user_rows = SkillScore.objects.all()
+            stale_profiles = UserSkillScore.objects.all()
+            if attempt_ids is not None:
+                user_ids = set(AssignmentAttempt.objects.filter(id__in=attempt_ids).values_list('user_id', flat=True))
+                user_rows = user_rows.filter(attempt__user_id__in=user_ids)
+                stale_profiles = stale_profiles.filter(user_id__in=user_ids)
+            user_rows = (
+                user_rows.values_list('attempt__user_id', 'skill_id').order_by()
+                .annotate(points=Sum('points'), answered=Sum('answered'))
+            )
+            stale_profiles.delete()
+            UserSkillScore.objects.bulk_create([
+                UserSkillScore(user_id=user_id, skill_id=skill_id, points=points, answered=answered, score=points / answered)
+                for user_id, skill_id, points, answered in user_rows
+            ], batch_size=1000)
+        return len(skill_scores)
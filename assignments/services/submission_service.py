@@ -1,127 +1,439 @@
+from asgiref.sync import sync_to_async
 from django.utils import timezone
-from django.db import transaction
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from aptify.http_cache import cache_key, invalidate
 from assignments.models import (
     AssignmentAttempt, Question, QuizSubmission, OutputGuessSubmission, CodingSubmission,
-    QuizQuestion, OutputGuessQuestion
+    QuizQuestion, OutputGuessQuestion, CodingQuestion
 )
+from assignments.services.answer_key_cache import AnswerKeyCache
+from assignments.services.benchmark_service import BenchmarkService
+from assignments.services.execution_engine import ExecutionEngine, SandboxUnavailable, SandboxWorkerCrashed
+from assignments.services.grading_cache import GradingCache
+from assignments.services.grading_queue import GradingQueue, queue_settings
+from assignments.services.question_plan import QuestionPlanService
 from assignments.services.scoring_service import ScoringService
+from assignments.services.skill_score_service import SkillScoreService
+
+class DuplicateAnswer(Exception):
+    """The attempt already has an answer for this quiz / output question."""
+
+
+# Columns written once a submission is graded; the submitted code is never rewritten.
+GRADED_FIELDS = [
+    'execution_time_ms', 'cpu_time_ms', 'op_count', 'memory_usage_kb', 'passed_test_cases', 'total_test_cases',
+    'testcases_passed_percentage', 'code_runs', 'grading_error', 'is_correct',
+    'correctness_score', 'time_perf_score', 'optimality_score', 'total_score', 'feedback_tag',
+    'complexity_rank', 'complexity_analysis', 'grading_status', 'graded_at', 'graded_from_cache',
+]
+
 
 class SubmissionService:
     
     @staticmethod
     def start_assignment(user, assignment_id):
+        plan = QuestionPlanService.build(assignment_id)
         attempt = AssignmentAttempt.objects.create(
             user=user,
-            assignment_id=assignment_id
+            assignment_id=assignment_id,
+            question_plan=plan,
         )
+        QuestionPlanService.cache_positions(attempt.id, plan)
+        # Answers start arriving right away; have their keys ready.
+        AnswerKeyCache.warm(assignment_id)
         return attempt
 
     @staticmethod
     def submit_quiz_answer(attempt_id, question_id, selected_option_id):
-        question = QuizQuestion.objects.get(question_id=question_id)
-        is_correct = (selected_option_id == question.correct_option_id)
+        answer_key = AnswerKeyCache.get(question_id)
+        if answer_key is None or answer_key['question_type'] != Question.QuestionType.QUIZ:
+            raise QuizQuestion.DoesNotExist(f"No quiz question {question_id}")
+        is_correct = (selected_option_id == answer_key['answer'])
         
-        Submission = QuizSubmission.objects.create(
-            attempt_id=attempt_id,
-            question_id=question_id,
-            selected_option_id=selected_option_id,
-            is_correct=is_correct,
-            time_taken_seconds=0 # Logic to tracking time per question needs frontend to send delta
-        )
+        try:
+            with transaction.atomic():
+                QuizSubmission.objects.create(
+                    attempt_id=attempt_id,
+                    question_id=question_id,
+                    selected_option_id=selected_option_id,
+                    is_correct=is_correct,
+                    time_taken_seconds=0 # Logic to tracking time per question needs frontend to send delta
+                )
+                SubmissionService._record_answers(attempt_id, 'quiz', int(is_correct), 1, [question_id])
+                SkillScoreService.record(attempt_id, {
+                    (answer_key['skill_id'], answer_key['sub_skill']): (100.0 * is_correct, 1)
+                })
+        except IntegrityError:
+            # quizsub_unique_attempt_question: the first answer stands. Any
+            # other violation (e.g. a foreign key) is not a duplicate.
+            if not SubmissionService._answered(QuizSubmission, attempt_id, [question_id]):
+                raise
+            raise DuplicateAnswer(f"Question {question_id} was already answered in attempt {attempt_id}")
         return is_correct
 
     @staticmethod
     def submit_output_guess(attempt_id, question_id, predicted_output):
-        question = OutputGuessQuestion.objects.get(question_id=question_id)
+        answer_key = AnswerKeyCache.get(question_id)
+        if answer_key is None or answer_key['question_type'] != Question.QuestionType.OUTPUT:
+            raise OutputGuessQuestion.DoesNotExist(f"No output-guess question {question_id}")
         # Normalize strings for comparison (strip whitespace)
-        is_correct = (predicted_output.strip() == question.correct_output.strip())
+        is_correct = (predicted_output.strip() == answer_key['answer'].strip())
         
-        OutputGuessSubmission.objects.create(
-            attempt_id=attempt_id,
-            question_id=question_id,
-            predicted_output=predicted_output,
-            is_correct=is_correct,
-            time_taken_seconds=0 # Placeholder
-        )
+        try:
+            with transaction.atomic():
+                OutputGuessSubmission.objects.create(
+                    attempt_id=attempt_id,
+                    question_id=question_id,
+                    predicted_output=predicted_output,
+                    is_correct=is_correct,
+                    time_taken_seconds=0 # Placeholder
+                )
+                SubmissionService._record_answers(attempt_id, 'output', int(is_correct), 1, [question_id])
+                SkillScoreService.record(attempt_id, {
+                    (answer_key['skill_id'], answer_key['sub_skill']): (100.0 * is_correct, 1)
+                })
+        except IntegrityError:
+            if not SubmissionService._answered(OutputGuessSubmission, attempt_id, [question_id]):
+                raise
+            raise DuplicateAnswer(f"Question {question_id} was already answered in attempt {attempt_id}")
         return is_correct
 
     @staticmethod
-    def submit_code(attempt_id, question_id, code, time_taken, complexity_rank, testcases_passed_percentage, code_runs, language="python"):
-        # Create submission with raw metrics
-        submission = CodingSubmission(
+    def submit_answers_batch(attempt_id, answers):
+        """
+        Grades a list of quiz / output-guess answers for one attempt against the
+        cached answer keys, with one INSERT per submission table.
+        `answers` items are dicts with question_id, question_type ('QUIZ' or
+        'OUTPUT'), answer and optional time_taken_seconds. Returns one result
+        per item, in order; questions answered before (or twice in the batch)
+        are reported as duplicates and not stored.
+        """
+        QuestionType = Question.QuestionType
+        answer_keys = AnswerKeyCache.get_many([a['question_id'] for a in answers])
+        # Index-only lookups on the (attempt, question) unique constraints.
+        answered = set(QuizSubmission.objects.filter(
+            attempt_id=attempt_id, question_id__in=[a['question_id'] for a in answers if a['question_type'] == QuestionType.QUIZ]
+        ).values_list('question_id', flat=True))
+        answered.update(OutputGuessSubmission.objects.filter(
+            attempt_id=attempt_id, question_id__in=[a['question_id'] for a in answers if a['question_type'] == QuestionType.OUTPUT]
+        ).values_list('question_id', flat=True))
+
+        results = []
+        quiz_rows, output_rows = [], []
+        skill_entries = {}
+        for answer in answers:
+            question_id = answer['question_id']
+            time_taken = answer.get('time_taken_seconds', 0)
+            answer_key = answer_keys.get(question_id)
+            key_type = answer_key['question_type'] if answer_key else None
+            if key_type == answer['question_type'] and question_id in answered:
+                results.append({"question_id": question_id, "status": "duplicate", "is_correct": None})
+                continue
+            if answer['question_type'] == QuestionType.QUIZ and key_type == QuestionType.QUIZ:
+                is_correct = (answer['answer'] == answer_key['answer'])
+                quiz_rows.append(QuizSubmission(
+                    attempt_id=attempt_id, question_id=question_id, selected_option_id=answer['answer'],
+                    is_correct=is_correct, time_taken_seconds=time_taken,
+                ))
+            elif answer['question_type'] == QuestionType.OUTPUT and key_type == QuestionType.OUTPUT:
+                # Normalize strings for comparison (strip whitespace)
+                is_correct = (answer['answer'].strip() == answer_key['answer'].strip())
+                output_rows.append(OutputGuessSubmission(
+                    attempt_id=attempt_id, question_id=question_id, predicted_output=answer['answer'],
+                    is_correct=is_correct, time_taken_seconds=time_taken,
+                ))
+            else:
+                results.append({"question_id": question_id, "status": "unknown_question", "is_correct": None})
+                continue
+            answered.add(question_id)
+            skill_key = (answer_key['skill_id'], answer_key['sub_skill'])
+            points, count = skill_entries.get(skill_key, (0.0, 0))
+            skill_entries[skill_key] = (points + 100.0 * is_correct, count + 1)
+            results.append({"question_id": question_id, "status": "ok", "is_correct": is_correct})
+
+        try:
+            with transaction.atomic():
+                if quiz_rows:
+                    QuizSubmission.objects.bulk_create(quiz_rows)
+                    SubmissionService._record_answers(
+                        attempt_id, 'quiz', sum(r.is_correct for r in quiz_rows), len(quiz_rows),
+                        [r.question_id for r in quiz_rows],
+                    )
+                if output_rows:
+                    OutputGuessSubmission.objects.bulk_create(output_rows)
+                    SubmissionService._record_answers(
+                        attempt_id, 'output', sum(r.is_correct for r in output_rows), len(output_rows),
+                        [r.question_id for r in output_rows],
+                    )
+                SkillScoreService.record(attempt_id, skill_entries)
+        except IntegrityError:
+            # A concurrent request stored one of these answers first.
+            if not (
+                SubmissionService._answered(QuizSubmission, attempt_id, [r.question_id for r in quiz_rows])
+                or SubmissionService._answered(OutputGuessSubmission, attempt_id, [r.question_id for r in output_rows])
+            ):
+                raise
+            raise DuplicateAnswer(f"Some of these questions were already answered in attempt {attempt_id}")
+        return results
+
+    @staticmethod
+    def _answered(model, attempt_id, question_ids):
+        """
+        Whether any of `question_ids` already has an answer in the attempt:
+        tells the (attempt, question) unique violation apart from other
+        integrity errors after a failed insert.
+        """
+        return bool(question_ids) and model.objects.filter(attempt_id=attempt_id, question_id__in=question_ids).exists()
+
+    @staticmethod
+    def submit_code(attempt_id, question_id, code, time_taken_seconds=0, language="python"):
+        """
+        Stores the submission and queues it for grading. Execution metrics are
+        measured server-side by the sandbox; nothing the client reports about
+        running the code is trusted. Code the sandbox already ran against the
+        current test suite (up to line endings) is graded right
+        away from the cached result instead.
+        """
+        mode = ExecutionEngine.limits()["GRADING_MODE"]
+        cached_result = GradingCache.get(question_id, code, mode)
+        with transaction.atomic():
+            submission = CodingSubmission.objects.create(
+                attempt_id=attempt_id,
+                question_id=question_id,
+                submitted_code=code,
+                time_taken_seconds=time_taken_seconds,
+                grading_status=CodingSubmission.GradingStatus.QUEUED,
+            )
+            # The student moves on while the submission is graded.
+            AssignmentAttempt.objects.filter(id=attempt_id).update(
+                plan_cursor=QuestionPlanService.advanced_cursor(attempt_id, [question_id])
+            )
+            if cached_result is None:
+                GradingQueue.enqueue(submission.id)
+            else:
+                skill = Question.objects.values_list('skill_id', 'sub_skill').get(id=question_id)
+                SubmissionService._apply_result(submission, cached_result, skill, cached=True)
+        return submission
+
+    @staticmethod
+    async def asubmit_code(attempt_id, question_id, code, time_taken_seconds=0, language="python"):
+        """
+        submit_code() for async views. A queued submission only needs two
+        writes, done with the async ORM in autocommit mode; the grading
+        handoff follows the committed insert. Cache hits are scored right
+        away, which takes a transaction, so they go through submit_code().
+        """
+        mode = ExecutionEngine.limits()["GRADING_MODE"]
+        if await sync_to_async(GradingCache.get)(question_id, code, mode) is not None:
+            return await sync_to_async(SubmissionService.submit_code)(
+                attempt_id, question_id, code, time_taken_seconds, language
+            )
+        submission = await CodingSubmission.objects.acreate(
             attempt_id=attempt_id,
             question_id=question_id,
             submitted_code=code,
-            time_taken_seconds=time_taken,
-            
-            # Execution Metrics
-            execution_time_ms=time_taken, # Assuming input is ms? User said "execution_time". DB has "time_taken_seconds". 
-            # Prompt says "execution_time" in input. DB has `execution_time_ms` and `time_taken_seconds`.
-            # Let's standardize: Input `execution_time` is in ms. `time_taken_seconds` is execution_time/1000.
-            # But the models.py has `execution_time_ms` and `time_taken_seconds`.
-            # Let's assume the API sends `execution_time` (ms).
-            
-            complexity_rank=complexity_rank,
-            testcases_passed_percentage=testcases_passed_percentage,
-            code_runs=code_runs,
-            
-            # Derived correctness (for simplified querying if needed, but widely we use score)
-            is_correct=(testcases_passed_percentage == 100)
+            time_taken_seconds=time_taken_seconds,
+            grading_status=CodingSubmission.GradingStatus.QUEUED,
+        )
+        cursor = await sync_to_async(QuestionPlanService.advanced_cursor)(attempt_id, [question_id])
+        await AssignmentAttempt.objects.filter(id=attempt_id).aupdate(plan_cursor=cursor)
+        await GradingQueue.aenqueue(submission.id)
+        return submission
+
+    @staticmethod
+    def grade_submission(submission_id):
+        """
+        Runs a queued submission in the sandbox and scores it. Called by the
+        grading consumers, never inside a web request.
+        """
+        submission = CodingSubmission.objects.with_code().get(id=submission_id)
+        if submission.grading_status == CodingSubmission.GradingStatus.DONE:
+            # Already graded (e.g. a job delivered twice); never count it again.
+            return submission
+        max_attempts = queue_settings()["MAX_ATTEMPTS"]
+        if submission.grading_attempts > max_attempts:
+            # Reclaimed after its grader died this many times; don't take another one down.
+            SubmissionService._fail(submission, f"Grading was abandoned after {max_attempts} attempts")
+            return submission
+        mode = ExecutionEngine.limits()["GRADING_MODE"]
+        try:
+            coding_question = (
+                CodingQuestion.objects.with_tests().with_generator().select_related('question')
+                .get(question_id=submission.question_id)
+            )
+            version = coding_question.test_suite_hash
+            result = GradingCache.get(submission.question_id, submission.submitted_code, mode, version)
+            cached = result is not None
+            if result is None:
+                result = ExecutionEngine.run_test_cases(
+                    submission.submitted_code, coding_question.test_cases or [], mode,
+                    count_ops=ScoringService.time_metric() == "ops",
+                )
+                if result["code_runs"]:
+                    # Replaces the client-reported rank: measured on generated inputs.
+                    result["complexity"] = ExecutionEngine.estimate_complexity(
+                        submission.submitted_code, coding_question.input_generator
+                    )
+                GradingCache.set(submission.question_id, submission.submitted_code, mode, result, version)
+        except SandboxWorkerCrashed:
+            # The worker died on this very job: possibly the host, possibly the
+            # submission killing it. Retry a few times, then give up on it.
+            if submission.grading_attempts >= max_attempts:
+                SubmissionService._fail(submission, "The submission crashed the sandbox worker")
+                raise
+            SubmissionService._requeue(submission)
+            raise
+        except SandboxUnavailable:
+            # Capacity problem, not the student's fault: put it back in the
+            # queue without spending one of its attempts.
+            SubmissionService._requeue(submission, refund_attempt=True)
+            raise
+        except Exception as exc:
+            SubmissionService._fail(submission, str(exc))
+            raise
+
+        # Writes nothing if the job was reclaimed while this grader was busy.
+        with transaction.atomic():
+            SubmissionService._apply_result(
+                submission, result, (coding_question.question.skill_id, coding_question.question.sub_skill), cached
+            )
+        return submission
+
+    @staticmethod
+    def _claim(submission):
+        """
+        Filter matching the row only while it is still in the state this
+        grader loaded it in. A job reclaimed by another grader in the
+        meantime carries a new grading_started_at and no longer matches.
+        """
+        return {
+            'id': submission.id,
+            'grading_status': submission.grading_status,
+            'grading_started_at': submission.grading_started_at,
+        }
+
+    @staticmethod
+    def _requeue(submission, refund_attempt=False):
+        claim = SubmissionService._claim(submission)
+        submission.grading_status = CodingSubmission.GradingStatus.QUEUED
+        fields = {'grading_status': submission.grading_status}
+        if refund_attempt:
+            fields['grading_attempts'] = F('grading_attempts') - 1
+        if CodingSubmission.objects.filter(**claim).update(**fields):
+            GradingQueue.enqueue(submission.id)
+
+    @staticmethod
+    def _fail(submission, error):
+        claim = SubmissionService._claim(submission)
+        submission.grading_status = CodingSubmission.GradingStatus.FAILED
+        submission.grading_error = error
+        submission.graded_at = timezone.now()
+        CodingSubmission.objects.filter(**claim).update(
+            grading_status=submission.grading_status,
+            grading_error=submission.grading_error,
+            graded_at=submission.graded_at,
         )
+
+    @staticmethod
+    def _apply_result(submission, result, skill, cached=False):
+        """
+        Scores a sandbox result and stores it on the submission, the question
+        benchmark, the attempt and the skill rollups. `skill` is the
+        question's (skill_id, sub_skill). `cached` marks a result reused
+        from the GradingCache: it is scored, but not added to the benchmark
+        again. Call inside a transaction.
+        Returns False, recording nothing, when the row was reclaimed or
+        graded by someone else since this grader loaded it.
+        """
+        claim = SubmissionService._claim(submission)
+        # Execution Metrics
+        submission.execution_time_ms = result["execution_time_ms"]
+        submission.cpu_time_ms = result["cpu_time_ms"]
+        submission.op_count = result["op_count"]
+        submission.memory_usage_kb = result["memory_usage_kb"]
+        submission.passed_test_cases = result["passed_test_cases"]
+        submission.total_test_cases = result["total_test_cases"]
+        submission.testcases_passed_percentage = result["testcases_passed_percentage"]
+        submission.code_runs = result["code_runs"]
+        submission.grading_error = result["error"] or ""
+
+        complexity = result.get("complexity")
+        if complexity:
+            submission.complexity_rank = complexity["rank"]
+            submission.complexity_analysis = complexity["label"]
+
+        # Derived correctness (for simplified querying if needed, but widely we use score)
+        submission.is_correct = (result["total_test_cases"] > 0 and result["passed_test_cases"] == result["total_test_cases"])
         
         # Calculate Scores using strict service
-        scores = ScoringService.calculate_coding_score(submission, question_id) 
+        scores = ScoringService.calculate_coding_score(submission, submission.question_id) 
         
         submission.correctness_score = scores["correctness_score"]
         submission.time_perf_score = scores["time_score"]
         submission.optimality_score = scores["optimality_score"]
         submission.total_score = scores["final_score"]
-        
-        # Determine strict pass/fail or tagging? 
-        # The prompt asks for tagging in output, but maybe store it too? 
-        # Tag is returned, maybe we can store it in metadata or just return it. 
-        # Not explicitly asked to store tag in DB, but good for reporting.
-        # Let's store it in complexity_analysis or a new field if needed. 
-        # For now, just save scores.
-        
-        submission.save()
-        
-        # Attach the tag to the object temporarily for return (not saved to DB)
-        submission.tag = scores["tag"]
-        
-        return submission
+        submission.feedback_tag = scores["tag"]
+
+        submission.grading_status = CodingSubmission.GradingStatus.DONE
+        submission.graded_at = timezone.now()
+        submission.graded_from_cache = cached
+        # Conditional write: the benchmark, attempt and skill counters below
+        # must only ever count one grading of this submission.
+        if not CodingSubmission.objects.filter(**claim).update(
+            **{field: getattr(submission, field) for field in GRADED_FIELDS}
+        ):
+            return False
+        # A cache hit is the same run again; recording it would weight the
+        # benchmark towards popular (copied) solutions.
+        if submission.code_runs and not cached:
+            BenchmarkService.record(submission.question_id, ScoringService.time_value(submission), submission.complexity_rank)
+        SubmissionService._record_coding_score(submission.attempt_id, submission.total_score)
+        SkillScoreService.record(submission.attempt_id, {skill: (submission.total_score, 1)})
+        return True
+
+    # Score columns and the counters they derive from, per answer kind.
+    ANSWER_COUNTERS = {
+        'quiz': ('concept_score', 'quiz_correct', 'quiz_total'),
+        'output': ('logic_score', 'output_correct', 'output_total'),
+    }
+
+    @staticmethod
+    def _record_answers(attempt_id, kind, correct, total, question_ids=()):
+        """
+        Adds `correct` out of `total` answers to the attempt's running counters
+        and recomputes the matching score in the same UPDATE statement (the
+        right-hand sides see the pre-update values). The plan cursor moves
+        past `question_ids` in that statement too.
+        """
+        score_field, correct_field, total_field = SubmissionService.ANSWER_COUNTERS[kind]
+        AssignmentAttempt.objects.filter(id=attempt_id).update(**{
+            correct_field: F(correct_field) + correct,
+            total_field: F(total_field) + total,
+            # Same formula as ScoringService.calculate_quiz_score / calculate_logic_score
+            score_field: (F(correct_field) + correct) * 100.0 / (F(total_field) + total),
+            'plan_cursor': QuestionPlanService.advanced_cursor(attempt_id, question_ids),
+        })
+        invalidate(cache_key('attempt_summary', attempt_id))
+
+    @staticmethod
+    def _record_coding_score(attempt_id, total_score):
+        # Execution Score = average total_score of the graded coding submissions.
+        AssignmentAttempt.objects.filter(id=attempt_id).update(
+            coding_total=F('coding_total') + 1,
+            coding_score_sum=F('coding_score_sum') + total_score,
+            execution_score=(F('coding_score_sum') + total_score) / (F('coding_total') + 1),
+        )
+        invalidate(cache_key('attempt_summary', attempt_id))
 
     @staticmethod
     def finalize_attempt(attempt_id):
         """
-        Aggregates all submissions and updates the Attempt with final scores.
+        Marks the attempt as completed. Scores are kept current by every
+        submission, so this is a single UPDATE with no aggregation.
         """
-        attempt = AssignmentAttempt.objects.get(id=attempt_id)
-        
-        # 1. Calculate Quiz Score
-        quiz_submissions = attempt.submissions.instance_of(QuizSubmission)
-        quiz_total = quiz_submissions.count()
-        quiz_correct = quiz_submissions.filter(quizsubmission__is_correct=True).count()
-        attempt.concept_score = ScoringService.calculate_quiz_score(quiz_correct, quiz_total)
-        
-        # 2. Calculate Logic Score
-        logic_submissions = attempt.submissions.instance_of(OutputGuessSubmission)
-        logic_total = logic_submissions.count()
-        logic_correct = logic_submissions.filter(outputguesssubmission__is_correct=True).count()
-        attempt.logic_score = ScoringService.calculate_logic_score(logic_correct, logic_total)
-        
-        # 3. Calculate Execution Score
-        # Average of all coding problems? Or Sum?
-        # Requires clarification. Usually "Execution Score" is 0-100.
-        # Let's average the percentage of the coding problems.
-        coding_submissions = attempt.submissions.instance_of(CodingSubmission)
-        if coding_submissions.exists():
-            # coding_submission.total_score is out of 100
-            avg_code_score = coding_submissions.aggregate(Avg('codingsubmission__total_score'))['codingsubmission__total_score__avg']
-            attempt.execution_score = avg_code_score
-        else:
-            attempt.execution_score = 0.0
-            
-        attempt.completed_at = timezone.now()
-        attempt.save()
-        return attempt
+        AssignmentAttempt.objects.filter(id=attempt_id, completed_at__isnull=True).update(
+            completed_at=timezone.now()
+        )
+        invalidate(cache_key('attempt_summary', attempt_id))
+        return AssignmentAttempt.objects.get(id=attempt_id)
@@ -0,0 +1,158 @@
+"""
+Content-addressed storage for large test-case inputs and outputs.
+
+Blobs live on disk under TESTCASE_STORE["ROOT"] as ``<sha256[:2]>/<sha256>``
+(the directory can be a shared volume or a mounted object-store bucket, since
+files are written once and never change). A test case in
+``CodingQuestion.test_cases`` then only keeps metadata::
+
+    {"input_ref": "<sha256>", "output_ref": "<sha256>", "hidden": true}
+
+Small cases may still carry inline "input" / "output" strings.
+
+Sandbox workers resolve references through a per-worker ``BlobCache`` of
+read-only memory maps, so a stress-test input is neither stored in the
+database row nor copied through the job pipe, and repeated gradings of the
+same question reuse the pages already mapped. Like the execution engine,
+this module imports no Django models.
+"""
+import hashlib
+import mmap
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+DEFAULT_SETTINGS = {
+    "ROOT": None,  # defaults to BASE_DIR / "testcase_store"
+    "INLINE_MAX_BYTES": 4096,
+    "WORKER_CACHE_MB": 256,
+}
+
+REF_FIELDS = {"input": "input_ref", "output": "output_ref"}
+
+
+def store_settings():
+    options = {**DEFAULT_SETTINGS, **getattr(settings, "TESTCASE_STORE", {})}
+    if not options["ROOT"]:
+        options["ROOT"] = os.path.join(settings.BASE_DIR, "testcase_store")
+    options["ROOT"] = str(options["ROOT"])
+    return options
+
+
+def blob_path(root, digest):
+    return os.path.join(root, digest[:2], digest)
+
+
+class TestCaseStore:
+    @staticmethod
+    def put(data, root=None):
+        """Stores `data` (str or bytes) and returns its sha256 hex digest."""
+        if isinstance(data, str):
+            data = data.encode()
+        root = root or store_settings()["ROOT"]
+        digest = hashlib.sha256(data).hexdigest()
+        path = blob_path(root, digest)
+        if os.path.exists(path):
+            return digest
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so readers never see a partial blob.
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                # mkstemp creates 0600; the sandbox workers read blobs as SANDBOX["UID"].
+                os.fchmod(fh.fileno(), 0o644)
+                fh.write(data)
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return digest
+
+    @staticmethod
+    def read(digest, root=None):
+        with open(blob_path(root or store_settings()["ROOT"], digest), "rb") as fh:
+            return fh.read()
+
+    @staticmethod
+    def externalize(test_cases, min_bytes=None, root=None):
+        """
+        Returns (test_cases, moved): inline inputs / outputs of at least
+        `min_bytes` bytes are moved into the store and replaced by refs.
+        """
+        if min_bytes is None:
+            min_bytes = store_settings()["INLINE_MAX_BYTES"]
+        moved = 0
+        cases = []
+        for case in test_cases:
+            case = dict(case)
+            for field, ref_field in REF_FIELDS.items():
+                value = case.get(field)
+                if value is None or ref_field in case:
+                    continue
+                if len(str(value).encode()) >= min_bytes:
+                    case[ref_field] = TestCaseStore.put(str(value), root)
+                    del case[field]
+                    moved += 1
+            cases.append(case)
+        return cases, moved
+
+    @staticmethod
+    def missing(test_cases, root=None):
+        """Digests referenced by `test_cases` that are not in the store."""
+        root = root or store_settings()["ROOT"]
+        return [
+            case[ref_field]
+            for case in test_cases for ref_field in REF_FIELDS.values()
+            if case.get(ref_field) and not os.path.exists(blob_path(root, case[ref_field]))
+        ]
+
+
+class BlobCache:
+    """
+    LRU of read-only memory maps over store blobs, one per sandbox worker.
+    Maps are shared with forked test-case children copy-free. `trim()`
+    unmaps the least recently used ones once more than `max_bytes` are
+    mapped; the worker calls it between test cases, never while a map is in use.
+    """
+
+    def __init__(self, root, max_bytes, dir_fd=None):
+        self.root = root
+        # Chrooted sandbox workers can't resolve `root`; they pass a
+        # descriptor of it opened beforehand and blobs are opened relative to it.
+        self.dir_fd = dir_fd
+        self.max_bytes = max_bytes
+        self.mapped_bytes = 0
+        self._maps = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest):
+        with self._lock:
+            blob = self._maps.get(digest)
+            if blob is not None:
+                self._maps.move_to_end(digest)
+                return blob
+            if self.dir_fd is not None:
+                fh = open(blob_path("", digest), "rb", opener=lambda path, flags: os.open(path, flags, dir_fd=self.dir_fd))
+            else:
+                fh = open(blob_path(self.root, digest), "rb")
+            with fh:
+                size = os.fstat(fh.fileno()).st_size
+                # Empty files cannot be mapped.
+                blob = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+            self._maps[digest] = blob
+            self.mapped_bytes += size
+            return blob
+
+    def trim(self):
+        with self._lock:
+            while self.mapped_bytes > self.max_bytes and self._maps:
+                _, evicted = self._maps.popitem(last=False)
+                self.mapped_bytes -= len(evicted)
+                if isinstance(evicted, mmap.mmap):
+                    evicted.close()
@@ -0,0 +1,32 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from aptify.http_cache import cache_key, invalidate
+from .models import AssignmentAttempt, CodingQuestion, OutputGuessQuestion, Question, QuizQuestion
+from .services.answer_key_cache import AnswerKeyCache
+from .services.grading_cache import GradingCache
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalidate_question_answer_key(sender, instance, **kwargs):
+    # Skill / sub-skill are cached next to the answer key.
+    transaction.on_commit(lambda: AnswerKeyCache.invalidate(instance.pk))
+
+@receiver(post_save, sender=QuizQuestion)
+@receiver(post_delete, sender=QuizQuestion)
+@receiver(post_save, sender=OutputGuessQuestion)
+@receiver(post_delete, sender=OutputGuessQuestion)
+def invalidate_answer_key(sender, instance, **kwargs):
+    transaction.on_commit(lambda: AnswerKeyCache.invalidate(instance.question_id))
+
+@receiver(post_save, sender=CodingQuestion)
+@receiver(post_delete, sender=CodingQuestion)
+def invalidate_test_suite(sender, instance, **kwargs):
+    # Cached grading results are keyed by the suite version; drop the version.
+    transaction.on_commit(lambda: GradingCache.invalidate(instance.question_id))
+
+@receiver(post_save, sender=AssignmentAttempt)
+@receiver(post_delete, sender=AssignmentAttempt)
+def attempt_changed(sender, instance, **kwargs):
+    # Counter updates go through queryset.update() and invalidate explicitly.
+    invalidate(cache_key('attempt_summary', instance.pk))
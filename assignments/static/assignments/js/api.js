@@ -63,18 +63,41 @@ const AssignmentAPI = {
             predicted_output: predictedOutput
         });
     },
-    submitCode: async (attemptId, questionId, code, executionTime, complexity, passedPct, codeRuns) => {
+    submitAnswersBatch: async (attemptId, answers) => {
+        // answers: [{question_id, question_type: 'QUIZ' | 'OUTPUT', answer, time_taken_seconds}]
+        return await apiCall('/answers/batch', 'POST', {
+            attempt_id: attemptId,
+            answers: answers
+        });
+    },
+    submitCode: async (attemptId, questionId, code, timeTakenSeconds = 0) => {
+        // Execution metrics are measured by the server-side sandbox.
         return await apiCall('/code/submit', 'POST', {
             attempt_id: attemptId,
             question_id: questionId,
             code: code,
-            execution_time: executionTime,
-            complexity_rank: complexity,
-            testcases_passed_percentage: passedPct,
-            code_runs: codeRuns
+            time_taken_seconds: timeTakenSeconds
         });
     },
+    codeStatus: async (submissionId, waitSeconds = 0, lastStatus = null) => {
+        let query = `?wait=${waitSeconds}`;
+        if (lastStatus) {
+            query += `&last_status=${lastStatus}`;
+        }
+        return await apiCall(`/code/${submissionId}/status${query}`, 'GET');
+    },
+    waitForGrading: async (submissionId) => {
+        // Long-poll until the grading queue reports a final status.
+        let result = await AssignmentAPI.codeStatus(submissionId);
+        while (result.status !== 'DONE' && result.status !== 'FAILED') {
+            result = await AssignmentAPI.codeStatus(submissionId, 20, result.status);
+        }
+        return result;
+    },
     getSummary: async (attemptId) => {
         return await apiCall(`/${attemptId}/summary`, 'GET');
+    },
+    finalize: async (attemptId) => {
+        return await apiCall(`/${attemptId}/finalize`, 'POST');
     }
 };
@@ -0,0 +1,95 @@
+import os
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from assignments.models import Assignment, CodingSubmission, Question
+from assignments.services.benchmark_service import BenchmarkService
+from assignments.services.execution_engine import ExecutionEngine, Verdict
+from assignments.services.scoring_service import ScoringService
+
+
+class SandboxConfinementTests(SimpleTestCase):
+    """
+    Runs real submissions through the sandbox pool as whatever user runs the
+    test suite; run it as the deployment user to check that user's limits.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Set before the pool starts so the workers would inherit it.
+        os.environ["APTIFY_SANDBOX_TEST_SECRET"] = "do-not-leak"
+
+    @classmethod
+    def tearDownClass(cls):
+        os.environ.pop("APTIFY_SANDBOX_TEST_SECRET", None)
+        super().tearDownClass()
+
+    def run_source(self, source, output="ok"):
+        return ExecutionEngine.run_test_cases(source, [{"input": "", "output": output}])
+
+    def test_environment_is_cleared(self):
+        result = self.run_source("import os\nprint(os.environ.get('APTIFY_SANDBOX_TEST_SECRET'))", output="None")
+        self.assertEqual(result["verdicts"], [Verdict.PASSED])
+
+    def test_errors_do_not_carry_messages(self):
+        result = self.run_source("import os\nraise Exception(os.environ.get('APTIFY_SANDBOX_TEST_SECRET', 'x'))")
+        self.assertEqual(result["error"], "Exception on line 2")
+
+    def test_project_files_are_out_of_reach(self):
+        result = self.run_source(f"print(open({os.path.abspath(__file__)!r}).read()[:2])")
+        self.assertEqual(result["verdicts"], [Verdict.RUNTIME_ERROR])
+        self.assertEqual(result["error"], "FileNotFoundError on line 1")
+
+    def test_fork_is_blocked(self):
+        result = self.run_source("import os\nif os.fork() == 0:\n    os._exit(0)\nprint('ok')")
+        self.assertEqual(result["verdicts"], [Verdict.RUNTIME_ERROR])
+        self.assertTrue(result["error"].startswith("BlockingIOError"), result["error"])
+
+    def test_subprocess_is_blocked(self):
+        result = self.run_source("import subprocess\nsubprocess.run(['true'])\nprint('ok')")
+        self.assertEqual(result["verdicts"], [Verdict.RUNTIME_ERROR])
+
+
+class CodingScoreBaselineTests(TestCase):
+    """
+    Both scoring modes rate a submission against the ones graded before it.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        assignment = Assignment.objects.create(title="Baseline")
+        cls.question = Question.objects.create(assignment=assignment, question_type=Question.QuestionType.CODE)
+
+    def record_history(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for time_value, complexity_rank in ((100, 1), (200, 2), (300, 3)):
+                BenchmarkService.record(self.question.id, time_value, complexity_rank)
+
+    def score(self, mode):
+        submission = CodingSubmission(
+            question=self.question, code_runs=True, testcases_passed_percentage=100,
+            execution_time_ms=100, complexity_rank=2,
+        )
+        with override_settings(SCORING={"MODE": mode, "TIME_METRIC": "wall"}):
+            return ScoringService.calculate_coding_score(submission, self.question.id)
+
+    def test_first_submission_is_its_own_baseline(self):
+        for mode in ("mean", "percentile"):
+            scores = self.score(mode)
+            self.assertEqual((scores["time_score"], scores["optimality_score"]), (15.0, 15.0), mode)
+
+    def test_mean_mode_excludes_the_current_submission(self):
+        self.record_history()
+        scores = self.score("mean")
+        self.assertEqual(scores["benchmark_avg_time"], 200.0)
+        self.assertEqual(scores["time_score"], 20.0)
+        self.assertEqual(scores["optimality_score"], 15.0)
+
+    def test_percentile_mode_excludes_the_current_submission(self):
+        self.record_history()
+        scores = self.score("percentile")
+        # cdf(100) over the earlier runs (100, 200, 300) only: 1/6.
+        self.assertEqual(scores["time_score"], round(5 + (1 - 1 / 6) * 20, 2))
+        self.assertEqual(scores["optimality_score"], 15.0)
+        self.assertEqual(scores["benchmark_p50_time"], 200.0)
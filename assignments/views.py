@@ -1,7 +1,8 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse
 from django.contrib.auth.decorators import login_required
-from .models import Assignment, Question, AssignmentAttempt
+from .models import Assignment, Question, AssignmentAttempt, QuizQuestion, OutputGuessQuestion, CodingQuestion
+from .services.question_plan import QuestionPlanService
 
 # Simple Views to serve templates. Authorization handled by templates or API calls.
 # Note: For production, we'd add @login_required. For strict Agent demo, I'll add it but ensure mock user works if needed.
@@ -9,65 +10,77 @@ from .models import Assignment, Question, AssignmentAttempt
 def start_view(request):
     return render(request, 'assignments/start.html')
 
+# Which view renders each section of the question plan.
+SECTION_VIEWS = {
+    Question.QuestionType.QUIZ: 'assignments:quiz',
+    Question.QuestionType.OUTPUT: 'assignments:output_guess',
+    Question.QuestionType.CODE: 'assignments:coding',
+}
+
+def _plan_step(attempt_id, question_type):
+    """
+    Returns (step, None) when the attempt's next question belongs to this
+    section, otherwise (None, redirect) to the section it is on, or to the
+    summary once the plan is done.
+    """
+    attempt = get_object_or_404(
+        AssignmentAttempt.objects.only('id', 'question_plan', 'plan_cursor'), id=attempt_id
+    )
+    step = QuestionPlanService.current(attempt)
+    if step is None:
+        return None, redirect('assignments:summary', attempt_id=attempt_id)
+    if step['question_type'] != question_type:
+        return None, redirect(SECTION_VIEWS[step['question_type']], attempt_id=attempt_id)
+    return step, None
+
 def quiz_view(request, attempt_id):
-    # Fetch a quiz question. For demo, simplified: Get first Quiz Question.
-    # Logic: Find attempt, find next unanswered question.
-    attempt = get_object_or_404(AssignmentAttempt, id=attempt_id)
-    # Get all quiz questions for this assignment
-    questions = Question.objects.filter(assignment=attempt.assignment, question_type='QUIZ')
-    
-    # Simple Navigation Logic:
-    # Check submissions for this attempt. 
-    # Find first question ID not in submissions?
-    # This logic belongs in a Service, but here for View simplicity.
-    submitted_ids = attempt.submissions.values_list('question_id', flat=True)
-    next_q = questions.exclude(id__in=submitted_ids).first()
-    
-    if not next_q:
-        # No more quiz questions, go to Logic
-        return redirect('assignments:output_guess', attempt_id=attempt_id)
+    # The question order was fixed when the attempt started; show plan[cursor].
+    step, response = _plan_step(attempt_id, Question.QuestionType.QUIZ)
+    if response:
+        return response
+    question = get_object_or_404(QuizQuestion.objects.select_related('question'), question_id=step['question_id'])
         
     return render(request, 'assignments/quiz.html', {
-        'question': next_q.quiz_data, # specific model
-        'question_number': 1, # Todo: calc index
-        'total_questions': questions.count(),
+        'question': question, # specific model
+        'question_number': step['number'],
+        'total_questions': step['total'],
         'attempt_id': attempt_id,
         'next_url': reverse('assignments:quiz', args=[attempt_id]) # Recursive route until done
     })
 
 def output_guess_view(request, attempt_id):
-    attempt = get_object_or_404(AssignmentAttempt, id=attempt_id)
-    questions = Question.objects.filter(assignment=attempt.assignment, question_type='OUTPUT')
-    
-    submitted_ids = attempt.submissions.values_list('question_id', flat=True)
-    next_q = questions.exclude(id__in=submitted_ids).first()
-    
-    if not next_q:
-        return redirect('assignments:coding', attempt_id=attempt_id)
+    step, response = _plan_step(attempt_id, Question.QuestionType.OUTPUT)
+    if response:
+        return response
+    question = get_object_or_404(OutputGuessQuestion.objects.with_code().select_related('question'), question_id=step['question_id'])
         
     return render(request, 'assignments/output_guess.html', {
-        'question': next_q.output_data,
+        'question': question,
         'attempt_id': attempt_id,
         'next_url': reverse('assignments:output_guess', args=[attempt_id])
     })
 
 def coding_view(request, attempt_id):
-    attempt = get_object_or_404(AssignmentAttempt, id=attempt_id)
-    questions = Question.objects.filter(assignment=attempt.assignment, question_type='CODE')
-    
-    submitted_ids = attempt.submissions.values_list('question_id', flat=True)
-    next_q = questions.exclude(id__in=submitted_ids).first()
-    
-    if not next_q:
-        return redirect('assignments:summary', attempt_id=attempt_id)
+    step, response = _plan_step(attempt_id, Question.QuestionType.CODE)
+    if response:
+        return response
+    question = get_object_or_404(CodingQuestion.objects.with_statement().select_related('question'), question_id=step['question_id'])
         
     return render(request, 'assignments/coding.html', {
-        'question': next_q.coding_data,
+        'question': question,
+        'question_number': step['number'],
+        'total_questions': step['total'],
         'attempt_id': attempt_id,
         'complexity_rank_label': "Medium", # Placeholder
         'next_url': reverse('assignments:coding', args=[attempt_id])
     })
 
 def summary_view(request, attempt_id):
-    attempt = get_object_or_404(AssignmentAttempt, id=attempt_id)
+    # Read-only: renders the counters the submissions keep current. The
+    # attempt is completed by POST /api/assignments/{id}/finalize (the
+    # page's "Finish" button), never by a GET a prefetcher could send.
+    attempt = get_object_or_404(
+        AssignmentAttempt.objects.only('id', 'completed_at', 'concept_score', 'logic_score', 'execution_score'),
+        id=attempt_id,
+    )
     return render(request, 'assignments/summary.html', {'attempt': attempt})
@@ -0,0 +1,115 @@
+import os
+import django
+import sys
+
+# Setup Django environment
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'aptify.settings')
+django.setup()
+
+from django.db import connection, transaction
+from users.models import User
+from assignments.models import (
+    Assignment, Question, AssignmentAttempt, QuizSubmission, CodingSubmission
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+def expected_index(model, name):
+    """
+    Name the planner reports for an index / constraint. SQLite backs unique
+    constraints with an automatic index instead of the named one.
+    """
+    if connection.vendor == 'sqlite' and any(
+        getattr(c, 'name', None) == name for c in model._meta.constraints
+    ):
+        return f"sqlite_autoindex_{model._meta.db_table}"
+    return name
+
+
+def seed():
+    user = User.objects.create_user(username='plancheck', email='plancheck@example.com', password='PlanCheck123!')
+    assignment = Assignment.objects.create(title='Query plan check')
+    questions = [
+        Question.objects.create(assignment=assignment, question_type=question_type)
+        for question_type in ('QUIZ', 'OUTPUT', 'CODE') * 20
+    ]
+    code_questions = [q for q in questions if q.question_type == 'CODE']
+    attempts = [AssignmentAttempt.objects.create(user=user, assignment=assignment) for _ in range(20)]
+    # Attempts of other candidates, so one (user, assignment) pair is selective.
+    others = [User.objects.create(username=f'plancheck{index}', email=f'plancheck{index}@example.com') for index in range(10)]
+    AssignmentAttempt.objects.bulk_create([
+        AssignmentAttempt(user=other, assignment=assignment) for other in others for _ in range(20)
+    ])
+    QuizSubmission.objects.bulk_create([
+        QuizSubmission(attempt=attempt, question=question, selected_option_id='a', is_correct=True, time_taken_seconds=1)
+        for attempt in attempts for question in questions if question.question_type == 'QUIZ'
+    ])
+    CodingSubmission.objects.bulk_create([
+        CodingSubmission(
+            attempt=attempt, question=question, submitted_code='print(1)', time_taken_seconds=1,
+            code_runs=index % 2 == 0, execution_time_ms=index, grading_status='DONE',
+        )
+        for index, (attempt, question) in enumerate(
+            (attempt, question) for attempt in attempts for question in code_questions
+        )
+    ])
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+    return user, assignment, attempts[0], questions[0], code_questions[0]
+
+
+def verify_query_plans():
+    print("Verifying query plans use the submission indexes...")
+    failures = 0
+    try:
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                # Seed data is tiny; make the planner show which index it would use.
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            user, assignment, attempt, quiz_question, code_question = seed()
+
+            checks = [
+                ("Runnable submissions of a question (benchmarks / scoring)",
+                 CodingSubmission.objects.filter(question_id=code_question.id, code_runs=True)
+                 .values_list('execution_time_ms', 'complexity_rank'),
+                 expected_index(CodingSubmission, 'codingsub_question_runs_idx')),
+                ("Quiz answer of an attempt / question",
+                 QuizSubmission.objects.filter(attempt_id=attempt.id, question_id=quiz_question.id),
+                 expected_index(QuizSubmission, 'quizsub_unique_attempt_question')),
+                ("Coding submissions of an attempt / question",
+                 CodingSubmission.objects.filter(attempt_id=attempt.id, question_id=code_question.id),
+                 expected_index(CodingSubmission, 'codingsub_attempt_question_idx')),
+                ("Questions of one type in an assignment",
+                 Question.objects.filter(assignment_id=assignment.id, question_type='OUTPUT'),
+                 expected_index(Question, 'question_assignment_type_idx')),
+                ("Attempts of a user at an assignment",
+                 AssignmentAttempt.objects.filter(user_id=user.id, assignment_id=assignment.id),
+                 expected_index(AssignmentAttempt, 'attempt_user_assignment_idx')),
+            ]
+            for label, queryset, index_name in checks:
+                plan = queryset.explain()
+                if index_name in plan:
+                    print(f"   [PASS] {label}: {index_name}")
+                else:
+                    failures += 1
+                    print(f"   [FAIL] {label}: expected {index_name}, plan was:\n{plan}")
+            raise Rollback()
+    except Rollback:
+        pass
+
+    if failures:
+        raise AssertionError(f"{failures} query plan(s) did not use the expected index")
+    print("\nSUCCESS: Query plans verified!")
+
+if __name__ == "__main__":
+    try:
+        verify_query_plans()
+    except Exception as e:
+        print(f"\n[ERROR] Verification Failed: {e}")
+        exit(1)